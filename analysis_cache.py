@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析结果缓存
+键 = sha1(topic_id + 归一化搜索摘要的哈希 + 提示模板版本 + 模型)，
+同一话题、同样的背景信息、同一模板和模型下不再重复付费评分，评分也保持稳定：
+- 精确命中：摘要归一化后完全相同
+- 相似命中（可选）：同一话题、模板和模型下，摘要词项的 Jaccard 相似度不低于阈值时复用最相近的一条
+条目保存在一个 JSON 文件里，超过 TTL 的条目查找时丢弃，超出条目上限时按 LRU 淘汰；
+保存时在文件锁内重新读取并合并磁盘上的条目，多个并发运行不会互相覆盖。
+复用的结果带 reused=True 和 reused_from（命中方式、相似度、原始分析时间），
+合并后同样出现在 hotspot_analysis_results.json 里。
+
+用法:
+    python3 analysis_cache.py stats
+    python3 analysis_cache.py clear
+
+环境变量:
+    WEIBO_ANALYSIS_CACHE              设为 0 时不使用缓存（默认开启）
+    WEIBO_ANALYSIS_CACHE_PATH         缓存文件（默认 .cache/analysis/cache.json）
+    WEIBO_ANALYSIS_CACHE_TTL          有效期秒数（默认 259200，即 3 天）
+    WEIBO_ANALYSIS_CACHE_MAX_ENTRIES  条目上限（默认 2000）
+    WEIBO_ANALYSIS_CACHE_SIMILARITY   相似命中阈值（0-1，默认 0 表示只做精确命中）
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from analyze_hotspot_with_ai import PROMPT_TEMPLATE_VERSION
+from bm25_index import tokenize
+from search_cache import file_lock, normalize_query
+
+CACHE_ENABLED = os.environ.get('WEIBO_ANALYSIS_CACHE', '1') != '0'
+CACHE_PATH = os.environ.get('WEIBO_ANALYSIS_CACHE_PATH', os.path.join('.cache', 'analysis', 'cache.json'))
+DEFAULT_TTL = int(os.environ.get('WEIBO_ANALYSIS_CACHE_TTL', '259200'))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('WEIBO_ANALYSIS_CACHE_MAX_ENTRIES', '2000'))
+DEFAULT_SIMILARITY = float(os.environ.get('WEIBO_ANALYSIS_CACHE_SIMILARITY', '0'))
+
+
+def context_hash(search_summary):
+    """归一化搜索摘要的哈希"""
+    return hashlib.sha1(normalize_query(search_summary).encode('utf-8')).hexdigest()
+
+
+def cache_key(topic_id, summary_hash, template_version, model):
+    raw = f"{topic_id}\n{summary_hash}\n{template_version}\n{model}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def similarity(a, b):
+    """两段摘要词项集合的 Jaccard 相似度"""
+    terms_a, terms_b = set(tokenize(a)), set(tokenize(b))
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+
+def topic_key(query):
+    """缓存用的话题标识：topic_id，没有时退回标题"""
+    return query.get('topic_id') or f"title:{query.get('title', '')}"
+
+
+class AnalysisCache:
+    """单文件 JSON 缓存 + TTL + LRU 条目淘汰 + 可选相似命中"""
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 threshold=DEFAULT_SIMILARITY):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.entries = {}   # key -> {'topic_id', 'context_hash', 'template_version', 'model', 'summary',
+                            #         'stored_at', 'accessed_at', 'result'}
+        self.stats = {'hits': 0, 'similar_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self.dirty = False
+        self.touched = set()    # 本进程写入或访问过、保存时要合并进缓存文件的 key
+        self.removed = set()    # 本进程删除的 key，保存时从磁盘上的条目中同样删除
+        self._lock = threading.Lock()
+        self.entries = self._read_entries()
+
+    def _read_entries(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('entries', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _drop(self, key):
+        """删除条目（调用方持有锁）"""
+        self.entries.pop(key, None)
+        self.touched.discard(key)
+        self.removed.add(key)
+        self.dirty = True
+
+    def _hit(self, key, meta, now, kind, score):
+        """记录命中并返回带复用标记的结果副本（调用方持有锁）"""
+        meta['accessed_at'] = now
+        self.touched.add(key)
+        self.dirty = True
+        self.stats['hits' if kind == 'exact' else 'similar_hits'] += 1
+        result = dict(meta['result'])
+        result['reused'] = True
+        result['reused_from'] = {
+            'kind': kind,
+            'similarity': round(score, 3),
+            'analyzed_at': datetime.fromtimestamp(meta['stored_at']).isoformat(timespec='seconds')
+        }
+        return result
+
+    def get(self, query, search_summary, model, template_version=PROMPT_TEMPLATE_VERSION):
+        """查找缓存，返回带 reused 标记的分析结果；未命中返回 None"""
+        now = time.time()
+        topic_id = topic_key(query)
+        key = cache_key(topic_id, context_hash(search_summary), template_version, model)
+        with self._lock:
+            for candidate in [k for k, m in self.entries.items() if now - m['stored_at'] > self.ttl]:
+                self.stats['expired'] += 1
+                self._drop(candidate)
+
+            meta = self.entries.get(key)
+            if meta is not None:
+                return self._hit(key, meta, now, 'exact', 1.0)
+
+            if self.threshold > 0:
+                best, best_score = None, self.threshold
+                for candidate, meta in self.entries.items():
+                    if (meta['topic_id'], meta['template_version'], meta['model']) != \
+                            (topic_id, template_version, model):
+                        continue
+                    score = similarity(search_summary, meta['summary'])
+                    if score >= best_score:
+                        best, best_score = candidate, score
+                if best is not None:
+                    return self._hit(best, self.entries[best], now, 'similar', best_score)
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, query, search_summary, model, result, template_version=PROMPT_TEMPLATE_VERSION):
+        """写入一条分析结果（不含排名和复用标记），超出上限时淘汰最久未访问的条目"""
+        now = time.time()
+        topic_id = topic_key(query)
+        summary_hash = context_hash(search_summary)
+        key = cache_key(topic_id, summary_hash, template_version, model)
+        stored = {k: v for k, v in result.items() if k not in ('rank', 'reused', 'reused_from')}
+        with self._lock:
+            self.entries[key] = {
+                'topic_id': topic_id, 'context_hash': summary_hash, 'template_version': template_version,
+                'model': model, 'summary': search_summary, 'stored_at': now, 'accessed_at': now,
+                'result': stored
+            }
+            self.touched.add(key)
+            self.removed.discard(key)
+            self.dirty = True
+            self._evict()
+        return key
+
+    def _evict(self):
+        """超出条目上限时按最近访问时间淘汰（调用方持有锁）"""
+        excess = len(self.entries) - self.max_entries
+        if excess <= 0:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k]['accessed_at'])[:excess]:
+            self._drop(key)
+            self.stats['evictions'] += 1
+
+    def _merge(self, entries):
+        """把本进程的改动合并到磁盘上的条目（调用方持有锁）"""
+        for key in self.removed:
+            entries.pop(key, None)
+        for key in self.touched:
+            meta = self.entries.get(key)
+            if meta is None:
+                continue
+            disk = entries.get(key)
+            if disk is not None and disk['stored_at'] > meta['stored_at']:
+                meta = dict(disk)
+            if disk is not None:
+                meta['accessed_at'] = max(meta['accessed_at'], disk['accessed_at'])
+            entries[key] = meta
+        self.entries = entries
+
+    def save(self):
+        """在文件锁内重新读取缓存文件、合并本进程的改动并按条目上限淘汰，再原子写回"""
+        with self._lock:
+            if not self.dirty:
+                return
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            with file_lock(self.path):
+                self._merge(self._read_entries())
+                self._evict()
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'entries': self.entries}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            self.touched.clear()
+            self.removed.clear()
+            self.dirty = False
+
+    def summary(self):
+        """本次运行的命中统计"""
+        lookups = self.stats['hits'] + self.stats['similar_hits'] + self.stats['misses']
+        hits = self.stats['hits'] + self.stats['similar_hits']
+        return dict(self.stats,
+                    lookups=lookups,
+                    hit_rate=round(hits / lookups, 3) if lookups else 0.0,
+                    entries=len(self.entries))
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            self.touched.clear()
+            self.removed.clear()
+            self.dirty = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class CachedAnalyzer:
+    """
+    给分析器加一层结果缓存：analyze_group() 先查缓存，只把未命中的话题交给原分析器，
+    新结果写回缓存（预筛跳过的占位结果不缓存）；其余属性（name / model / batch / usage ...）转发给原分析器
+    """
+
+    def __init__(self, analyzer, cache):
+        self.analyzer = analyzer
+        self.cache = cache
+        self.model = getattr(analyzer, 'model', analyzer.name)
+
+    def __getattr__(self, name):
+        return getattr(self.analyzer, name)
+
+    def analyze_group(self, items):
+        results, misses = {}, []
+        for item in items:
+            query, search_summary, _ = item
+            cached = self.cache.get(query, search_summary, self.model)
+            if cached is None:
+                misses.append(item)
+            else:
+                results[query['rank']] = cached
+        if not misses:
+            return results, {}
+
+        fresh, errors = self.analyzer.analyze_group(misses)
+        for query, search_summary, _ in misses:
+            result = fresh.get(query['rank'])
+            if result is not None and not result.get('prefiltered'):
+                self.cache.put(query, search_summary, self.model, result)
+                result['reused'] = False
+        results.update(fresh)
+        return results, errors
+
+    def print_usage(self):
+        if hasattr(self.analyzer, 'print_usage'):
+            self.analyzer.print_usage()
+        s = self.cache.summary()
+        print(f"🗃️  分析缓存: 命中 {s['hits']}，相似复用 {s['similar_hits']}，未命中 {s['misses']}，"
+              f"过期 {s['expired']}，淘汰 {s['evictions']}（命中率 {s['hit_rate']:.0%}）")
+
+    def save(self):
+        self.cache.save()
+
+
+_default_cache = None
+
+
+def get_analysis_cache():
+    """获取进程内共享的分析缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache()
+    return _default_cache
+
+
+def with_cache(analyzer, enabled=CACHE_ENABLED):
+    """按配置给分析器套上结果缓存"""
+    if analyzer is None or not enabled:
+        return analyzer
+    return CachedAnalyzer(analyzer, get_analysis_cache())
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('stats', 'clear'):
+        print(__doc__)
+        return 1
+
+    cache = get_analysis_cache()
+    if args[0] == 'clear':
+        cache.clear()
+        print(f"🗑️  已清空分析缓存: {cache.path}")
+        return 0
+
+    models = {}
+    for meta in cache.entries.values():
+        models[meta['model']] = models.get(meta['model'], 0) + 1
+    print(f"🗃️  分析缓存: {cache.path}")
+    print(f"   条目数量: {len(cache.entries)} / {cache.max_entries}")
+    print(f"   按模型: {', '.join(f'{m} {n}' for m, n in sorted(models.items())) or '无'}")
+    print(f"   有效期: {cache.ttl}秒，相似命中阈值: {cache.threshold or '关闭'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
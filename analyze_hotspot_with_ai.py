@@ -2,38 +2,33 @@
 # -*- coding: utf-8 -*-
 """
 AI分析微博热点并生成产品创意
+按运行清单（run_manifest.py）读取本次运行的搜索结果，--run RUN_ID / --resume RUN_ID 指定运行
+已有有效分析结果的话题（复用的历史结果或中断前已完成的分析）不再生成提示
 """
 
 import json
 import os
-import re
 import sys
 from datetime import datetime
 
+from run_manifest import RunManifest, run_id_from_args, write_text_atomic
+from snippet_builder import build_snippet
 
-def load_search_results():
-    """加载所有搜索结果文件"""
+
+def load_search_results(manifest, ranks=None):
+    """按运行清单加载本次运行各排名（默认全部）的搜索结果"""
     print("正在加载搜索结果...")
 
     search_results = []
-    result_files = [f for f in os.listdir('.') if f.startswith('search_results_') and f.endswith('.json')]
-
-    if not result_files:
-        print("❌ 未找到搜索结果文件")
-        print("请确保文件名为: search_results_XX.json")
-        return []
-
-    print(f"找到 {len(result_files)} 个结果文件")
-
-    for result_file in sorted(result_files):
+    for rank in (manifest.ranks() if ranks is None else ranks):
+        result_file = manifest.artifact(rank, 'search')
+        if not result_file:
+            print(f"  ⚠️  排名 #{rank} 没有搜索结果")
+            continue
         try:
             with open(result_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
 
-            # 提取文件名中的排名
-            match = re.search(r'search_results_(\d+)\.json', result_file)
-            rank = int(match.group(1)) if match else 0
-
             search_results.append({
                 'rank': rank,
                 'filename': result_file,
@@ -47,29 +42,34 @@ def load_search_results():
         except Exception as e:
             print(f"  ❌ 加载失败 {result_file}: {e}")
 
-    # 按排名排序
-    search_results.sort(key=lambda x: x['rank'])
+    if not search_results:
+        print("❌ 未找到搜索结果文件")
+        print(f"请确保搜索结果位于: {manifest.run_dir}/search_results_XX.json")
+        return []
 
     print(f"✅ 成功加载 {len(search_results)} 个搜索结果")
     return search_results
 
 
-def load_hotspot_queries():
-    """加载热搜查询列表"""
+def load_hotspot_queries(manifest):
+    """加载本次运行的热搜查询列表"""
     try:
-        with open('weibo_search_queries.json', 'r', encoding='utf-8') as f:
-            queries = json.load(f)
-        return queries
+        return manifest.load_json('queries')
     except Exception as e:
         print(f"❌ 加载热搜查询失败: {e}")
         return []
 
 
-def extract_search_snippet(search_data):
-    """从搜索结果中提取摘要"""
+def extract_search_snippet(search_data, title=None):
+    """从搜索结果中提取摘要（给出标题时按相关度挑选句子，控制在 token 预算内）"""
     if not search_data:
         return "暂无搜索结果"
 
+    if title:
+        snippet = build_snippet(search_data, title)
+        if snippet:
+            return snippet
+
     # 根据不同的数据结构提取信息
     if isinstance(search_data, dict):
         # 如果是单个结果
@@ -95,19 +95,12 @@ def extract_search_snippet(search_data):
     return "搜索结果内容较少"
 
 
-def generate_ai_analysis_prompt(hotspot_data, search_summary):
-    """生成AI分析提示"""
-    title = hotspot_data.get('title', '未知热点')
-
-    prompt = f"""请分析以下微博热搜话题，并从"有趣"和"有用"两个角度评估生成小产品的可能性。
-
-## 热搜话题
-{title}
-
-## 背景信息
-{search_summary}
+# 提示模板版本：修改下面任何静态内容（评分标准、输出格式、示例）时递增，
+# 已缓存的分析结果和服务端的前缀缓存都以它区分新旧模板
+PROMPT_TEMPLATE_VERSION = 2
 
-## 评估标准
+# 评分标准：单话题提示和批量提示共用
+SCORING_RUBRIC = """## 评估标准
 
 ### 1. 有趣度（满分80分）
 - 话题是否新颖、有创意？
@@ -120,39 +113,190 @@ def generate_ai_analysis_prompt(hotspot_data, search_summary):
 - 是否有实用价值？
 - 是否能提高效率或提供便利？
 
-## 输出要求
-
-请提供以下信息（JSON格式）：
+"""
 
-```json
-{{
-  "fun_score": 0-80,  // 有趣度评分（0-80分）
+# 单个话题的结果字段（JSON 对象内部的各行）
+RESULT_FIELDS = """  "fun_score": 0-80,  // 有趣度评分（0-80分）
   "fun_reason": "有趣度评分理由",
   "useful_score": 0-20,  // 有用度评分（0-20分）
   "useful_reason": "有用度评分理由",
   "total_score": 0-100,  // 总分
   "has_idea": true/false,  // 是否生成产品创意
-  "product": {{
+  "product": {
     "name": "产品名称",
     "features": "核心功能",
     "target_users": "目标用户",
     "description": "产品描述（50字以内）"
-  }},
+  },
   "summary": "关键事件脉络（100字以内）",
   "analysis_notes": "分析备注"
-}}
+"""
+
+IDEA_RULE = "**重要**：如果总分 < 60分，请将 has_idea 设为 false，product 设为 null。"
+
+# 评分示例：校准打分尺度，同时让静态前缀达到服务端前缀缓存的最小长度
+SCORING_EXAMPLES = """## 评分示例
+
+示例话题：多地博物馆推出文物表情包
+背景信息：多家博物馆把馆藏文物做成动态表情包在社交平台发布，"翻白眼的陶俑""比心的唐代仕女"等表情被大量转发，年轻用户自发二次创作，相关话题阅读量破亿。
+
+```json
+{
+  "fun_score": 66,
+  "fun_reason": "文物与网络表情的反差感强，用户自发二创、传播性高，适合做互动玩法",
+  "useful_score": 9,
+  "useful_reason": "能顺带传播文物知识，但实用价值有限",
+  "total_score": 75,
+  "has_idea": true,
+  "product": {
+    "name": "文物表情工坊",
+    "features": "上传自拍匹配相似文物表情，一键生成带文物出处说明的表情包",
+    "target_users": "喜欢国潮和表情包的年轻人、博物馆爱好者",
+    "description": "把自己的表情变成文物表情包，每张都附带文物小知识"
+  },
+  "summary": "多家博物馆发布文物表情包，引发转发和二次创作热潮，话题阅读量破亿",
+  "analysis_notes": "二创热度通常持续一到两周，产品需要尽快上线"
+}
+```
+
+示例话题：某地发布寒潮蓝色预警
+背景信息：气象台发布寒潮蓝色预警，未来三天气温下降8到10摄氏度，提醒市民注意防寒保暖、出行安全，部分航班和高速可能受影响。
+
+```json
+{
+  "fun_score": 14,
+  "fun_reason": "常规天气预警，缺少新奇点和参与感",
+  "useful_score": 13,
+  "useful_reason": "与出行和防寒直接相关，但已有大量天气应用覆盖",
+  "total_score": 27,
+  "has_idea": false,
+  "product": null,
+  "summary": "气象台发布寒潮蓝色预警，三天内降温8到10摄氏度，交通可能受影响",
+  "analysis_notes": "信息类话题，天气应用已充分满足需求"
+}
+```
+
+示例话题：高校食堂推出"盲盒套餐"
+背景信息：某高校食堂推出10元盲盒套餐，菜品随机组合，学生晒出"开箱"结果，有人抽到大鸡腿，有人抽到三份青菜，评论区讨论热烈，其他高校纷纷跟进。
+
+```json
+{
+  "fun_score": 58,
+  "fun_reason": "随机性带来期待感和晒图欲望，校园场景容易形成讨论",
+  "useful_score": 11,
+  "useful_reason": "能缓解「今天吃什么」的选择困难，也能帮助食堂消化库存",
+  "total_score": 69,
+  "has_idea": true,
+  "product": {
+    "name": "饭点盲盒",
+    "features": "按预算和忌口随机组合附近档口菜品，开箱结果可分享打分",
+    "target_users": "选择困难的大学生和上班族",
+    "description": "设定预算和忌口，随机抽一顿饭，吃完还能晒开箱"
+  },
+  "summary": "高校食堂推出10元盲盒套餐，学生晒开箱结果，多所高校跟进",
+  "analysis_notes": "需要与商家合作控制成本，避免套餐质量差引发负面评价"
+}
+```
+
+"""
+
+# 单话题提示的静态前缀：所有话题完全相同（逐字节不变），话题内容全部放在前缀之后，
+# 服务端可以缓存前缀，每个话题只按未缓存的后缀计费
+ANALYSIS_PREFIX = f"""你是微博热搜产品创意分析师。请分析本提示最后给出的微博热搜话题，并从"有趣"和"有用"两个角度评估生成小产品的可能性。
+
+{SCORING_RUBRIC}## 输出要求
+
+请提供以下信息（JSON格式）：
+
+```json
+{{
+{RESULT_FIELDS}}}
+```
+
+{IDEA_RULE}
+
+{SCORING_EXAMPLES}"""
+
+# 批量提示的静态前缀（话题数量等可变内容都放在后缀里）
+BATCH_FIELDS = ''.join(f"  {line}\n" for line in RESULT_FIELDS.splitlines())
+BATCH_PREFIX = f"""你是微博热搜产品创意分析师。请分析本提示最后列出的多个微博热搜话题，分别从"有趣"和"有用"两个角度评估生成小产品的可能性。
+每个话题独立评分，不要互相比较。
+
+{SCORING_RUBRIC}## 输出要求
+
+请返回一个 JSON 数组，每个话题一个对象，rank 与话题列表中的编号一致：
+
+```json
+[
+  {{
+    "rank": 1,  // 话题编号
+{BATCH_FIELDS}  }}
+]
 ```
 
-**重要**：如果总分 < 60分，请将 has_idea 设为 false，product 设为 null。
+{IDEA_RULE}
+
+{SCORING_EXAMPLES}"""
+
+
+def generate_ai_analysis_prompt(hotspot_data, search_summary):
+    """生成AI分析提示：静态前缀 + 话题后缀"""
+    title = hotspot_data.get('title', '未知热点')
+
+    prompt = f"""{ANALYSIS_PREFIX}## 热搜话题
+{title}
+
+## 背景信息
+{search_summary}
 
 请分析并返回JSON结果："""
 
     return prompt
 
 
-def save_analysis_prompts(search_results, hotspot_queries):
-    """保存所有AI分析提示"""
-    prompts_dir = 'analysis_prompts'
+def generate_batch_analysis_prompt(items):
+    """
+    多个话题共用一份评分标准的批量提示：静态前缀 + 话题列表
+    items: [(hotspot_data, search_summary), ...]；要求返回按 rank 对应的 JSON 数组
+    """
+    topics = ''.join(
+        f"### 话题 rank={hotspot_data['rank']}：{hotspot_data.get('title', '未知热点')}\n\n"
+        f"背景信息：{search_summary}\n\n"
+        for hotspot_data, search_summary in items
+    )
+
+    return f"""{BATCH_PREFIX}## 热搜话题（共 {len(items)} 个）
+
+{topics}请只返回包含全部 {len(items)} 个话题的 JSON 数组："""
+
+
+def split_prompt(prompt):
+    """把提示拆成 (可缓存的静态前缀, 话题后缀)；不是按当前模板生成的提示返回 ('', 原提示)"""
+    for prefix in (ANALYSIS_PREFIX, BATCH_PREFIX):
+        if prompt.startswith(prefix):
+            return prefix, prompt[len(prefix):]
+    return '', prompt
+
+
+def build_analysis_prompt(hotspot_query, search_data):
+    """由搜索结果生成单个话题的分析提示，返回 (提示文本, 搜索摘要)"""
+    search_summary = extract_search_snippet(search_data, hotspot_query.get('title'))
+    return generate_ai_analysis_prompt(hotspot_query, search_summary), search_summary
+
+
+def write_analysis_prompt(manifest, hotspot_query, search_data):
+    """生成单个话题的分析提示，写入运行目录并登记，返回 (提示文件, 搜索摘要)"""
+    rank = hotspot_query['rank']
+    prompt, search_summary = build_analysis_prompt(hotspot_query, search_data)
+    prompt_file = manifest.stage_path(rank, 'prompt')
+    write_text_atomic(prompt_file, prompt)
+    manifest.record(rank, 'prompt', prompt_file)
+    return prompt_file, search_summary
+
+
+def save_analysis_prompts(search_results, hotspot_queries, manifest):
+    """保存所有AI分析提示（写入运行目录并登记到清单）"""
+    prompts_dir = manifest.path('analysis_prompts')
     os.makedirs(prompts_dir, exist_ok=True)
 
     prompts_data = []
@@ -171,17 +315,9 @@ def save_analysis_prompts(search_results, hotspot_queries):
         if not hotspot_query:
             hotspot_query = {'title': title, 'rank': rank}
 
-        # 提取搜索摘要
-        search_summary = extract_search_snippet(result['data'])
-
-        # 生成AI提示
-        prompt = generate_ai_analysis_prompt(hotspot_query, search_summary)
-
-        # 保存提示到文件
-        prompt_file = os.path.join(prompts_dir, f'prompt_{rank:02d}.txt')
+        # 提取搜索摘要、生成AI提示并保存到文件
         try:
-            with open(prompt_file, 'w', encoding='utf-8') as f:
-                f.write(prompt)
+            prompt_file, search_summary = write_analysis_prompt(manifest, hotspot_query, result['data'])
 
             prompts_data.append({
                 'rank': rank,
@@ -199,18 +335,17 @@ def save_analysis_prompts(search_results, hotspot_queries):
     print(f"✅ 共生成 {len(prompts_data)} 个AI分析提示")
 
     # 保存索引文件
-    index_file = 'analysis_prompts_index.json'
     try:
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(prompts_data, f, ensure_ascii=False, indent=2)
+        index_file = manifest.write_json('prompts_index', 'analysis_prompts_index.json', prompts_data)
         print(f"✅ 提示索引已保存: {index_file}")
     except Exception as e:
         print(f"❌ 保存索引失败: {e}")
+    manifest.save()
 
     return prompts_data
 
 
-def create_analysis_instructions(prompts_data):
+def create_analysis_instructions(prompts_data, manifest):
     """创建分析操作说明"""
     instructions = f"""# AI分析操作说明
 
@@ -224,10 +359,10 @@ def create_analysis_instructions(prompts_data):
 
 对于每个热搜话题，需要：
 
-1. 读取提示文件（位于 analysis_prompts/ 目录）
+1. 读取提示文件（位于 {manifest.run_dir}/analysis_prompts/ 目录）
 2. 将提示内容发送给Claude AI
 3. 收集AI返回的JSON格式分析结果
-4. 保存结果到 `analysis_results/result_{{rank}}.json`
+4. 保存结果到 `{manifest.run_dir}/analysis_results/result_{{rank}}.json`
 
 ## 提示文件列表
 
@@ -240,7 +375,7 @@ def create_analysis_instructions(prompts_data):
 ### #{prompt_info['rank']} - {prompt_info['title']}
 
 - **提示文件**: `{prompt_info['prompt_file']}`
-- **输出文件**: `analysis_results/result_{prompt_info['rank']:02d}.json`
+- **输出文件**: `{manifest.stage_path(prompt_info['rank'], 'analysis')}`
 - **执行方式**: 将提示文件内容发送给Claude AI
 - **期望输出**: JSON格式分析结果
 
@@ -318,10 +453,9 @@ python generate_html_report.py
 """
 
     # 保存说明文件
-    instructions_file = 'AI_ANALYSIS_INSTRUCTIONS.md'
+    instructions_file = manifest.path('AI_ANALYSIS_INSTRUCTIONS.md')
     try:
-        with open(instructions_file, 'w', encoding='utf-8') as f:
-            f.write(instructions)
+        write_text_atomic(instructions_file, instructions)
         print(f"✅ 分析说明已保存: {instructions_file}")
     except Exception as e:
         print(f"❌ 保存说明失败: {e}")
@@ -339,15 +473,32 @@ def main():
 
     # 加载热搜查询
     print("【步骤1/3】加载热搜查询...")
-    hotspot_queries = load_hotspot_queries()
+    try:
+        manifest = RunManifest.load(run_id_from_args(sys.argv[1:]))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ 无法打开运行清单: {e}")
+        return 1
+    print(f"🗂️  运行ID: {manifest.run_id}")
+    hotspot_queries = load_hotspot_queries(manifest)
     if not hotspot_queries:
         print("\n❌ 未找到热搜查询数据")
         print("请先运行: python fetch_weibo_hotspot.py")
         return 1
 
+    # 只为还没有有效分析结果的话题准备提示
+    pending = manifest.pending('analysis')
+    if not pending:
+        manifest.save()
+        print("\n✅ 所有话题均已有有效的分析结果")
+        print("💡 下一步: python3 combine_results.py")
+        return 0
+    done = len(manifest.ranks()) - len(pending)
+    if done:
+        print(f"♻️  {done} 个话题已有有效分析结果，跳过")
+
     # 加载搜索结果
     print("\n【步骤2/3】加载搜索结果...")
-    search_results = load_search_results()
+    search_results = load_search_results(manifest, pending)
     if not search_results:
         print("\n❌ 未找到搜索结果数据")
         print("请先完成搜索步骤")
@@ -355,18 +506,18 @@ def main():
 
     # 生成AI分析提示
     print("\n【步骤3/3】生成AI分析提示...")
-    prompts_data = save_analysis_prompts(search_results, hotspot_queries)
+    prompts_data = save_analysis_prompts(search_results, hotspot_queries, manifest)
 
     if not prompts_data:
         print("\n❌ 未能生成AI分析提示")
         return 1
 
     # 创建分析说明
-    create_analysis_instructions(prompts_data)
+    instructions_file = create_analysis_instructions(prompts_data, manifest)
 
     print("\n✅ AI分析准备工作完成！")
-    print("📁 已创建 analysis_prompts/ 目录")
-    print("📄 请查看 AI_ANALYSIS_INSTRUCTIONS.md 了解详细步骤")
+    print(f"📁 已创建 {manifest.path('analysis_prompts')}/ 目录")
+    print(f"📄 请查看 {instructions_file} 了解详细步骤")
     print("\n💡 下一步:")
     print("   方法1: 手动将每个提示文件发送给Claude AI")
     print("   方法2: 使用Claude Code批量分析")
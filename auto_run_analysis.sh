@@ -51,7 +51,7 @@ log "使用 Claude: $CLAUDE_CMD"
 $CLAUDE_CMD -p "请执行微博热搜分析任务：
 
 1. 首先获取最新的微博热搜数据（使用天行数据API）
-2. 对前15条热搜进行详细搜索和分析
+2. 对前${WEIBO_TOP_N:-15}条热搜进行详细搜索和分析
 3. 为每个热搜评分并生成产品创意
 4. 对高分话题（>=80分）进行深度分析
 5. 生成增强版HTML报告
@@ -5,20 +5,19 @@
 一键完成：获取数据 → AI分析 → 生成报告
 """
 
-import json
-import os
 import sys
 from datetime import datetime
 
+from run_manifest import RunManifest, run_id_from_args
+
 def load_queries():
-    """加载热搜查询数据"""
-    if not os.path.exists('weibo_search_queries.json'):
+    """加载当前运行的热搜查询数据（--run RUN_ID / WEIBO_RUN_ID / 最近一次运行）"""
+    try:
+        return RunManifest.load(run_id_from_args(sys.argv[1:])).load_json('queries')
+    except FileNotFoundError:
         print("❌ 未找到热搜数据文件，请先运行获取脚本")
         return None
 
-    with open('weibo_search_queries.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
-
 def main():
     print("=" * 60)
     print("微博热搜产品创意分析 - 自动化增强版")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地搜索结果全文索引（SQLite 倒排索引 + BM25）
+每次搜索得到的结果文档都增量写入索引：中文按字符二元组（bigram）切分，英文/数字按整词，
+不依赖任何外部服务。反复上榜的话题可以直接从自己的语料里取背景信息，少发网络搜索。
+
+用法:
+    python3 bm25_index.py search "关键词" [--k 10]
+    python3 bm25_index.py ingest [search_results_01.json ...]   # 默认导入当前目录全部搜索结果
+    python3 bm25_index.py stats
+"""
+
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from collections import Counter
+
+INDEX_PATH = os.environ.get('WEIBO_SEARCH_INDEX', os.path.join('data', 'search_index.db'))
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id    TEXT    PRIMARY KEY,
+    topic_id  TEXT    NOT NULL DEFAULT '',
+    title     TEXT    NOT NULL DEFAULT '',
+    url       TEXT    NOT NULL DEFAULT '',
+    text      TEXT    NOT NULL,
+    length    INTEGER NOT NULL,
+    added_ts  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term   TEXT    NOT NULL,
+    doc_id TEXT    NOT NULL,
+    tf     INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_topic ON docs (topic_id, added_ts);
+"""
+
+# 英文/数字整词，或连续的其他文字（中文等，再切成二元组）
+_TOKEN_RUNS = re.compile(r'[a-z0-9]+|[^\W\da-z_]+')
+
+
+def tokenize(text):
+    """文本 → 词项列表：中文字符二元组 + 英文/数字整词"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    terms = []
+    for run in _TOKEN_RUNS.findall(text):
+        if run.isascii() or len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def doc_id_for(url, text):
+    """文档ID：有 URL 按 URL，否则按正文内容"""
+    return hashlib.sha1((url or text).encode('utf-8')).hexdigest()[:20]
+
+
+class BM25Index:
+    """SQLite 上的倒排索引"""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(SCHEMA_SQL)
+
+    def close(self):
+        self.conn.close()
+
+    def _stat(self, name):
+        row = self.conn.execute("SELECT value FROM stats WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def add_documents(self, docs):
+        """
+        增量添加文档 [{'text', 'title', 'url', 'topic_id'}, ...]
+        已收录的文档（同一 doc_id）跳过，返回新增数量
+        """
+        now = int(time.time())
+        added = 0
+        total_length = 0
+        with self.conn:
+            for doc in docs:
+                text = (doc.get('text') or '').strip()
+                if not text:
+                    continue
+                title = doc.get('title', '')
+                doc_id = doc_id_for(doc.get('url', ''), text)
+                terms = Counter(tokenize(f"{title} {text}"))
+                length = sum(terms.values())
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO docs (doc_id, topic_id, title, url, text, length, added_ts) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_id, doc.get('topic_id', ''), title, doc.get('url', ''), text, length, now))
+                if cursor.rowcount == 0:
+                    continue
+                self.conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in terms.items()])
+                added += 1
+                total_length += length
+            if added:
+                self.conn.execute(
+                    "INSERT INTO stats (name, value) VALUES ('docs', ?), ('length', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    (added, total_length))
+        return added
+
+    def search(self, query, k=10, topic_id=None):
+        """BM25 检索，返回 [{'doc_id', 'score', 'title', 'url', 'text', 'topic_id', 'added_ts'}, ...]"""
+        terms = set(tokenize(query))
+        doc_count = self._stat('docs')
+        if not terms or not doc_count:
+            return []
+        avg_length = self._stat('length') / doc_count
+
+        scores = {}
+        lengths = {}
+        for term in terms:
+            postings = self.conn.execute(
+                "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id "
+                "WHERE p.term = ?", (term,)).fetchall()
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc_id, tf, length in postings:
+                lengths[doc_id] = length
+                norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_length))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+
+        if topic_id:
+            rows = self.conn.execute("SELECT doc_id FROM docs WHERE topic_id = ?", (topic_id,)).fetchall()
+            allowed = {row[0] for row in rows}
+            scores = {d: s for d, s in scores.items() if d in allowed}
+
+        top = sorted(scores.items(), key=lambda x: -x[1])[:k]
+        results = []
+        for doc_id, score in top:
+            row = self.conn.execute(
+                "SELECT title, url, text, topic_id, added_ts FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+            results.append({
+                'doc_id': doc_id, 'score': round(score, 3), 'title': row[0], 'url': row[1],
+                'text': row[2], 'topic_id': row[3], 'added_ts': row[4]
+            })
+        return results
+
+    def stats(self):
+        return {
+            'docs': self._stat('docs'),
+            'terms': self.conn.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0],
+            'avg_length': round(self._stat('length') / self._stat('docs'), 1) if self._stat('docs') else 0,
+            'path': self.path
+        }
+
+
+def documents_from_result(data):
+    """search_results_XX.json → 文档列表（逐条结果优先，旧格式只有 content 时整段作为一个文档）"""
+    topic_id = data.get('topic_id', '')
+    results = data.get('results')
+    if isinstance(results, list) and results:
+        return [
+            {'text': r.get('snippet', ''), 'title': r.get('title', ''), 'url': r.get('url', ''),
+             'topic_id': topic_id}
+            for r in results if isinstance(r, dict)
+        ]
+    return [{'text': data.get('content', ''), 'title': data.get('title', ''), 'url': '', 'topic_id': topic_id}]
+
+
+def ingest_files(paths, index=None):
+    """把搜索结果文件导入索引，返回新增文档数"""
+    own = index is None
+    index = index or BM25Index()
+    docs = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                docs.extend(documents_from_result(json.load(f)))
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"  ⚠️  跳过 {path}: {e}")
+    added = index.add_documents(docs)
+    if own:
+        index.close()
+    return added
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('search', 'ingest', 'stats'):
+        print(__doc__)
+        return 1
+
+    index = BM25Index()
+    if args[0] == 'stats':
+        stats = index.stats()
+        print(f"📚 搜索结果索引: {stats['path']}")
+        print(f"   文档数量: {stats['docs']}")
+        print(f"   词项数量: {stats['terms']}")
+        print(f"   平均长度: {stats['avg_length']}")
+        return 0
+
+    if args[0] == 'ingest':
+        paths = args[1:] or sorted(glob.glob('search_results_*.json'))
+        added = ingest_files(paths, index)
+        print(f"✅ 已导入 {len(paths)} 个文件，新增 {added} 个文档 → {index.path}")
+        return 0
+
+    if len(args) < 2:
+        print("❌ 请指定搜索关键词")
+        return 1
+    k = int(args[args.index('--k') + 1]) if '--k' in args else 10
+    start = time.perf_counter()
+    hits = index.search(args[1], k=k)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"🔎 {args[1]} —— {len(hits)} 条结果（{elapsed_ms:.1f}ms）")
+    for i, hit in enumerate(hits, 1):
+        print(f"\n{i:2d}. [{hit['score']:.2f}] {hit['title'] or '(无标题)'}")
+        if hit['url']:
+            print(f"    {hit['url']}")
+        print(f"    {hit['text'][:120]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,77 +1,88 @@
 
 import json
-import os
-import glob
-import re
+import sys
 
-def main():
-    print("Combinining analysis results...")
-    results = []
-    results_dict = {}  # 用于去重
+from run_manifest import RESULTS_FILE, RunManifest, run_id_from_args
+from snapshot_diff import archive_topic_artifacts
+
+def merge_result(rank, analysis, search_data, topic):
+    """Merge one topic's analysis with its search title and manifest heat"""
+    data = dict(analysis)
+    # 排名以清单为准
+    data['rank'] = rank
+
+    # Merge title info and heat
+    if search_data and 'title' in search_data and 'title' not in data:
+        data['title'] = search_data['title']
+
+    data['heat'] = topic.get('heat', 0)
+    if 'title' not in data:  # Fallback title
+        data['title'] = topic.get('title')
+    return data
+
+def publish_results(manifest, results):
+    """Write the combined results into the run, archive artifacts and publish the run"""
+    # 写入本次运行目录（原子替换），其他运行的结果不会混进来
+    output_file = manifest.write_json('results', RESULTS_FILE, results)
+    print(f"✅ Combined {len(results)} files into {output_file}")
 
-    # Ensure directory exists
-    if not os.path.exists('analysis_results'):
-        print("No analysis_results directory found.")
-        return
+    # 按话题存档本次产物，下次运行时未变化的话题可直接复用
+    try:
+        archived = archive_topic_artifacts(manifest.load_json('queries'), manifest)
+        print(f"✅ Archived artifacts for {archived} topics")
+    except Exception as e:
+        print(f"Error archiving artifacts: {e}")
 
-    # Pattern matching the agent's output
-    files = glob.glob('analysis_results/result_*.json')
-    print(f"Found {len(files)} result files.")
+    # 运行完成：runs/latest 指向本运行，报告脚本默认读取它
+    manifest.publish()
+    print(f"✅ Published run {manifest.run_id} as latest")
 
-    for f in sorted(files):
+def combine_run(manifest):
+    """
+    Combine one run's analyses into its results file, archive artifacts and publish the run.
+    Returns None without publishing while any rank is still missing a valid analysis.
+    """
+    results = []
+    for rank in manifest.ranks():
+        f = manifest.artifact(rank, 'analysis')
+        if not f:
+            continue
         try:
             with open(f, 'r', encoding='utf-8') as fd:
-                data = json.load(fd)
-                # Try to extract rank from filename if not in data
-                if 'rank' not in data:
-                    match = re.search(r'result_(\d+).json', f)
-                    if match:
-                        data['rank'] = int(match.group(1))
-
-                # Merge title info and heat
-                rank = data.get('rank')
-                if rank:
-                    # Try to find title from search_results
-                    search_result_file = f"search_results_{rank:02d}.json"
-                    if os.path.exists(search_result_file):
-                         with open(search_result_file, 'r', encoding='utf-8') as sf:
-                             sdata = json.load(sf)
-                             if 'title' in sdata and 'title' not in data:
-                                 data['title'] = sdata['title']
-
-                    # Try to get heat from weibo_search_queries.json
-                    try:
-                        with open('weibo_search_queries.json', 'r', encoding='utf-8') as qf:
-                            queries = json.load(qf)
-                            for q in queries:
-                                if q.get('rank') == rank:
-                                    data['heat'] = q.get('heat', 0)
-                                    if 'title' not in data: # Fallback title
-                                         data['title'] = q.get('title')
-                                    break
-                    except Exception as e:
-                        print(f"Error reading queries: {e}")
-
-                # 使用 rank 作为键去重，只保留每个 rank 的最新数据
-                if rank:
-                    results_dict[rank] = data
-                else:
-                    results.append(data)
+                analysis = json.load(fd)
+
+            sdata = None
+            search_result_file = manifest.artifact(rank, 'search')
+            if search_result_file:
+                with open(search_result_file, 'r', encoding='utf-8') as sf:
+                    sdata = json.load(sf)
+
+            results.append(merge_result(rank, analysis, sdata, manifest.topic(rank)))
         except Exception as e:
             print(f"Skipping {f}: {e}")
 
-    # 将去重后的结果转换为列表
-    results = list(results_dict.values())
+    print(f"Found {len(results)} result files.")
+    missing = manifest.pending('analysis')
+    if missing:
+        # 不完整的运行不发布，runs/latest 仍指向上一次完整的运行
+        print(f"⚠️  Missing or invalid analysis for ranks {', '.join(map(str, missing))} "
+              f"(re-run with --resume {manifest.run_id} to fill them in); not publishing")
+        return None
 
-    # Sort by rank
-    results.sort(key=lambda x: x.get('rank', 999))
+    publish_results(manifest, results)
+    return results
 
-    print(f"✅ 去重后保留 {len(results)} 条唯一结果")
-    
-    output_file = 'hotspot_analysis_results.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"✅ Combined {len(results)} files into {output_file}")
+def main():
+    print("Combinining analysis results...")
+
+    # Locate this run's artifacts through its manifest (--run RUN_ID / WEIBO_RUN_ID / latest run)
+    try:
+        manifest = RunManifest.load(run_id_from_args(sys.argv[1:]))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"No run manifest found: {e}")
+        return 1
+    print(f"Run: {manifest.run_id}")
+    return 0 if combine_run(manifest) is not None else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""pytest 配置"""
+
+# test_agent.py 是调用真实 Claude Agent SDK 的手动测试脚本，不参与自动测试
+collect_ignore = ['test_agent.py']
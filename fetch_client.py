@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享HTTP抓取客户端
+连接池复用 + 指数退避重试（带抖动）+ 单次请求耗时记录 + 熔断器
++ 跨进程令牌桶限流（rate_limiter.py，按接口主机匹配预算）
+"""
+
+import warnings
+# 禁用urllib3的SSL警告（必须在导入requests之前）
+warnings.filterwarnings('ignore', message='urllib3 v2 only supports OpenSSL 1.1.1+')
+
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import get_limiter
+
+# 默认参数（所有抓取入口共用，避免各脚本各写一套超时）
+DEFAULT_TIMEOUT = 15
+DEFAULT_MAX_RETRIES = 3
+BACKOFF_BASE = 0.5       # 首次退避基数（秒）
+BACKOFF_MAX = 8.0        # 单次退避上限（秒）
+POOL_SIZE = 10
+
+# 熔断器参数
+BREAKER_FAILURE_THRESHOLD = 5   # 连续失败多少次后熔断
+BREAKER_RESET_TIMEOUT = 60      # 熔断后多少秒进入半开状态
+
+
+class CircuitOpenError(requests.RequestException):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """简单的三态熔断器（closed / open / half_open）"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None   # 半开状态下正在进行的试探请求的开始时间
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow_request(self):
+        """
+        是否允许发出请求
+        半开状态只放行一次试探请求，结果记录之前其余请求仍直接拒绝；
+        试探请求没有记录结果（例如被其他异常中断）时，超过 reset_timeout 后再放行下一次试探
+        """
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'open':
+                return False
+            now = time.monotonic()
+            if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+                return False
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_started = None
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                # 达到阈值，或半开试探失败：重新计时熔断
+                self.opened_at = time.monotonic()
+
+
+class FetchClient:
+    """带连接池、重试和熔断的HTTP客户端"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, pool_size=POOL_SIZE,
+                 limiter=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # 连接池复用（keep-alive），重试由本类自己控制
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.limiter = limiter or get_limiter()
+        self.breakers = {}
+        self.attempts = []  # 每次尝试的耗时记录
+        self._lock = threading.Lock()
+
+    def _breaker_for(self, host):
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker()
+            return self.breakers[host]
+
+    def _backoff_delay(self, attempt):
+        """指数退避 + 全抖动（full jitter）"""
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def _record_attempt(self, endpoint, attempt, status, latency, error=None):
+        with self._lock:
+            self.attempts.append({
+                'endpoint': endpoint,
+                'attempt': attempt + 1,
+                'status': status,
+                'latency_ms': round(latency * 1000, 1),
+                'error': error
+            })
+
+    @staticmethod
+    def _retry_after(response):
+        """解析 Retry-After 头（只支持秒数）"""
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, url, timeout=None, **kwargs):
+        """发起GET请求（见 request）"""
+        return self.request('GET', url, timeout=timeout, **kwargs)
+
+    def post(self, url, timeout=None, **kwargs):
+        """发起POST请求（见 request；只用于可安全重试的接口）"""
+        return self.request('POST', url, timeout=timeout, **kwargs)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """
+        发起请求
+        每次尝试前先从限流器取令牌（今日配额用完时抛出 QuotaExceededError）。
+        5xx / 429 / 超时 / 连接错误时按指数退避重试；其余 4xx 直接返回由调用方处理。
+        重试耗尽后：5xx / 429 返回最后一次响应，网络异常则抛出。
+        """
+        parts = urlsplit(url)
+        # 记录时只保留路径，避免把 API key 写进日志
+        endpoint = f"{parts.netloc}{parts.path}"
+        breaker = self._breaker_for(parts.netloc)
+        budget = self.limiter.endpoint_for(parts.netloc)
+
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"熔断中，暂停请求 {endpoint}（{breaker.reset_timeout}秒后重试）")
+
+        timeout = timeout or self.timeout
+        last_error = None
+        response = None
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(budget)
+            start = time.perf_counter()
+            delay = self._backoff_delay(attempt)
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                self._record_attempt(endpoint, attempt, None, time.perf_counter() - start,
+                                     error=type(e).__name__)
+                last_error = e
+                response = None
+            else:
+                self._record_attempt(endpoint, attempt, response.status_code,
+                                     time.perf_counter() - start)
+                if response.status_code == 429:
+                    # 被限流：清空共享令牌桶，下一次 acquire 会一直等到 Retry-After 之后
+                    retry_after = self._retry_after(response)
+                    if budget:
+                        self.limiter.record_throttled(budget, retry_after)
+                        delay = 0
+                    elif retry_after is not None:
+                        delay = min(self.backoff_max, retry_after)
+                elif response.status_code < 500:
+                    breaker.record_success()
+                    return response
+
+            if attempt < self.max_retries:
+                # 要重试的响应（可能是 stream=True）先关闭，连接才能回到连接池
+                if response is not None:
+                    response.close()
+                time.sleep(delay)
+
+        breaker.record_failure()
+        if response is not None:
+            return response
+        raise last_error
+
+    def get_json(self, url, timeout=None, **kwargs):
+        """GET并解析JSON（非2xx时抛出 requests.HTTPError）"""
+        response = self.get(url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def post_json(self, url, payload, timeout=None, **kwargs):
+        """POST JSON 并解析响应（非2xx时抛出 requests.HTTPError）"""
+        response = self.post(url, json=payload, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def latency_summary(self):
+        """汇总各次尝试的耗时"""
+        with self._lock:
+            attempts = list(self.attempts)
+        if not attempts:
+            return {'attempts': 0}
+        latencies = sorted(a['latency_ms'] for a in attempts)
+        return {
+            'attempts': len(attempts),
+            'failures': sum(1 for a in attempts
+                            if a['error'] or (a['status'] or 0) == 429 or (a['status'] or 0) >= 500),
+            'min_ms': latencies[0],
+            'max_ms': latencies[-1],
+            'avg_ms': round(sum(latencies) / len(latencies), 1)
+        }
+
+    def print_attempts(self):
+        """打印每次尝试的详情"""
+        for a in self.attempts:
+            status = a['status'] if a['status'] is not None else a['error']
+            print(f"     第{a['attempt']}次 {a['endpoint']} -> {status} ({a['latency_ms']}ms)")
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """获取进程内共享的抓取客户端"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = FetchClient()
+        return _default_client
@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 微博热搜数据获取器
-使用天行数据API
+使用天行数据API；--sources weibo,douyin,baidu（或 WEIBO_SOURCES）可合并多平台热搜
+单平台时边下载边解析热搜列表（流式），每解析出一条就生成该排名的搜索查询，下游可以不等整个列表
+--resume RUN_ID 继续一次中断的运行：该运行已有完整的话题列表时不再重新获取（话题和排名保持不变）
 """
 
 import warnings
@@ -14,97 +16,200 @@ import json
 import sys
 import re
 import os
+import time
 from datetime import datetime
-
-# 从环境变量获取天行数据 API Key
-TIANXING_API_KEY = os.environ.get('TIANXING_API_KEY')
-if not TIANXING_API_KEY:
-    print("❌ 错误: 未找到环境变量 TIANXING_API_KEY")
-    print("请设置环境变量: export TIANXING_API_KEY='your_api_key'")
-    sys.exit(1)
+from itertools import islice
+from urllib.parse import urlsplit
+
+from fetch_client import get_client
+from hot_sources import TIANXING_API_KEY, TIANXING_BASE_URL, aggregate_sources
+from hot_topic import HotTopic
+from json_stream import JsonArrayStream
+from pipeline_config import DEFAULT_TOP_N, get_source_names, get_top_n
+from response_cache import get_cache
+from run_manifest import QUERIES_FILE, RunManifest, run_id_from_args, write_json_atomic
+from snapshot_store import append_snapshot
+from topic_identity import get_index
+from snapshot_diff import apply_reuse, diff_against_previous, print_diff_summary
+from tianxing_stub import record_fixture
 
 # 天行数据微博热搜API
-WEIBO_HOT_URL = f"https://apis.tianapi.com/weibohot/index?key={TIANXING_API_KEY}"
-
-
-def fetch_weibo_hotspot():
-    """获取微博热搜数据"""
-    print("正在获取微博热搜数据...")
-
+# TIANXING_BASE_URL 可指向本地替身服务（tianxing_stub.py），用于离线运行和压测
+WEIBO_HOT_URL = f"{TIANXING_BASE_URL}/weibohot/index?key={TIANXING_API_KEY}"
+# 缓存键只包含服务地址和接口路径，不包含 key
+WEIBO_HOT_CACHE_KEY = f"{urlsplit(TIANXING_BASE_URL).netloc}/weibohot/index"
+
+
+def _fetch_live_payload(client):
+    """请求接口；设置了 TIANXING_RECORD_DIR 时把响应录制为回放样本"""
+    data = client.get_json(WEIBO_HOT_URL)
+    if _is_valid_payload(data):
+        record_fixture('weibohot', data)
+    return data
+
+
+def _is_valid_payload(data):
+    """只有结构正常的响应才写入缓存"""
+    return isinstance(data, dict) and data.get('code') == 200 and 'result' in data
+
+
+def stream_weibo_hotspots(snapshot_info=None):
+    """
+    逐条产出热搜条目
+    命中缓存时直接产出缓存快照；否则边下载边解析（流式），下载完成后写入缓存。
+    snapshot_info 为可选 dict，会写入 fetched_at（快照获取时间戳，在产出第一条之前写入）
+    """
+    snapshot_info = snapshot_info if snapshot_info is not None else {}
+    client = get_client()
+    cache = get_cache()
+
+    # 同一次流水线内各步骤共享缓存快照，过期才重新请求
+    entry, state = cache.lookup(WEIBO_HOT_CACHE_KEY)
+    if state == 'stale':
+        cache.refresh_in_background(WEIBO_HOT_CACHE_KEY, lambda: _fetch_live_payload(client),
+                                    validate=_is_valid_payload)
+    if state in ('fresh', 'stale') and _is_valid_payload(entry['payload']):
+        snapshot_info['fetched_at'] = entry['fetched_at']
+        print(f"♻️  使用缓存快照（{time.time() - entry['fetched_at']:.0f}秒前获取）")
+        yield from entry['payload']['result']['list']
+        return
+
+    snapshot_info['fetched_at'] = time.time()
+    response = client.get(WEIBO_HOT_URL, stream=True)
     try:
-        # 获取热搜数据
-        response = requests.get(WEIBO_HOT_URL, timeout=15)
         response.raise_for_status()
+        items = []
+        stream = JsonArrayStream(response.iter_content(chunk_size=8192), key='list')
+        for item in stream:
+            items.append(item)
+            yield item
+    finally:
+        response.close()
+
+    code = re.search(r'"code"\s*:\s*(\d+)', stream.head)
+    if not stream.found or not code or int(code.group(1)) != 200:
+        raise ValueError(f"数据结构异常: {stream.head[:200]}")
+
+    payload = {'code': 200, 'result': {'list': items}}
+    cache.store(WEIBO_HOT_CACHE_KEY, payload, fetched_at=snapshot_info['fetched_at'])
+    record_fixture('weibohot', payload)
+
+
+def fetch_weibo_snapshot(max_items=DEFAULT_TOP_N, on_query=None):
+    """
+    获取微博热搜数据，返回 (热搜列表, 快照获取时间戳, 前 max_items 条的搜索查询)
+    前 max_items 条一解析出来就生成搜索查询并调用 on_query(query, 快照时间)，
+    下游（例如流水线执行器的搜索预取）不必等整个列表下载、解析完毕
+    """
+    print("正在获取微博热搜数据...")
+
+    if not TIANXING_API_KEY:
+        print("❌ 错误: 未找到环境变量 TIANXING_API_KEY")
+        print("请设置环境变量: export TIANXING_API_KEY='your_api_key'")
+        print("或使用本地替身服务: export TIANXING_BASE_URL='http://127.0.0.1:8765'")
+        return [], None, []
+
+    snapshot_info, hotspots, queries = {}, [], []
 
-        data = response.json()
+    def parsed(stream):
+        for item in stream:
+            hotspots.append(item)
+            yield item
 
-        if data.get('code') == 200 and 'result' in data:
-            hotspots = data['result']['list']
-            print(f"✅ 成功获取 {len(hotspots)} 条热搜数据")
-            return hotspots
-        else:
-            print(f"❌ 数据结构异常: {data}")
-            return []
+    try:
+        items = parsed(stream_weibo_hotspots(snapshot_info))
+        for query in iter_search_queries(items, max_items):
+            queries.append(query)
+            if on_query is not None:
+                on_query(query, snapshot_info['fetched_at'])
+        # 其余条目只用于快照存档
+        for _ in items:
+            pass
+        if not hotspots:
+            print("❌ 数据结构异常: 热搜列表为空")
+            return [], None, []
+        print(f"✅ 成功获取 {len(hotspots)} 条热搜数据")
+        return hotspots, snapshot_info['fetched_at'], queries
 
     except requests.RequestException as e:
         print(f"❌ 请求失败: {e}")
-        return []
+        get_client().print_attempts()
+        return [], None, []
     except json.JSONDecodeError as e:
         print(f"❌ JSON解析失败: {e}")
-        return []
+        return [], None, []
     except Exception as e:
         print(f"❌ 未知错误: {e}")
-        return []
+        return [], None, []
+
+
+def fetch_weibo_hotspot():
+    """获取微博热搜数据"""
+    hotspots, _, _ = fetch_weibo_snapshot()
+    return hotspots
+
+
+def iter_topics(hotspots):
+    """原始热搜条目 → HotTopic（跳过空标题，排名按接口顺序）"""
+    index = get_index()
+    for i, item in enumerate(hotspots):
+        topic = HotTopic.from_item(i + 1, item)
+        if topic is None:
+            continue
+        topic.topic_id = index.resolve(topic.title)
+        yield topic
+
+
+def snapshot_rows(hotspots):
+    """将完整热搜列表转换为快照记录（用于历史存档）"""
+    return [topic.to_row() for topic in iter_topics(hotspots)]
 
 
-def generate_search_queries(hotspots, max_items=15):
+def iter_search_queries(hotspots, max_items=DEFAULT_TOP_N):
+    """逐条生成搜索查询（hotspots 可以是流式产出的迭代器，只读取前 max_items 条）"""
+    current_month = datetime.now().strftime('%Y年%m月')
+
+    for topic in iter_topics(islice(hotspots, max_items)):
+        yield topic.to_query(f"{topic.title} 微博热搜 {current_month}")
+
+
+def generate_search_queries(hotspots, max_items=DEFAULT_TOP_N):
     """为每个热搜生成搜索查询"""
     print(f"\n正在生成搜索查询（前{max_items}条）...")
 
-    queries = []
-    for i, item in enumerate(hotspots[:max_items]):
-        # 获取热搜标题
-        title = item.get('hotword', '')
-        if not title:
-            continue
+    queries = list(iter_search_queries(hotspots, max_items))
+
+    print(f"✅ 已生成 {len(queries)} 个搜索查询")
+    return queries
 
-        # 获取热度（转换为数字，提取数字部分）
-        heat_str = item.get('hotwordnum', '').strip()
-        try:
-            # 使用正则提取数字
-            numbers = re.findall(r'\d+', heat_str)
-            heat = int(numbers[0]) if numbers else 0
-        except (ValueError, IndexError):
-            heat = 0
-
-        # 获取标签
-        tag = item.get('hottag', '').strip()
-
-        # 生成搜索查询
-        current_month = datetime.now().strftime('%Y年%m月')
-        search_query = f"{title} 微博热搜 {current_month}"
-
-        query_info = {
-            'rank': i + 1,
-            'title': title,
-            'heat': heat,
-            'category': tag,
-            'label_name': tag,
-            'search_query': search_query,
-            'raw_data': item
-        }
-
-        queries.append(query_info)
+
+def merged_search_queries(merged, max_items=DEFAULT_TOP_N):
+    """为多平台合并排名生成搜索查询（字段与单平台一致，另带 sources / merged_score）"""
+    print(f"\n正在生成搜索查询（合并榜前{max_items}条）...")
+
+    current_month = datetime.now().strftime('%Y年%m月')
+    queries = []
+    for item in merged[:max_items]:
+        queries.append({
+            'rank': item['rank'],
+            'title': item['title'],
+            'topic_id': item['topic_id'],
+            'heat': item['heat'],
+            'category': item['tag'],
+            'label_name': item['tag'],
+            'search_query': f"{item['title']} 热搜 {current_month}",
+            'merged_score': item['merged_score'],
+            'sources': item['sources']
+        })
 
     print(f"✅ 已生成 {len(queries)} 个搜索查询")
     return queries
 
 
-def save_queries(queries, filename='weibo_search_queries.json'):
-    """保存搜索查询到文件"""
+def save_queries(queries, filename):
+    """保存搜索查询到文件（原子写入）"""
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(queries, f, ensure_ascii=False, indent=2)
+        write_json_atomic(filename, queries)
 
         print(f"✅ 搜索查询已保存到: {filename}")
         return True
@@ -135,36 +240,109 @@ def display_top_hotspots(queries, count=10):
     print(f"\n{'='*60}")
 
 
+def collect_queries(top_n, sources, on_query=None):
+    """
+    获取热搜（单平台或多平台合并）、追加到快照库并生成搜索查询
+    on_query(query, 快照时间): 每生成一条查询就调用；单平台时在热搜列表解析过程中逐条调用
+    返回 (queries, 快照时间, 对比用的来源)；失败时 queries 为空列表
+    """
+    if sources == ['weibo']:
+        # 获取热搜数据（流式解析，前 top_n 条边解析边生成搜索查询）
+        hotspots, fetched_at, queries = fetch_weibo_snapshot(top_n, on_query)
+
+        if not hotspots:
+            print("\n❌ 未能获取到热搜数据")
+            return [], None, None
+        print(f"✅ 已生成 {len(queries)} 个搜索查询（前{top_n}条）")
+
+        # 追加到历史快照库（同一快照重复写入会被忽略），并记录新出现的话题
+        append_snapshot(snapshot_rows(hotspots), fetched_at)
+        get_index().save()
+        diff_source = 'weibo'
+    else:
+        # 多平台：并发获取、统一热度、跨平台去重
+        print(f"正在并发获取热搜: {', '.join(sources)}")
+        merged, per_source = aggregate_sources(sources)
+
+        if not merged:
+            print("\n❌ 未能获取到热搜数据")
+            return [], None, None
+
+        # 各平台原始榜单和合并榜单分别存档；合并榜的时间戳取各平台快照中最新的一个
+        for name, (rows, source_ts) in per_source.items():
+            append_snapshot(rows, source_ts, source=name)
+        fetched_at = max(source_ts for _, source_ts in per_source.values())
+        append_snapshot(merged, fetched_at, source='merged')
+        get_index().save()
+
+        queries = merged_search_queries(merged, max_items=top_n)
+        diff_source = 'merged'
+        if on_query is not None:
+            for query in queries:
+                on_query(query, fetched_at)
+
+    if not queries:
+        print("\n❌ 未能生成有效的搜索查询")
+    return queries, fetched_at, diff_source
+
+
+def prepare_run(queries, fetched_at, diff_source, manifest):
+    """与上一次快照对比、复用历史产物，并把话题列表写入运行目录登记；返回话题文件路径，失败时返回 None"""
+    # 与上一次快照对比，未变化的话题复用历史搜索/分析结果（复制到本次运行目录）
+    diff_against_previous(queries, fetched_at, source=diff_source)
+    apply_reuse(queries, manifest)
+    print_diff_summary(queries)
+
+    # 显示热搜
+    display_top_hotspots(queries, count=10)
+
+    # 保存到运行目录并登记
+    queries_file = manifest.path(QUERIES_FILE)
+    if not save_queries(queries, queries_file):
+        return None
+    manifest.set_topics(queries)
+    manifest.record_file('queries', queries_file)
+    manifest.save()
+    return queries_file
+
+
 def main():
     """主函数"""
+    top_n = get_top_n(sys.argv[1:])
+
     print("=" * 60)
     print("微博热搜数据获取器")
     print("=" * 60)
     print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"分析条数: 前 {top_n} 条")
     print()
 
-    # 获取热搜数据
-    hotspots = fetch_weibo_hotspot()
-
-    if not hotspots:
-        print("\n❌ 未能获取到热搜数据")
-        return 1
-
-    # 生成搜索查询
-    queries = generate_search_queries(hotspots, max_items=15)
-
+    args = sys.argv[1:]
+    if '--resume' in args:
+        # 继续中断的运行：话题列表已完整登记时直接沿用，后续阶段只补做未完成的部分
+        manifest = RunManifest.create(run_id_from_args(args))
+        if manifest.file_complete('queries'):
+            print(f"♻️  继续运行 {manifest.run_id}，沿用已获取的 {len(manifest.ranks())} 个话题")
+            for stage, (done, total) in manifest.progress().items():
+                print(f"   {stage}: 已完成 {done}/{total}")
+            manifest.save()
+            return 0
+        print(f"⚠️  运行 {manifest.run_id} 没有完整的话题列表，重新获取")
+        os.environ['WEIBO_RUN_ID'] = manifest.run_id
+
+    queries, fetched_at, diff_source = collect_queries(top_n, get_source_names(args))
     if not queries:
-        print("\n❌ 未能生成有效的搜索查询")
         return 1
 
-    # 显示热搜
-    display_top_hotspots(queries, count=10)
-
-    # 保存到文件
-    save_queries(queries)
+    # 本次运行的产物目录和清单
+    manifest = RunManifest.create()
+    queries_file = prepare_run(queries, fetched_at, diff_source, manifest)
+    if not queries_file:
+        return 1
 
     print(f"\n✅ 数据获取完成！")
-    print(f"📄 输出文件: weibo_search_queries.json")
+    print(f"🗂️  运行ID: {manifest.run_id}")
+    print(f"📄 输出文件: {queries_file}")
     print(f"💡 下一步: 使用 search_hotspot_details.py 进行深度搜索")
 
     return 0
@@ -4,28 +4,26 @@
 生成微博热搜分析HTML报告 - 苹果设计风格
 """
 
-import json
 import os
 import sys
 from datetime import datetime, timedelta
 
+from run_manifest import RunManifest, run_id_from_args
+
 
 def load_analysis_results():
-    """加载分析结果"""
-    analysis_file = 'hotspot_analysis_results.json'
-    if os.path.exists(analysis_file):
-        try:
-            with open(analysis_file, 'r', encoding='utf-8') as f:
-                results = json.load(f)
-            for r in results:
-                if 'score' in r and 'total_score' not in r:
-                    r['total_score'] = r['score']
-            print(f"✅ 成功加载分析文件: {analysis_file} ({len(results)} 条结果)")
-            return results
-        except Exception as e:
-            print(f"❌ 加载失败: {e}")
-            return []
-    return []
+    """加载已完成运行的分析结果（--run RUN_ID / WEIBO_RUN_ID / runs/latest）"""
+    try:
+        manifest = RunManifest.load(run_id_from_args(sys.argv[1:]), completed=True)
+        results = manifest.load_json('results')
+        for r in results:
+            if 'score' in r and 'total_score' not in r:
+                r['total_score'] = r['score']
+        print(f"✅ 成功加载分析文件: {manifest.file('results')} ({len(results)} 条结果)")
+        return results
+    except Exception as e:
+        print(f"❌ 加载失败: {e}")
+        return []
 
 
 def get_score_badge_class(score):
@@ -759,21 +757,8 @@ def generate_html_report(results, stats):
     return html_content
 
 
-def main():
-    """主函数"""
-    print("=" * 60)
-    print("微博热搜分析报告生成器 (苹果设计风格)")
-    print("=" * 60)
-    print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print()
-
-    # 加载分析结果
-    print("【步骤1/3】加载AI分析结果...")
-    results = load_analysis_results()
-    if not results:
-        print("\n❌ 未能加载分析结果")
-        return 1
-
+def save_report(results):
+    """计算统计、生成HTML报告并写入归档和最新版本，返回 (归档文件, 最新文件)，失败时返回 None"""
     # 计算统计数据
     print("\n【步骤2/3】计算统计数据...")
     stats = calculate_stats(results)
@@ -814,7 +799,30 @@ def main():
 
     except Exception as e:
         print(f"❌ 保存失败: {e}")
+        return None
+
+    return archive_file, latest_file
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("微博热搜分析报告生成器 (苹果设计风格)")
+    print("=" * 60)
+    print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+
+    # 加载分析结果
+    print("【步骤1/3】加载AI分析结果...")
+    results = load_analysis_results()
+    if not results:
+        print("\n❌ 未能加载分析结果")
+        return 1
+
+    saved = save_report(results)
+    if not saved:
         return 1
+    archive_file, latest_file = saved
 
     print("\n" + "=" * 60)
     print("✅ 报告生成完成！")
@@ -6,13 +6,16 @@
 
 import json
 import os
+import sys
 from datetime import datetime
 
+from run_manifest import RunManifest, run_id_from_args
+from topic_identity import TopicIndex
+
 
 def load_data():
-    """加载分析数据"""
-    with open('hotspot_analysis_results.json', 'r', encoding='utf-8') as f:
-        base_results = json.load(f)
+    """加载分析数据（基础分析取自已完成的运行：--run RUN_ID / WEIBO_RUN_ID / runs/latest）"""
+    base_results = RunManifest.load(run_id_from_args(sys.argv[1:]), completed=True).load_json('results')
     
     with open('deep_dive_analysis.json', 'r', encoding='utf-8') as f:
         deep_results = json.load(f)
@@ -50,13 +53,16 @@ def calculate_stats(results):
 def generate_table_rows(results, deep_results):
     """生成表格行"""
     rows = []
-    deep_dive_map = {item['topic']['title']: item for item in deep_results}
+    # 按话题身份匹配深度分析（标题有标点、后缀等细微差异也能对上）
+    topic_index = TopicIndex(path=None)
+    deep_dive_map = {topic_index.resolve(item['topic']['title']): item for item in deep_results}
 
     for result in results:
         score_class = get_score_badge_class(result['total_score'])
         title = result['title']
-        
-        is_deep_dive = title in deep_dive_map
+        topic_id = topic_index.lookup(title)
+
+        is_deep_dive = topic_id in deep_dive_map
         
         # 产品创意部分
         if result['has_idea'] and result['product']:
@@ -83,7 +89,7 @@ def generate_table_rows(results, deep_results):
             # 深度分析创意
             deep_ideas_html = ''
             if is_deep_dive:
-                deep_data = deep_dive_map[title]
+                deep_data = deep_dive_map[topic_id]
                 deep_ideas_html = '''
                     <div class="deep-dive-section">
                         <div class="deep-dive-header">
@@ -525,5 +531,4 @@ def main():
 
 
 if __name__ == "__main__":
-    import sys
     sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多平台热搜源
+每个热搜源负责获取并归一化自己的榜单（标题、排名、热度、标签），
+aggregate_sources() 并发获取所有源，把热度换算到统一的 0-100 分，
+按话题身份（topic_id）跨平台去重后输出一份合并排名
+"""
+
+import asyncio
+import math
+import os
+import time
+from urllib.parse import urlsplit
+
+from fetch_client import get_client
+from hot_topic import HotTopic
+from response_cache import get_cache
+from topic_identity import get_index, normalize_title
+
+# 天行数据接口地址与 Key（TIANXING_BASE_URL 可指向本地替身服务）
+TIANXING_BASE_URL = os.environ.get('TIANXING_BASE_URL', 'https://apis.tianapi.com').rstrip('/')
+TIANXING_API_KEY = os.environ.get('TIANXING_API_KEY')
+# 只有指向本机的替身服务（tianxing_stub.py 不校验 key）时才允许不设置 key
+LOCAL_STUB_HOSTS = ('127.0.0.1', 'localhost', '::1')
+if not TIANXING_API_KEY and urlsplit(TIANXING_BASE_URL).hostname in LOCAL_STUB_HOSTS:
+    TIANXING_API_KEY = 'offline'
+
+# 多个平台同时上榜时的加分比例（每多一个平台 +10%）
+CROSS_SOURCE_BONUS = 0.1
+
+
+class HotSource:
+    """热搜源基类：子类实现 fetch_items()，返回原始条目列表"""
+
+    name = ''
+    label = ''
+
+    def fetch_items(self):
+        raise NotImplementedError
+
+    def to_topic(self, rank, item):
+        """原始条目 → HotTopic（标题为空时返回 None）"""
+        raise NotImplementedError
+
+    def normalize(self, items):
+        """转换为统一的榜单记录"""
+        index = get_index()
+        rows = []
+        for i, item in enumerate(items):
+            topic = self.to_topic(i + 1, item)
+            if topic is None:
+                continue
+            topic.topic_id = index.resolve(topic.title)
+            rows.append(topic.to_row())
+        return rows
+
+    async def fetch(self):
+        """异步获取（阻塞的 HTTP 请求放到线程里执行），返回 (rows, fetched_at)"""
+        items, fetched_at = await asyncio.to_thread(self.fetch_items)
+        return self.normalize(items), fetched_at
+
+
+class TianxingHotSource(HotSource):
+    """天行数据热榜接口：/<endpoint>/index，结果在 result.list 中"""
+
+    def __init__(self, name, label, endpoint, title_field, heat_field, tag_field=None):
+        self.name = name
+        self.label = label
+        self.endpoint = endpoint
+        self.title_field = title_field
+        self.heat_field = heat_field
+        self.tag_field = tag_field
+
+    @property
+    def url(self):
+        return f"{TIANXING_BASE_URL}/{self.endpoint}/index?key={TIANXING_API_KEY}"
+
+    @property
+    def cache_key(self):
+        # 与 fetch_weibo_hotspot 使用相同格式，微博源和单源流程共享同一份缓存快照
+        return f"{urlsplit(TIANXING_BASE_URL).netloc}/{self.endpoint}/index"
+
+    def fetch_items(self):
+        if not TIANXING_API_KEY:
+            raise RuntimeError("未找到环境变量 TIANXING_API_KEY")
+        client = get_client()
+        data, fetched_at = get_cache().get_or_fetch(
+            self.cache_key,
+            lambda: client.get_json(self.url),
+            validate=lambda d: isinstance(d, dict) and d.get('code') == 200 and 'result' in d
+        )
+        if not (isinstance(data, dict) and data.get('code') == 200 and 'result' in data):
+            raise ValueError(f"数据结构异常: {str(data)[:200]}")
+        return data['result']['list'], fetched_at
+
+    def to_topic(self, rank, item):
+        return HotTopic.from_item(rank, item, self.title_field, self.heat_field, self.tag_field, self.name)
+
+
+# 已注册的热搜源（抖音、百度字段名按天行数据接口文档配置）
+SOURCES = {
+    'weibo': TianxingHotSource('weibo', '微博', 'weibohot', 'hotword', 'hotwordnum', 'hottag'),
+    'douyin': TianxingHotSource('douyin', '抖音', 'douyinhot', 'word', 'hotindex', 'label'),
+    'baidu': TianxingHotSource('baidu', '百度', 'nethot', 'keyword', 'index'),
+}
+
+
+def get_sources(names):
+    """按名称获取热搜源，未知名称抛出 ValueError"""
+    unknown = [n for n in names if n not in SOURCES]
+    if unknown:
+        raise ValueError(f"未知的热搜源: {', '.join(unknown)}（可选: {', '.join(SOURCES)}）")
+    return [SOURCES[n] for n in names]
+
+
+def normalize_heat(rows):
+    """
+    把单个平台的热度换算到 0-100：对数后做 min-max 缩放
+    （各平台热度量级差异很大，取对数后排名靠前的差距更合理）；
+    平台没有热度数据时按排名折算
+    """
+    heats = [r['heat'] for r in rows if r['heat'] > 0]
+    if len(heats) >= 2 and max(heats) > min(heats):
+        low, high = math.log1p(min(heats)), math.log1p(max(heats))
+        for r in rows:
+            r['score'] = round(100 * (math.log1p(r['heat']) - low) / (high - low), 2) if r['heat'] > 0 else 0.0
+    else:
+        total = len(rows)
+        for r in rows:
+            r['score'] = round(100 * (1 - (r['rank'] - 1) / total), 2)
+    return rows
+
+
+def _merge_key(row):
+    """跨平台去重用的键：topic_id，没有时退回归一化标题"""
+    return row['topic_id'] or f"title:{normalize_title(row['title'])}"
+
+
+def merge_rankings(per_source_rows):
+    """按 topic_id（没有时按归一化标题）跨平台去重，生成合并排名"""
+    merged = {}
+    for rows in per_source_rows:
+        for r in normalize_heat(rows):
+            key = _merge_key(r)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = entry = {'best': r, 'sources': {}}
+            elif r['score'] > entry['best']['score']:
+                entry['best'] = r
+            entry['sources'][r['source']] = {'rank': r['rank'], 'heat': r['heat'], 'score': r['score']}
+
+    ranked = []
+    for entry in merged.values():
+        best = entry['best']
+        bonus = 1 + CROSS_SOURCE_BONUS * (len(entry['sources']) - 1)
+        ranked.append({
+            'title': best['title'],
+            'topic_id': best['topic_id'],
+            'heat': best['heat'],
+            'tag': best['tag'],
+            'merged_score': round(min(100.0, best['score'] * bonus), 2),
+            'sources': entry['sources']
+        })
+
+    ranked.sort(key=lambda x: -x['merged_score'])
+    for i, item in enumerate(ranked):
+        item['rank'] = i + 1
+    return ranked
+
+
+async def fetch_all(sources):
+    """并发获取所有热搜源，总耗时约等于最慢的一个；失败的源跳过"""
+    async def timed(source):
+        start = time.perf_counter()
+        try:
+            rows, fetched_at = await source.fetch()
+            return source, rows, fetched_at, time.perf_counter() - start, None
+        except Exception as e:
+            return source, [], None, time.perf_counter() - start, e
+
+    return await asyncio.gather(*(timed(s) for s in sources))
+
+
+def aggregate_sources(names):
+    """
+    获取并合并多个平台的热搜榜
+    返回 (合并排名, {source: (rows, fetched_at)})
+    """
+    sources = get_sources(names)
+    start = time.perf_counter()
+    results = asyncio.run(fetch_all(sources))
+    elapsed = time.perf_counter() - start
+
+    per_source = {}
+    for source, rows, fetched_at, duration, error in results:
+        if error is not None:
+            print(f"  ❌ {source.label}热搜获取失败: {error}（{duration:.2f}秒）")
+            continue
+        print(f"  ✅ {source.label}热搜: {len(rows)} 条（{duration:.2f}秒）")
+        per_source[source.name] = (rows, fetched_at)
+
+    merged = merge_rankings([rows for rows, _ in per_source.values()])
+    print(f"✅ 合并后共 {len(merged)} 个话题（并发获取总耗时 {elapsed:.2f}秒）")
+    return merged, per_source
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热搜条目记录与热度解析
+HotTopic 用 __slots__ 存放一条热搜的排名、标题、热度、标签和话题ID，
+不保留接口原始字典；parse_heat 用一个预编译的正则解析热度字符串：
+千分位分隔符（"1,061,448"）、万/亿单位（"106万"、"1.2亿"）和前缀标签（"演出 492525"）
+
+用法:
+    python3 hot_topic.py bench [--items 20000]   # 对比旧的 dict 路径：耗时和内存
+"""
+
+import re
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+# 一次匹配拆出：前缀标签（如"演出"、"剧集"）+ 数字（可带千分位和小数）+ 可选单位
+_HEAT_PATTERN = re.compile(r'\s*(\D*?)\s*(\d[\d,，]*(?:\.\d+)?)\s*(万|亿|[wW])?')
+_UNITS = {None: 1, '万': 10_000, 'w': 10_000, 'W': 10_000, '亿': 100_000_000}
+
+
+def split_heat(value):
+    """热度字符串 → (热度 int, 数字前的标签)；"演出 492525" → (492525, "演出")，无法解析时热度为 0"""
+    if value.__class__ is not str:
+        return (int(value), '') if isinstance(value, (int, float)) else (0, '')
+    # 快速路径：绝大多数热度是纯数字（接口返回带前导空格，如 " 1018477"）
+    stripped = value.strip()
+    if stripped.isdigit():
+        return int(stripped), ''
+    match = _HEAT_PATTERN.match(stripped)
+    if match is None:
+        return 0, stripped
+    label, number, unit = match.groups()
+    if unit is None and number.isdigit():
+        return int(number), label
+    number = number.replace(',', '').replace('，', '')
+    # 用 Decimal 计算：float 乘法会把 "1.15亿" 截断成 114999999
+    return int(Decimal(number) * _UNITS[unit]), label
+
+
+def parse_heat(value):
+    """热度 → int；无法解析时返回 0"""
+    return split_heat(value)[0]
+
+
+class HotTopic:
+    """一条热搜记录"""
+
+    __slots__ = ('rank', 'title', 'heat', 'tag', 'label', 'topic_id', 'source')
+
+    def __init__(self, rank, title, heat=0, tag='', label='', topic_id='', source='weibo'):
+        self.rank = rank
+        self.title = title
+        self.heat = heat
+        self.tag = tag
+        self.label = label
+        self.topic_id = topic_id
+        self.source = source
+
+    @classmethod
+    def from_item(cls, rank, item, title_field='hotword', heat_field='hotwordnum', tag_field='hottag',
+                  source='weibo'):
+        """从接口原始条目构建，标题为空时返回 None"""
+        title = (item.get(title_field) or '').strip()
+        if not title:
+            return None
+        heat, label = split_heat(item.get(heat_field, ''))
+        tag = item.get(tag_field) or '' if tag_field else ''
+        tag = tag.strip() if tag.__class__ is str else str(tag)
+        return cls(rank, title, heat, tag, label, '', source)
+
+    def to_row(self):
+        """快照存档记录"""
+        return {
+            'source': self.source,
+            'rank': self.rank,
+            'title': self.title,
+            'heat': self.heat,
+            'tag': self.tag,
+            'topic_id': self.topic_id
+        }
+
+    def to_query(self, search_query):
+        """搜索查询记录（weibo_search_queries.json 的一项）"""
+        query = {
+            'rank': self.rank,
+            'title': self.title,
+            'topic_id': self.topic_id,
+            'heat': self.heat,
+            'category': self.tag,
+            'label_name': self.tag,
+            'search_query': search_query
+        }
+        if self.label:
+            query['heat_label'] = self.label
+        return query
+
+    def __repr__(self):
+        return f"HotTopic(#{self.rank} {self.title!r} heat={self.heat})"
+
+
+def _legacy_query(i, item):
+    """旧实现：每条热搜一个 dict，正则取第一段数字，并保留整个原始条目"""
+    numbers = re.findall(r'\d+', item.get('hotwordnum', '').strip())
+    tag = item.get('hottag', '').strip()
+    return {
+        'rank': i + 1,
+        'title': item.get('hotword', ''),
+        'heat': int(numbers[0]) if numbers else 0,
+        'category': tag,
+        'label_name': tag,
+        'raw_data': item
+    }
+
+
+def _sample_items(count):
+    """回放样本：逐条产出原始条目，模拟从历史归档流式解析（每条都是新的 dict 和字符串）"""
+    # 热度写法的比例大致按真实归档：多数是纯数字，少量带标签、千分位或单位
+    heats = [' 1018477', ' 733052', ' 606003', '演出 492525', ' 206654', ' 202257', ' 175506', '1,061,448',
+             ' 135605', ' 135141', '106万', ' 128004', '剧集 89万', ' 115003', '1.2亿', '']
+    tags = ['', '新', '热', '沸']
+    for i in range(count):
+        yield {'hotword': f"热搜话题{i}号", 'hotwordnum': heats[i % len(heats)], 'hottag': tags[i % len(tags)]}
+
+
+def _measure(build, count):
+    """
+    构建 count 条记录：耗时（单独计时，扣除生成样本本身的时间，取 3 次最小值）
+    和峰值内存（原始条目只被记录引用时才会留在内存里）
+    """
+    elapsed = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _item in _sample_items(count):
+            pass
+        baseline = time.perf_counter() - start
+        start = time.perf_counter()
+        build(_sample_items(count))
+        elapsed = min(elapsed, time.perf_counter() - start - baseline)
+
+    tracemalloc.start()
+    records = build(_sample_items(count))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, elapsed, peak
+
+
+def run_bench(count=20000):
+    """对比旧的 dict 路径和 HotTopic 路径：构建耗时与峰值内存"""
+    legacy, legacy_s, legacy_peak = _measure(
+        lambda items: [_legacy_query(i, item) for i, item in enumerate(items)], count)
+    topics, topic_s, topic_peak = _measure(
+        lambda items: [HotTopic.from_item(i + 1, item) for i, item in enumerate(items)], count)
+    wrong = sum(1 for a, b in zip(legacy, topics) if a['heat'] != b.heat)
+
+    print(f"📊 热度解析基准: {count} 条")
+    print(f"   dict 路径:     {legacy_s * 1000:8.1f}ms  峰值内存 {legacy_peak / 1024:8.0f}KB")
+    print(f"   HotTopic 路径: {topic_s * 1000:8.1f}ms  峰值内存 {topic_peak / 1024:8.0f}KB")
+    print(f"   旧解析结果不同的条目: {wrong}（千分位 / 万 / 亿）")
+    return legacy_s, topic_s, legacy_peak, topic_peak
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] != 'bench':
+        print(__doc__)
+        return 1
+    count = int(args[args.index('--items') + 1]) if '--items' in args else 20000
+    run_bench(count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
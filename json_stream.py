@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式 JSON 数组解析
+从分块到达的响应体中找到指定字段的数组，每解析完一个元素就立即产出，
+下游不必等整个响应下载、解析完毕
+"""
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'[\s,]*')
+
+
+class JsonArrayStream:
+    """
+    逐个产出 JSON 文本中 "<key>": [...] 数组的元素
+    chunks 可以是 str 或 bytes 的可迭代对象（bytes 按 UTF-8 增量解码）
+    迭代结束后 head 保存数组之前的文本，可用于检查 code 等字段
+    """
+
+    def __init__(self, chunks, key='list'):
+        self.chunks = iter(chunks)
+        self.key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self.head = ''
+        self.found = False
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    def _read(self):
+        """读取下一块文本，没有更多数据时返回 None"""
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._utf8.decode(chunk)
+            if chunk:
+                return chunk
+        tail = self._utf8.decode(b'', final=True)
+        return tail or None
+
+    def __iter__(self):
+        buffer = ''
+        # 1. 找到数组起始位置
+        while True:
+            match = self.key_pattern.search(buffer)
+            if match:
+                self.head = buffer[:match.start()]
+                buffer = buffer[match.end():]
+                self.found = True
+                break
+            chunk = self._read()
+            if chunk is None:
+                self.head = buffer
+                return
+            buffer += chunk
+
+        # 2. 逐个解析数组元素
+        pos = 0
+        exhausted = False
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                item, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 元素还没下载完整：继续读取；已经读完仍失败则是格式错误
+                if exhausted:
+                    raise
+                chunk = self._read()
+                if chunk is None:
+                    exhausted = True
+                else:
+                    buffer = buffer[pos:] + chunk
+                    pos = 0
+                continue
+            yield item
+            pos = end
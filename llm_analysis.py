@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+直接调用模型 API 的分析阶段
+把 analyze_hotspot_with_ai 生成的提示直接发给 Messages API（流式响应），
+校验评分格式后写入 analysis_results/result_XX.json，不再需要 agent 逐个读取提示、逐个写结果。
+请求走共享抓取客户端（连接池、重试、熔断）并计入 anthropic 限流预算，多个话题并发分析。
+
+用法:
+    python3 llm_analysis.py [--run RUN_ID] [--concurrency 3] [--batch]
+                                    # 分析运行中所有仍缺少有效分析结果、且已有提示的话题
+                                    # --batch: 多个话题合并成一个请求，共用一份评分标准
+    python3 pipeline.py --analyzer anthropic ...
+    python3 run_pipeline_automation.py --execute --analyzer anthropic ...
+
+环境变量:
+    ANTHROPIC_API_KEY           API 密钥（x-api-key 头）
+    ANTHROPIC_AUTH_TOKEN        没有 API 密钥时使用的访问令牌（authorization: Bearer 头）
+    ANTHROPIC_BASE_URL          API 地址（默认 https://api.pipellm.com）
+    WEIBO_LLM_MODEL             模型（默认 claude-sonnet-4-5）
+    WEIBO_LLM_MAX_TOKENS        单次分析的最大输出 token 数（默认 1024）
+    WEIBO_LLM_TIMEOUT           单次请求超时秒数（默认 120）
+    WEIBO_LLM_MAX_ATTEMPTS      输出不符合格式时最多请求几次（默认 2）
+    WEIBO_LLM_BATCH             设为 1 时启用批量模式（pipeline / run_pipeline_automation 同样生效）
+    WEIBO_LLM_BATCH_TOKENS      单个批量请求的 token 预算（输入 + 预留输出，默认 6000），据此决定每批话题数
+    WEIBO_LLM_BATCH_MAX         每批最多话题数（默认 8）
+    WEIBO_LLM_TOPIC_OUTPUT_TOKENS  每个话题预留的输出 token 数（默认 400）
+    WEIBO_LLM_PROMPT_CACHE      设为 0 时不给静态前缀加 cache_control（默认开启）
+
+批量模式下整批输出无法解析或部分话题的结果不合格时，只把这些话题对半拆分后重新请求，
+拆到单个话题时改用单话题提示。
+
+提示的静态前缀（评分标准、输出格式、示例）单独作为一个内容块并标记 cache_control，
+话题内容在其后；服务端命中前缀缓存时这部分输入按缓存价计费。
+每次分析结束打印缓存读取 / 写入 / 未缓存的输入 token，并累计写入运行目录的 llm_usage.json。
+
+分析结果另有一层缓存（analysis_cache.py）：话题和归一化后的搜索摘要、模板版本、模型都相同时
+直接复用上次的评分，不再发请求；复用的结果带 reused 标记。
+未命中缓存的话题可先经本地预筛模型（prefilter_model.py，WEIBO_PREFILTER=shadow|on）过滤低潜力话题。
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from analysis_cache import with_cache
+from analyze_hotspot_with_ai import (PROMPT_TEMPLATE_VERSION, extract_search_snippet,
+                                     generate_batch_analysis_prompt, split_prompt)
+from fetch_client import get_client
+from prefilter_model import record_prefilter, with_prefilter
+from run_manifest import RunManifest, run_id_from_args, write_json_atomic
+from snippet_builder import estimate_tokens
+
+ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL', 'https://api.pipellm.com')
+ANTHROPIC_VERSION = '2023-06-01'
+LLM_MODEL = os.environ.get('WEIBO_LLM_MODEL', 'claude-sonnet-4-5')
+LLM_MAX_TOKENS = int(os.environ.get('WEIBO_LLM_MAX_TOKENS', '1024'))
+LLM_TIMEOUT = float(os.environ.get('WEIBO_LLM_TIMEOUT', '120'))
+LLM_MAX_ATTEMPTS = int(os.environ.get('WEIBO_LLM_MAX_ATTEMPTS', '2'))
+LLM_CONCURRENCY = int(os.environ.get('WEIBO_ANALYZE_CONCURRENCY', '3'))
+LLM_BATCH = os.environ.get('WEIBO_LLM_BATCH', '0') == '1'
+LLM_BATCH_TOKENS = int(os.environ.get('WEIBO_LLM_BATCH_TOKENS', '6000'))
+LLM_BATCH_MAX = int(os.environ.get('WEIBO_LLM_BATCH_MAX', '8'))
+LLM_TOPIC_OUTPUT_TOKENS = int(os.environ.get('WEIBO_LLM_TOPIC_OUTPUT_TOKENS', '400'))
+LLM_PROMPT_CACHE = os.environ.get('WEIBO_LLM_PROMPT_CACHE', '1') != '0'
+
+# 用量统计中按次累加的字段（写入 llm_usage.json 时与之前的调用合并）
+USAGE_FIELDS = ('requests', 'retries', 'batches', 'splits', 'input_tokens', 'cache_read_input_tokens',
+                'cache_creation_input_tokens', 'output_tokens')
+
+_JSON_FENCE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.S)
+_COMMENT = re.compile(r'//[^\n"]*$', re.M)
+_SEPARATOR = re.compile(r'[\s,]*')
+
+
+class AnalysisError(ValueError):
+    """模型返回错误事件，或输出无法解析为符合格式的分析结果"""
+
+
+class Analyzer:
+    """分析器接口：analyze() 返回分析结果字典（fun_score / useful_score / total_score / ...）"""
+
+    name = ''
+
+    def analyze(self, prompt, query):
+        raise NotImplementedError
+
+    def analyze_group(self, items):
+        """
+        分析一组话题 items: [(query, search_summary, prompt), ...]，返回 ({排名: 结果}, {排名: 错误})
+        默认逐个调用 analyze()；支持批量请求的分析器可以覆盖
+        """
+        results, errors = {}, {}
+        for query, _, prompt in items:
+            try:
+                results[query['rank']] = self.analyze(prompt, query)
+            except Exception as e:
+                errors[query['rank']] = e
+        return results, errors
+
+
+def iter_sse_data(lines):
+    """逐个产出 SSE 流中 data: 行的 JSON 事件（忽略 event: 行、注释和心跳）"""
+    for line in lines:
+        if not line or not line.startswith('data:'):
+            continue
+        payload = line[5:].strip()
+        if payload and payload != '[DONE]':
+            yield json.loads(payload)
+
+
+def read_message_stream(lines):
+    """
+    读取 Messages API 的流式事件，拼接文本增量
+    返回 (文本, 用量, stop_reason)；收到 error 事件时抛出 AnalysisError
+    用量: input_tokens（未缓存部分）/ cache_read_input_tokens / cache_creation_input_tokens / output_tokens
+    """
+    parts = []
+    usage = {'input_tokens': 0, 'cache_read_input_tokens': 0, 'cache_creation_input_tokens': 0, 'output_tokens': 0}
+    stop_reason = None
+    for event in iter_sse_data(lines):
+        kind = event.get('type')
+        if kind == 'message_start':
+            start_usage = event.get('message', {}).get('usage', {})
+            for key in ('input_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+                usage[key] = start_usage.get(key) or 0
+        elif kind == 'content_block_delta':
+            delta = event.get('delta', {})
+            if delta.get('type') == 'text_delta':
+                parts.append(delta.get('text', ''))
+        elif kind == 'message_delta':
+            usage['output_tokens'] = event.get('usage', {}).get('output_tokens', usage['output_tokens'])
+            stop_reason = event.get('delta', {}).get('stop_reason') or stop_reason
+        elif kind == 'error':
+            error = event.get('error', {})
+            raise AnalysisError(f"{error.get('type', 'error')}: {error.get('message', '')}")
+    return ''.join(parts), usage, stop_reason
+
+
+def extract_json(text):
+    """从模型输出中取出 JSON 对象（兼容 ```json 代码块和提示模板里的 // 注释）"""
+    match = _JSON_FENCE.search(text)
+    candidate = match.group(1) if match else text[text.find('{'):text.rfind('}') + 1]
+    if not candidate:
+        raise AnalysisError("输出中没有 JSON 对象")
+    for body in (candidate, _COMMENT.sub('', candidate)):
+        try:
+            return json.loads(body)
+        except ValueError:
+            continue
+    raise AnalysisError("输出中的 JSON 无法解析")
+
+
+def extract_json_array(text):
+    """
+    从批量输出中取出 JSON 数组的各个元素（兼容 // 注释）
+    输出被截断时保留已经完整的元素，缺失的话题由调用方拆分重试
+    """
+    start = text.find('[')
+    if start < 0:
+        raise AnalysisError("输出中没有 JSON 数组")
+    body = _COMMENT.sub('', text[start + 1:])
+    decoder = json.JSONDecoder()
+    entries = []
+    pos = _SEPARATOR.match(body).end()
+    while pos < len(body) and body[pos] != ']':
+        try:
+            entry, pos = decoder.raw_decode(body, pos)
+        except ValueError:
+            break
+        entries.append(entry)
+        pos = _SEPARATOR.match(body, pos).end()
+    return entries
+
+
+def plan_batches(items, token_budget=LLM_BATCH_TOKENS, max_size=LLM_BATCH_MAX,
+                 output_tokens=LLM_TOPIC_OUTPUT_TOKENS):
+    """
+    按 token 预算把话题装箱：共用部分（评分标准、输出格式）只计一次，
+    每个话题计入其标题和背景信息的估算 token 数，外加预留的输出 token
+    items: [(query, search_summary, prompt), ...]
+    """
+    overhead = estimate_tokens(generate_batch_analysis_prompt([]))
+    batches, current, used = [], [], overhead
+    for item in items:
+        query, search_summary, _ = item
+        cost = estimate_tokens(query.get('title', '') + search_summary) + output_tokens
+        if current and (used + cost > token_budget or len(current) >= max_size):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _score(data, key, maximum):
+    value = data.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= maximum:
+        raise AnalysisError(f"{key} 缺失或不在 0-{maximum} 范围内: {value!r}")
+    return int(round(value))
+
+
+def validate_analysis(data):
+    """
+    校验并规范化分析结果：分项分数在范围内，总分按分项重新计算，
+    总分 < 60 或缺少产品信息时 has_idea=False、product=None
+    """
+    if not isinstance(data, dict):
+        raise AnalysisError("分析结果不是 JSON 对象")
+    fun_score = _score(data, 'fun_score', 80)
+    useful_score = _score(data, 'useful_score', 20)
+    total_score = fun_score + useful_score
+    product = data.get('product')
+    has_idea = bool(data.get('has_idea')) and total_score >= 60 \
+        and isinstance(product, dict) and bool(product.get('name'))
+    return {
+        'fun_score': fun_score,
+        'fun_reason': str(data.get('fun_reason', '')),
+        'useful_score': useful_score,
+        'useful_reason': str(data.get('useful_reason', '')),
+        'total_score': total_score,
+        'has_idea': has_idea,
+        'product': product if has_idea else None,
+        'summary': str(data.get('summary', '')),
+        'analysis_notes': str(data.get('analysis_notes', ''))
+    }
+
+
+def _entry_rank(entry):
+    """批量结果条目的排名（模型可能把 3 写成 "3"）；无法解析时返回 None"""
+    if not isinstance(entry, dict):
+        return None
+    try:
+        return int(str(entry.get('rank')).strip().lstrip('#'))
+    except ValueError:
+        return None
+
+
+class AnthropicAnalyzer(Analyzer):
+    """Messages API 分析器（流式响应，经共享抓取客户端重试和限流，可在多个线程中并发调用）"""
+
+    name = 'anthropic'
+
+    def __init__(self, model=LLM_MODEL, api_key=None, base_url=ANTHROPIC_BASE_URL,
+                 max_tokens=LLM_MAX_TOKENS, max_attempts=LLM_MAX_ATTEMPTS, batch=LLM_BATCH, client=None):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts 至少为 1（当前 {max_attempts}）")
+        # API 密钥只放在 x-api-key；访问令牌（ANTHROPIC_AUTH_TOKEN）走 authorization: Bearer
+        api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
+        auth_token = os.environ.get('ANTHROPIC_AUTH_TOKEN')
+        if api_key:
+            self.auth_headers = {'x-api-key': api_key}
+        elif auth_token:
+            self.auth_headers = {'authorization': f'Bearer {auth_token}'}
+        else:
+            raise RuntimeError("未找到环境变量 ANTHROPIC_API_KEY（或 ANTHROPIC_AUTH_TOKEN）")
+        self.model = model
+        self.url = base_url.rstrip('/') + '/v1/messages'
+        self.max_tokens = max_tokens
+        self.max_attempts = max_attempts
+        self.batch = batch
+        self.client = client or get_client()
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def _content(self, prompt):
+        """用户消息内容：静态前缀单独一块并标记 cache_control，话题后缀另起一块"""
+        prefix, suffix = split_prompt(prompt)
+        if not (prefix and LLM_PROMPT_CACHE):
+            return prompt
+        return [
+            {'type': 'text', 'text': prefix, 'cache_control': {'type': 'ephemeral'}},
+            {'type': 'text', 'text': suffix}
+        ]
+
+    def complete(self, prompt, max_tokens=None):
+        """发送一条提示并读取流式响应，返回 (文本, stop_reason)"""
+        response = self.client.post(self.url, timeout=LLM_TIMEOUT, stream=True, headers={
+            **self.auth_headers,
+            'anthropic-version': ANTHROPIC_VERSION,
+            'content-type': 'application/json'
+        }, json={
+            'model': self.model,
+            'max_tokens': max_tokens or self.max_tokens,
+            'stream': True,
+            'messages': [{'role': 'user', 'content': self._content(prompt)}]
+        })
+        with response:
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            text, usage, stop_reason = read_message_stream(response.iter_lines(decode_unicode=True))
+        with self._lock:
+            self.usage['requests'] += 1
+            for key, value in usage.items():
+                self.usage[key] += value
+        return text, stop_reason
+
+    def analyze(self, prompt, query):
+        """分析一个话题；输出不符合格式时重新请求，最多 max_attempts 次"""
+        for attempt in range(self.max_attempts):
+            if attempt:
+                with self._lock:
+                    self.usage['retries'] += 1
+            try:
+                text, stop_reason = self.complete(prompt)
+                if stop_reason == 'max_tokens':
+                    raise AnalysisError(f"输出超过 {self.max_tokens} token 被截断")
+                result = validate_analysis(extract_json(text))
+            except AnalysisError as e:
+                error = e
+                print(f"  ⚠️  #{query['rank']:2d} 第{attempt + 1}次分析结果无效: {e}")
+                continue
+            result['model'] = self.model
+            return result
+        raise error
+
+    def analyze_batch(self, items):
+        """
+        一个请求分析多个话题，逐个校验数组里的结果
+        返回 ({排名: 结果}, {排名: 错误})；整批输出无法解析时所有话题都记为失败
+        """
+        ranks = [query['rank'] for query, _, _ in items]
+        prompt = generate_batch_analysis_prompt([(query, summary) for query, summary, _ in items])
+        with self._lock:
+            self.usage['batches'] += 1
+        try:
+            text, stop_reason = self.complete(prompt, max_tokens=LLM_TOPIC_OUTPUT_TOKENS * len(items))
+            entries = extract_json_array(text)
+        except AnalysisError as e:
+            return {}, {rank: e for rank in ranks}
+
+        by_rank, unknown = {}, []
+        for entry in entries:
+            rank = _entry_rank(entry)
+            if rank in ranks and rank not in by_rank:
+                by_rank[rank] = entry
+            else:
+                unknown.append(entry.get('rank') if isinstance(entry, dict) else entry)
+        results, failed = {}, {}
+        for rank in ranks:
+            if rank not in by_rank:
+                if stop_reason == 'max_tokens':
+                    reason = "批量输出被截断"
+                elif unknown:
+                    reason = f"批量输出缺少该话题（有 {len(unknown)} 条结果的 rank 无法对应: {unknown[:3]}）"
+                else:
+                    reason = "批量输出缺少该话题"
+                failed[rank] = AnalysisError(reason)
+                continue
+            try:
+                result = validate_analysis(by_rank[rank])
+            except AnalysisError as e:
+                failed[rank] = e
+                continue
+            result['model'] = self.model
+            results[rank] = result
+        return results, failed
+
+    def analyze_group(self, items):
+        """
+        分析一组话题：多个话题时发批量请求，只把失败的话题对半拆分重试；单个话题用单话题提示
+        items: [(query, search_summary, prompt), ...]；返回 ({排名: 结果}, {排名: 错误})
+        """
+        if len(items) == 1:
+            query, _, prompt = items[0]
+            try:
+                return {query['rank']: self.analyze(prompt, query)}, {}
+            except Exception as e:
+                return {}, {query['rank']: e}
+
+        results, failed = self.analyze_batch(items)
+        retry = [item for item in items if item[0]['rank'] in failed]
+        if not retry:
+            return results, {}
+        print(f"  ✂️  批量结果中 {len(retry)}/{len(items)} 个话题无效，拆分重试: "
+              f"{', '.join(str(item[0]['rank']) for item in retry)}")
+        with self._lock:
+            self.usage['splits'] += 1
+        errors = {}
+        middle = (len(retry) + 1) // 2
+        for part in (retry[:middle], retry[middle:]):
+            if part:
+                part_results, part_errors = self.analyze_group(part)
+                results.update(part_results)
+                errors.update(part_errors)
+        return results, errors
+
+    def print_usage(self):
+        """打印请求数和 token 用量（输入分为缓存读取 / 缓存写入 / 未缓存）"""
+        print_usage(self.usage)
+
+
+def print_usage(u):
+    """打印一份用量统计"""
+    batches = f"，其中批量请求 {u['batches']} 次、拆分重试 {u['splits']} 次" if u['batches'] else ''
+    total_input = u['input_tokens'] + u['cache_read_input_tokens'] + u['cache_creation_input_tokens']
+    hit_rate = u['cache_read_input_tokens'] / total_input if total_input else 0.0
+    print(f"🧾 模型调用 {u['requests']} 次（格式重试 {u['retries']} 次{batches}），"
+          f"输入 {total_input} token（缓存读取 {u['cache_read_input_tokens']}，缓存写入 "
+          f"{u['cache_creation_input_tokens']}，未缓存 {u['input_tokens']}，缓存命中率 {hit_rate:.0%}），"
+          f"输出 {u['output_tokens']} token")
+
+
+def record_usage(manifest, analyzer):
+    """把本次调用的用量累加到运行目录的 llm_usage.json，返回累计用量"""
+    usage = getattr(analyzer, 'usage', None)
+    if not usage or not usage['requests']:
+        return None
+    total = manifest.load_json('llm_usage') if manifest.file_complete('llm_usage') else {}
+    for key in USAGE_FIELDS:
+        total[key] = total.get(key, 0) + usage[key]
+    total['model'] = analyzer.model
+    total['prompt_template_version'] = PROMPT_TEMPLATE_VERSION
+    manifest.write_json('llm_usage', 'llm_usage.json', total)
+    manifest.save()
+    return total
+
+
+def prompt_items(manifest, ranks):
+    """待分析话题的 (query, 搜索摘要, 单话题提示)，跳过还没有提示的话题"""
+    topics = {q['rank']: q for q in manifest.load_json('queries')}
+    items = []
+    for rank in ranks:
+        prompt_file = manifest.artifact(rank, 'prompt')
+        if not prompt_file:
+            continue
+        with open(prompt_file, 'r', encoding='utf-8') as f:
+            prompt = f.read()
+        query = topics.get(rank, {'rank': rank, 'title': manifest.topic(rank).get('title', '')})
+        search_summary = extract_search_snippet(manifest.load_artifact(rank, 'search'), query.get('title'))
+        items.append((query, search_summary, prompt))
+    return items
+
+
+def plan_units(analyzer, items):
+    """批量模式按 token 预算分批，否则每个话题单独一个请求"""
+    if getattr(analyzer, 'batch', False):
+        return plan_batches(items)
+    return [[item] for item in items]
+
+
+async def analyze_run(manifest, analyzer, concurrency=LLM_CONCURRENCY):
+    """并发分析运行中已有提示、仍缺少有效分析结果的话题，返回 ({排名: 结果文件}, {排名: 错误})"""
+    items = prompt_items(manifest, manifest.pending('analysis'))
+    units = plan_units(analyzer, items)
+    if len(units) < len(items):
+        print(f"📦 批量模式: {len(items)} 个话题分为 {len(units)} 个请求（每批 {', '.join(str(len(u)) for u in units)} 个）")
+    semaphore = asyncio.Semaphore(concurrency)
+    written, failed = {}, {}
+
+    async def analyze_unit(unit):
+        async with semaphore:
+            start = time.perf_counter()
+            results, errors = await asyncio.to_thread(analyzer.analyze_group, unit)
+        for query, _, _ in unit:
+            rank = query['rank']
+            if rank in errors:
+                failed[rank] = errors[rank]
+                print(f"  ❌ #{rank:2d} 分析失败: {errors[rank]}")
+                continue
+            result = results[rank]
+            result['rank'] = rank
+            analysis_file = manifest.stage_path(rank, 'analysis')
+            write_json_atomic(analysis_file, result)
+            manifest.record(rank, 'analysis', analysis_file)
+            written[rank] = analysis_file
+            print(f"  🧠 #{rank:2d} {query['title']} → {analysis_file}"
+                  f"（{time.perf_counter() - start:.2f}秒，总分 {result['total_score']}）")
+        manifest.save()
+
+    await asyncio.gather(*(analyze_unit(unit) for unit in units))
+    return written, failed
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    try:
+        manifest = RunManifest.load(run_id_from_args(args))
+        analyzer = with_cache(with_prefilter(AnthropicAnalyzer(batch=LLM_BATCH or '--batch' in args)))
+        concurrency = int(args[args.index('--concurrency') + 1]) if '--concurrency' in args else LLM_CONCURRENCY
+    except (FileNotFoundError, IndexError, RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        print(__doc__)
+        return 1
+
+    pending = manifest.pending('analysis')
+    if not pending:
+        print(f"✅ 运行 {manifest.run_id} 的所有话题均已有有效分析结果")
+        return 0
+    mode = '批量' if analyzer.batch else '逐个'
+    print(f"🧠 开始分析: {len(pending)} 个话题（模型: {analyzer.model}，{mode}，并发: {concurrency}，运行 {manifest.run_id}）")
+
+    start = time.perf_counter()
+    written, failed = asyncio.run(analyze_run(manifest, analyzer, concurrency))
+    print(f"✅ 分析完成: 成功 {len(written)}，失败 {len(failed)}，总耗时 {time.perf_counter() - start:.2f}秒")
+    analyzer.print_usage()
+    if hasattr(analyzer, 'save'):
+        analyzer.save()
+    total = record_usage(manifest, analyzer)
+    record_prefilter(manifest, analyzer)
+    if total and total['requests'] > analyzer.usage['requests']:
+        print("📊 本运行累计:")
+        print_usage(total)
+
+    remaining = manifest.pending('analysis')
+    if remaining:
+        print(f"⚠️  以下排名仍缺少分析结果（失败或没有提示）: {', '.join(map(str, remaining))}")
+        return 1
+    print("💡 下一步: python3 combine_results.py")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内流水线
+fetch → search → prompt → analyze → combine → render 各阶段都是普通函数，
+在同一个进程里通过 PipelineRun 传递内存中的话题、搜索结果、提示和分析结果，
+不再为每个阶段启动一个 python3 子进程、再从磁盘重新读取上一阶段的输出。
+
+persist=True（默认）时各阶段同时把产物写入运行目录并登记到清单，中断后可 --resume 继续，
+agent 也可以接着分析剩余的提示；persist=False 时只在内存中流转，只写快照库和最终报告。
+
+用法:
+    python3 pipeline.py [--top-n 15] [--sources weibo,...] [--backend stub|local|tavily]
+                        [--analyzer external|anthropic|stub] [--concurrency 5] [--analyze-concurrency 3]
+                        [--no-cache] [--local-first] [--no-cluster] [--no-persist] [--no-render]
+                        [--resume RUN_ID]
+
+代码中调用:
+    from pipeline import run_pipeline
+    run = run_pipeline(top_n=10, backend=get_backend('stub'), analyzer=get_analyzer('stub'))
+    run.results, run.timings
+"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from analyze_hotspot_with_ai import build_analysis_prompt
+from combine_results import merge_result, publish_results
+from fetch_weibo_hotspot import collect_queries, display_top_hotspots, prepare_run
+from generate_apple_style_report import save_report
+from pipeline_config import get_source_names, get_top_n
+from llm_analysis import plan_units, record_usage
+from pipeline_executor import ANALYZE_CONCURRENCY, get_analyzer
+from prefilter_model import record_prefilter
+from run_manifest import RunManifest, run_id_from_args, write_json_atomic, write_text_atomic
+from search_executor import SEARCH_CONCURRENCY, get_backend, search_stage
+from search_planner import CLUSTER_ENABLED
+from snapshot_diff import diff_against_previous, load_topic_artifacts, print_diff_summary
+
+
+class PipelineRun:
+    """一次运行在各阶段之间传递的内存状态；manifest 为 None 时不写运行目录"""
+
+    def __init__(self, manifest=None):
+        self.manifest = manifest
+        self.queries = []
+        self.search = {}        # {排名: 搜索结果字典}
+        self.prompts = {}       # {排名: 提示文本}
+        self.summaries = {}     # {排名: 搜索摘要}（批量分析时拼进共用评分标准的批量提示）
+        self.analyses = {}      # {排名: 分析结果字典}
+        self.results = []
+        self.report = None      # (归档文件, 最新文件)
+        self.failed = {}        # {排名: (阶段, 错误)}
+        self.timings = {}       # {阶段: 秒}
+
+    def pending(self):
+        """还没有分析结果的话题"""
+        return [q for q in self.queries if q['rank'] not in self.analyses]
+
+    def load_completed(self):
+        """从运行清单读入已完成的搜索和分析（复用的历史产物，或中断前完成的部分）"""
+        for q in self.queries:
+            for stage, loaded in (('search', self.search), ('analysis', self.analyses)):
+                data = None if q['rank'] in loaded else self.manifest.load_artifact(q['rank'], stage)
+                if data is not None:
+                    loaded[q['rank']] = data
+
+
+def fetch(run, top_n, sources=None):
+    """获取热搜并生成话题列表；继续已有运行时直接沿用其话题列表"""
+    manifest = run.manifest
+    if manifest and manifest.file_complete('queries'):
+        run.queries = manifest.load_json('queries')
+        run.load_completed()
+        print(f"♻️  继续运行 {manifest.run_id}，沿用已获取的 {len(run.queries)} 个话题")
+        return True
+
+    queries, fetched_at, diff_source = collect_queries(top_n, sources or get_source_names())
+    if not queries:
+        return False
+    run.queries = queries
+
+    if manifest:
+        if not prepare_run(queries, fetched_at, diff_source, manifest):
+            return False
+        run.load_completed()
+        return True
+
+    # 不落盘：快照对比后直接把历史存档读进内存
+    diff_against_previous(queries, fetched_at, source=diff_source)
+    for q in queries:
+        artifacts = None if q.get('reprocess', True) else load_topic_artifacts(q)
+        if artifacts is None:
+            q['reprocess'] = True
+            continue
+        run.search[q['rank']], run.analyses[q['rank']] = artifacts
+    print_diff_summary(queries)
+    display_top_hotspots(queries, count=10)
+    return True
+
+
+def search(run, backend=None, concurrency=SEARCH_CONCURRENCY, use_cache=True, local_first=False,
+           cluster=CLUSTER_ENABLED):
+    """为还没有搜索结果的待分析话题执行搜索，结果留在内存（persist 时同时写入运行目录）"""
+    todo = [q for q in run.pending() if q['rank'] not in run.search]
+    if not todo:
+        print("♻️  所有待分析话题均已有搜索结果")
+        return True
+
+    manifest = run.manifest
+    summary = asyncio.run(search_stage(todo, backend, concurrency,
+                                       output_dir=manifest.run_dir if manifest else None,
+                                       use_cache=use_cache, local_first=local_first, cluster=cluster))
+    run.search.update(summary['results'])
+    for rank, error in summary['failed']:
+        run.failed[rank] = ('search', error)
+    if manifest:
+        for rank, path in summary['written'].items():
+            manifest.record(rank, 'search', path)
+        manifest.save()
+    return True
+
+
+def build_prompts(run):
+    """为待分析话题生成分析提示"""
+    manifest = run.manifest
+    for q in run.pending():
+        rank = q['rank']
+        if rank not in run.search:
+            continue
+        prompt, run.summaries[rank] = build_analysis_prompt(q, run.search[rank])
+        run.prompts[rank] = prompt
+        if manifest:
+            prompt_file = manifest.stage_path(rank, 'prompt')
+            write_text_atomic(prompt_file, prompt)
+            manifest.record(rank, 'prompt', prompt_file)
+    if manifest:
+        manifest.save()
+    print(f"✅ 已生成 {len(run.prompts)} 个分析提示")
+    return True
+
+
+def _store_analysis(run, rank, result):
+    """记录一个话题的分析结果（persist 时写入运行目录并登记）"""
+    result['rank'] = rank
+    run.analyses[rank] = result
+    if run.manifest:
+        analysis_file = run.manifest.stage_path(rank, 'analysis')
+        write_json_atomic(analysis_file, result)
+        run.manifest.record(rank, 'analysis', analysis_file)
+        run.manifest.save()
+    print(f"  🧠 #{rank:2d} 分析完成（总分 {result.get('total_score')}）")
+
+
+def analyze(run, analyzer=None, concurrency=ANALYZE_CONCURRENCY):
+    """
+    并发分析已有提示的话题；analyzer 为 None（external）时跳过，留给 agent 分析
+    分析器开启批量模式时按 token 预算把多个话题合并成一个请求（llm_analysis.plan_units）
+    """
+    if analyzer is None:
+        print("⏭️  分析器为 external，跳过进程内分析")
+        return True
+
+    items = [(q, run.summaries[q['rank']], run.prompts[q['rank']])
+             for q in run.pending() if q['rank'] in run.prompts]
+    units = plan_units(analyzer, items)
+    if len(units) < len(items):
+        print(f"📦 批量模式: {len(items)} 个话题分为 {len(units)} 个请求")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(analyzer.analyze_group, unit): unit for unit in units}
+        for future in as_completed(futures):
+            results, errors = future.result()
+            for rank, result in results.items():
+                _store_analysis(run, rank, result)
+            for rank, error in errors.items():
+                run.failed[rank] = ('analyze', error)
+                print(f"  ❌ #{rank:2d} 分析失败: {error}")
+    if hasattr(analyzer, 'print_usage'):
+        analyzer.print_usage()
+        if run.manifest:
+            record_usage(run.manifest, analyzer)
+            record_prefilter(run.manifest, analyzer)
+    if hasattr(analyzer, 'save'):
+        analyzer.save()
+    return True
+
+
+def combine(run):
+    """合并分析结果；仍有话题缺少分析结果时不合并、不发布"""
+    pending = [q['rank'] for q in run.pending()]
+    if pending:
+        print(f"\n⏸️  排名 {', '.join(map(str, pending))} 仍等待分析，暂不合并")
+        if run.manifest:
+            print(f"💡 提示已在 {run.manifest.path('analysis_prompts')}/，"
+                  f"分析完成后运行: python3 pipeline.py --resume {run.manifest.run_id}")
+        return False
+
+    run.results = [merge_result(q['rank'], run.analyses[q['rank']], run.search.get(q['rank']), q)
+                   for q in run.queries]
+    print(f"✅ 已合并 {len(run.results)} 个话题的分析结果")
+    if run.manifest:
+        publish_results(run.manifest, run.results)
+    return True
+
+
+def render(run):
+    """生成HTML报告"""
+    run.report = save_report(run.results)
+    return run.report is not None
+
+
+def run_pipeline(top_n=None, sources=None, backend=None, analyzer=None, persist=True, render_report=True,
+                 run_id=None, search_concurrency=SEARCH_CONCURRENCY, analyze_concurrency=ANALYZE_CONCURRENCY,
+                 use_cache=True, local_first=False, cluster=CLUSTER_ENABLED, stop_after=None):
+    """
+    在当前进程里依次执行各阶段，某个阶段返回 False 时停止；stop_after 指定执行到哪个阶段为止
+    返回 PipelineRun（results / report / failed / timings 等）
+    """
+    run = PipelineRun(RunManifest.create(run_id) if persist else None)
+    steps = [
+        ('fetch', lambda: fetch(run, top_n or get_top_n(), sources)),
+        ('search', lambda: search(run, backend, search_concurrency, use_cache, local_first, cluster)),
+        ('prompt', lambda: build_prompts(run)),
+        ('analyze', lambda: analyze(run, analyzer, analyze_concurrency)),
+        ('combine', lambda: combine(run)),
+    ]
+    if render_report:
+        steps.append(('render', lambda: render(run)))
+
+    for stage, step in steps:
+        start = time.perf_counter()
+        ok = step()
+        run.timings[stage] = time.perf_counter() - start
+        if not ok or stage == stop_after:
+            break
+    return run
+
+
+def print_timings(run):
+    """打印各阶段耗时"""
+    stages = '，'.join(f"{stage} {seconds:.2f}秒" for stage, seconds in run.timings.items())
+    print(f"⏱️  各阶段耗时: {stages}（合计 {sum(run.timings.values()):.2f}秒）")
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    try:
+        backend = get_backend(args[args.index('--backend') + 1]) if '--backend' in args else None
+        analyzer = get_analyzer(args[args.index('--analyzer') + 1] if '--analyzer' in args else None)
+        top_n = get_top_n(args)
+        run_id = run_id_from_args(args) if '--resume' in args else None
+    except (IndexError, RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        print(__doc__)
+        return 1
+
+    run = run_pipeline(
+        top_n=top_n, sources=get_source_names(args), backend=backend, analyzer=analyzer,
+        persist='--no-persist' not in args, render_report='--no-render' not in args,
+        run_id=run_id,
+        search_concurrency=int(args[args.index('--concurrency') + 1]) if '--concurrency' in args else SEARCH_CONCURRENCY,
+        analyze_concurrency=(int(args[args.index('--analyze-concurrency') + 1])
+                             if '--analyze-concurrency' in args else ANALYZE_CONCURRENCY),
+        use_cache='--no-cache' not in args, local_first='--local-first' in args,
+        cluster='--no-cluster' not in args)
+
+    print_timings(run)
+    if run.failed:
+        failed = ', '.join(f"#{rank}（{stage}）" for rank, (stage, _) in sorted(run.failed.items()))
+        print(f"⚠️  以下节点失败: {failed}")
+    if run.manifest:
+        print(f"🗂️  运行ID: {run.manifest.run_id}")
+    return 0 if run.results and (run.report or '--no-render' in args) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线公共配置
+分析的热搜条数（top-N）贯穿获取、搜索计划、提示生成和报告各个阶段；
+热搜源列表决定只取微博还是多平台合并
+"""
+
+import os
+
+# 默认分析前 N 条热搜，可通过环境变量 WEIBO_TOP_N 或命令行 --top-n 覆盖
+DEFAULT_TOP_N = 15
+
+
+def get_top_n(argv=None):
+    """读取 top-N：命令行 --top-n 优先，其次环境变量 WEIBO_TOP_N"""
+    argv = argv or []
+    if '--top-n' in argv:
+        value = argv[argv.index('--top-n') + 1]
+    else:
+        value = os.environ.get('WEIBO_TOP_N', DEFAULT_TOP_N)
+    top_n = int(value)
+    if top_n <= 0:
+        raise ValueError(f"top-N 必须为正整数: {value}")
+    return top_n
+
+
+def get_source_names(argv=None):
+    """读取热搜源列表：命令行 --sources 优先，其次环境变量 WEIBO_SOURCES，默认只取微博"""
+    argv = argv or []
+    if '--sources' in argv:
+        value = argv[argv.index('--sources') + 1]
+    else:
+        value = os.environ.get('WEIBO_SOURCES', 'weibo')
+    return [name.strip() for name in value.split(',') if name.strip()]
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线执行器（asyncio 依赖图）
+在同一事件循环里按依赖关系执行 fetch → search → prompt → analyze → combine → render：
+- fetch 流式解析热搜列表，每解析出一个需要处理的话题就开始预取它的搜索，不等整个列表解析完和快照对比完成
+- 每个排名的搜索一完成，立即生成该排名的提示并开始分析，不等其余话题搜索结束（搜索与分析重叠执行）
+- 搜索、分析各有并发上限（WEIBO_SEARCH_CONCURRENCY / WEIBO_ANALYZE_CONCURRENCY）
+- 运行清单里已完成的排名/阶段直接跳过，每个节点完成后立即保存清单，中断后可 --resume 继续
+- combine 在全部分析节点结束后执行；仍有排名缺少分析结果时不合并、不发布
+
+分析器可插拔：
+- external:  进程内不做分析，只准备好提示，由 agent 分析后再用 --resume 继续（默认）
+- anthropic: 直接调用 Messages API 分析（llm_analysis.py）
+- stub:      本地替身，按标题生成确定的评分，可配置延迟，用于离线运行和压测
+进程内分析器默认套一层分析结果缓存（analysis_cache.py），同一话题背景信息没变时直接复用上次的评分；
+缓存未命中的话题可先经本地预筛模型（prefilter_model.py，WEIBO_PREFILTER=shadow|on）过滤低潜力话题
+
+环境变量:
+    WEIBO_ANALYZER                  分析器名称（默认 external）
+    WEIBO_ANALYZE_CONCURRENCY       并发分析数（默认 3）
+    WEIBO_ANALYZE_STUB_LATENCY_MS   stub 分析器的模拟延迟（毫秒）
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_cache import with_cache
+from analyze_hotspot_with_ai import write_analysis_prompt
+from combine_results import combine_run
+from fetch_weibo_hotspot import collect_queries
+from generate_apple_style_report import save_report
+from llm_analysis import Analyzer, AnthropicAnalyzer, record_usage
+from prefilter_model import record_prefilter, with_prefilter
+from run_manifest import write_json_atomic
+from search_executor import SEARCH_CONCURRENCY, search_stage
+from search_planner import CLUSTER_ENABLED
+from snapshot_diff import diff_topic, has_topic_artifacts, previous_topics
+
+ANALYZE_CONCURRENCY = int(os.environ.get('WEIBO_ANALYZE_CONCURRENCY', '3'))
+
+
+class StubAnalyzer(Analyzer):
+    """本地替身分析器：按标题哈希生成确定的评分，可配置延迟"""
+
+    name = 'stub'
+
+    def __init__(self, latency_ms=None):
+        if latency_ms is None:
+            latency_ms = float(os.environ.get('WEIBO_ANALYZE_STUB_LATENCY_MS', '0'))
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def analyze(self, prompt, query):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        digest = int(hashlib.sha1(query['title'].encode('utf-8')).hexdigest()[:8], 16)
+        fun_score, useful_score = digest % 81, (digest >> 8) % 21
+        total_score = fun_score + useful_score
+        has_idea = total_score >= 60
+        return {
+            'fun_score': fun_score,
+            'fun_reason': '离线替身评分',
+            'useful_score': useful_score,
+            'useful_reason': '离线替身评分',
+            'total_score': total_score,
+            'has_idea': has_idea,
+            'product': {
+                'name': f"{query['title'][:8]}助手",
+                'features': '离线替身生成',
+                'target_users': '测试',
+                'description': '离线替身生成的产品创意'
+            } if has_idea else None,
+            'summary': f"{query['title']}（离线替身分析）",
+            'analysis_notes': 'stub'
+        }
+
+
+ANALYZERS = {
+    'anthropic': AnthropicAnalyzer,
+    'stub': StubAnalyzer,
+}
+
+
+def get_analyzer(name=None):
+    """按名称创建分析器（按配置带分析结果缓存和预筛）；external（默认）返回 None，表示分析交给 agent"""
+    name = name or os.environ.get('WEIBO_ANALYZER', 'external')
+    if name == 'external':
+        return None
+    if name not in ANALYZERS:
+        raise ValueError(f"未知的分析器: {name}（可选: external, {', '.join(ANALYZERS)}）")
+    return with_cache(with_prefilter(ANALYZERS[name]()))
+
+
+class PipelineExecutor:
+    """按执行计划（orchestration_plan.json）执行每个排名的 search → prompt → analyze"""
+
+    def __init__(self, manifest, plan, queries, backend=None, analyzer=None,
+                 search_concurrency=SEARCH_CONCURRENCY, analyze_concurrency=ANALYZE_CONCURRENCY,
+                 use_cache=True, local_first=False, cluster=CLUSTER_ENABLED, pipelined=True, prefetch=None):
+        self.manifest = manifest
+        by_rank = {q['rank']: q for q in queries}
+        # 计划决定要处理哪些排名；查询本身（topic_id 等字段）取自本次运行的话题列表
+        self.queries = [by_rank[task['rank']] for task in plan['workflow'] if task['rank'] in by_rank]
+        self.backend = backend
+        self.analyzer = analyzer
+        self.search_concurrency = search_concurrency
+        self.analyze_concurrency = analyze_concurrency
+        self.analyze_semaphore = asyncio.Semaphore(analyze_concurrency)
+        self.use_cache = use_cache
+        self.local_first = local_first
+        self.cluster = cluster
+        self.pipelined = pipelined
+        self.prefetch = prefetch    # fetch 阶段开始的搜索预取（SearchPrefetch），没有时为 None
+        self.timeline = []      # [(阶段, 排名, 开始, 结束)]，相对执行开始的秒数
+        self.failed = {}        # {排名: (阶段, 错误)}
+        self.executor = None    # run() 期间的专用线程池
+        self._t0 = None
+
+    def _now(self):
+        return time.perf_counter() - self._t0
+
+    def _track(self, stage, rank, start):
+        self.timeline.append((stage, rank, start, self._now()))
+
+    async def _prompt_and_analyze(self, query):
+        """单个排名的下游节点：生成提示 → 分析（受分析并发上限约束）"""
+        rank = query['rank']
+        stage = 'prompt'
+        try:
+            start = self._now()
+            with open(self.manifest.artifact(rank, 'search'), 'r', encoding='utf-8') as f:
+                search_data = json.load(f)
+            prompt_file, search_summary = write_analysis_prompt(self.manifest, query, search_data)
+            self.manifest.save()
+            self._track('prompt', rank, start)
+
+            if self.analyzer is None:
+                return
+            stage = 'analyze'
+            with open(prompt_file, 'r', encoding='utf-8') as f:
+                prompt = f.read()
+            async with self.analyze_semaphore:
+                start = self._now()
+                results, errors = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.analyzer.analyze_group, [(query, search_summary, prompt)])
+            if rank in errors:
+                raise errors[rank]
+            result = results[rank]
+            result['rank'] = rank
+            analysis_file = self.manifest.stage_path(rank, 'analysis')
+            write_json_atomic(analysis_file, result)
+            self.manifest.record(rank, 'analysis', analysis_file)
+            self.manifest.save()
+            self._track('analyze', rank, start)
+            print(f"  🧠 #{rank:2d} 分析完成（{self._now() - start:.2f}秒，总分 {result.get('total_score')}）")
+        except Exception as e:
+            self.failed[rank] = (stage, e)
+            print(f"  ❌ #{rank:2d} {stage} 失败: {e}")
+
+    async def run(self):
+        """执行全部排名节点，返回 {'elapsed', 'search', 'failed', 'timeline'}"""
+        # 搜索和分析都在线程里阻塞等待网络；默认线程池只有 CPU 数 + 4 个线程，两个阶段同时满载时会互相挤占
+        # 专用线程池显式传给各节点，不替换事件循环的默认线程池（run() 结束后池会关闭，同一循环上后续的
+        # asyncio.to_thread 仍要能用）
+        with ThreadPoolExecutor(max_workers=self.search_concurrency + self.analyze_concurrency) as pool:
+            self.executor = pool
+            try:
+                return await self._run()
+            finally:
+                self.executor = None
+
+    async def _run(self):
+        self._t0 = time.perf_counter()
+        manifest = self.manifest
+        todo = [q for q in self.queries if not manifest.is_complete(q['rank'], 'analysis')]
+        need_search = [q for q in todo if not manifest.is_complete(q['rank'], 'search')]
+        skipped = len(self.queries) - len(todo)
+        if skipped:
+            print(f"♻️  {skipped} 个话题已有有效分析结果，跳过")
+
+        # 已有搜索结果（复用或中断前完成）的排名直接进入提示/分析
+        searching = {q['rank'] for q in need_search}
+        tasks = [asyncio.create_task(self._prompt_and_analyze(q)) for q in todo if q['rank'] not in searching]
+        waiting = []
+
+        async def on_search_done(outcome):
+            query, path, duration, error, _, _ = outcome
+            rank = query['rank']
+            if error is not None:
+                self.failed[rank] = ('search', error)
+                return
+            manifest.record(rank, 'search', path)
+            manifest.save()
+            self.timeline.append(('search', rank, self._now() - duration, self._now()))
+            if self.pipelined:
+                tasks.append(asyncio.create_task(self._prompt_and_analyze(query)))
+            else:
+                waiting.append(query)
+
+        summary = None
+        if need_search:
+            summary = await search_stage(need_search, self.backend, self.search_concurrency,
+                                         output_dir=manifest.run_dir, use_cache=self.use_cache,
+                                         local_first=self.local_first, cluster=self.cluster,
+                                         on_outcome=on_search_done, prefetch=self.prefetch,
+                                         executor=self.executor)
+        if self.prefetch is not None:
+            # 预取过、但最终复用了历史结果或已完成的话题
+            self.prefetch.cancel()
+        # 非流水线模式（对照）：全部搜索结束后才开始分析
+        tasks.extend(asyncio.create_task(self._prompt_and_analyze(q)) for q in waiting)
+        await asyncio.gather(*tasks)
+        manifest.save()
+        return {'elapsed': self._now(), 'search': summary, 'failed': self.failed, 'timeline': self.timeline}
+
+
+async def fetch_stage(top_n, sources, prefetch=None):
+    """
+    fetch 节点：在线程里获取热搜（单平台时流式解析），返回 collect_queries 的结果
+    prefetch 不为 None 时，每解析出一个话题就与上次快照对比，需要重新处理（或没有可复用存档）的话题
+    立即开始预取搜索，不等整个列表解析完、快照对比和存档复用完成
+    """
+    loop = asyncio.get_running_loop()
+    source = 'weibo' if sources == ['weibo'] else 'merged'
+    previous = {}
+
+    def on_query(query, fetched_at):
+        if 'topics' not in previous:
+            previous['topics'] = previous_topics(fetched_at, source)
+        if not diff_topic(dict(query), previous['topics'])['reprocess'] and has_topic_artifacts(query):
+            return
+        loop.call_soon_threadsafe(prefetch.start, query)
+
+    return await asyncio.to_thread(collect_queries, top_n, sources, on_query if prefetch is not None else None)
+
+
+def print_timeline_summary(result):
+    """打印流水线耗时摘要：各阶段累计耗时，以及搜索结束前已开始的分析数（重叠程度）"""
+    busy = {}
+    for stage, _, start, end in result['timeline']:
+        busy[stage] = busy.get(stage, 0.0) + end - start
+    search_end = max((end for stage, _, _, end in result['timeline'] if stage == 'search'), default=0.0)
+    overlapped = sum(1 for stage, _, start, _ in result['timeline'] if stage == 'analyze' and start < search_end)
+    stages = '，'.join(f"{stage} {seconds:.2f}秒" for stage, seconds in busy.items())
+    print(f"⏱️  流水线耗时 {result['elapsed']:.2f}秒（各节点累计: {stages or '无'}）")
+    if overlapped:
+        print(f"🔄 {overlapped} 个分析在全部搜索结束前就已开始")
+
+
+async def execute_plan(manifest, plan, queries, render=True, **options):
+    """
+    执行计划的其余部分：各排名节点 → combine → render
+    返回 0（完成）/ 1（失败，或仍有排名等待 agent 分析）
+    """
+    executor = PipelineExecutor(manifest, plan, queries, **options)
+    result = await executor.run()
+    print_timeline_summary(result)
+    if hasattr(executor.analyzer, 'print_usage'):
+        executor.analyzer.print_usage()
+        record_usage(manifest, executor.analyzer)
+        record_prefilter(manifest, executor.analyzer)
+    if hasattr(executor.analyzer, 'save'):
+        executor.analyzer.save()
+
+    if result['failed']:
+        failed = ', '.join(f"#{rank}（{stage}）" for rank, (stage, _) in sorted(result['failed'].items()))
+        print(f"⚠️  以下节点失败: {failed}")
+
+    pending = manifest.pending('analysis')
+    if pending:
+        print(f"\n⏸️  排名 {', '.join(map(str, pending))} 仍等待分析，暂不合并")
+        if executor.analyzer is None:
+            print(f"💡 提示已在 {manifest.path('analysis_prompts')}/，"
+                  f"分析完成后运行: python3 run_pipeline_automation.py --execute --resume {manifest.run_id}")
+        return 1
+
+    results = combine_run(manifest)
+    if results is None:
+        return 1
+    if render and not save_report(results):
+        print("❌ 报告生成失败")
+        return 1
+    return 0
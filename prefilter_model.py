@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地预筛模型
+历史分析结果里大多数话题（时政新闻、讣告等）总分不到 60、没有产品创意，却每次都要付费分析一遍。
+这里用标题的字符 n-gram 特征 + 逻辑回归（纯标准库实现）预测总分：
+以 总分/100 作为软标签训练，预测值 × 100 即预测总分。
+只有预测总分不低于阈值的话题才交给模型分析，其余话题直接得到一条标记 prefiltered 的低分结果。
+默认阈值在训练时由交叉验证选出：交叉验证中不会跳过任何有创意（总分 ≥ 60）话题的最高整数阈值，随模型一起保存。
+
+模式（WEIBO_PREFILTER）:
+- off:    不预筛（默认）
+- shadow: 仍然分析全部话题，只记录预筛的判断，统计跳过判断的精确率/召回率（写入运行目录的 prefilter.json）
+- on:     低于阈值的话题跳过模型分析
+
+用法:
+    python3 prefilter_model.py train            # 用历史结果训练并保存模型（交叉验证选出默认阈值）
+    python3 prefilter_model.py evaluate         # 5 折交叉验证：误差、选出的阈值、跳过的精确率/召回率、漏掉的创意
+    python3 prefilter_model.py predict 标题 ...  # 查看预测总分
+
+训练数据:
+    runs/*/hotspot_analysis_results.json，以及仓库根目录的 hotspot_analysis_results.json、
+    enhanced_analysis_results.json、analysis_results/result_XX.json（按排名对应 weibo_search_queries.json 的标题）；
+    预筛产生的结果不参与训练，同一标题只取最新的一条
+
+环境变量:
+    WEIBO_PREFILTER             off | shadow | on（默认 off）
+    WEIBO_PREFILTER_THRESHOLD   预测总分低于该值的话题不交给模型（默认用模型保存的交叉验证阈值，旧模型为 40）
+    WEIBO_PREFILTER_MODEL       模型文件（默认 .cache/prefilter/model.json）
+"""
+
+import glob
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import unicodedata
+from collections import Counter
+from datetime import datetime
+
+from run_manifest import QUERIES_FILE, RESULTS_FILE, RUNS_DIR, write_json_atomic
+
+PREFILTER_MODE = os.environ.get('WEIBO_PREFILTER', 'off')
+PREFILTER_THRESHOLD = float(os.environ['WEIBO_PREFILTER_THRESHOLD']) if os.environ.get('WEIBO_PREFILTER_THRESHOLD') else None
+MODEL_PATH = os.environ.get('WEIBO_PREFILTER_MODEL', os.path.join('.cache', 'prefilter', 'model.json'))
+MODES = ('off', 'shadow', 'on')
+
+IDEA_SCORE = 60          # 总分达到 60 才会生成产品创意
+DEFAULT_THRESHOLD = 40   # 模型里没有保存交叉验证阈值时使用
+NGRAM_SIZES = (1, 2, 3)
+MIN_COUNT = 2            # 只保留至少在两个标题里出现过的 n-gram
+MIN_EXAMPLES = 20
+EPOCHS = 40
+LEARNING_RATE = 0.5
+L2 = 1e-4
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def features(title):
+    """标题的字符 n-gram 集合（NFKC、小写、去掉标点和空白）"""
+    text = _NON_WORD.sub('', unicodedata.normalize('NFKC', title or '').lower())
+    return {text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)}
+
+
+def _sigmoid(z):
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class PrefilterModel:
+    """字符 n-gram 逻辑回归：预测总分（0-100）"""
+
+    def __init__(self, weights=None, bias=0.0, meta=None):
+        self.weights = weights or {}
+        self.bias = bias
+        self.meta = meta or {}
+
+    @property
+    def threshold(self):
+        """训练时交叉验证选出的阈值"""
+        return self.meta.get('threshold', DEFAULT_THRESHOLD)
+
+    def predict(self, title):
+        """预测总分"""
+        grams = [g for g in features(title) if g in self.weights]
+        scale = 1.0 / math.sqrt(len(grams)) if grams else 0.0
+        z = self.bias + scale * sum(self.weights[g] for g in grams)
+        return round(_sigmoid(z) * 100, 1)
+
+    @classmethod
+    def train(cls, examples, epochs=EPOCHS, learning_rate=LEARNING_RATE, l2=L2, min_count=MIN_COUNT):
+        """examples: [(标题, 总分)]；随机梯度下降（固定种子，结果可复现）"""
+        counts = Counter(g for title, _ in examples for g in features(title))
+        vocabulary = {g for g, c in counts.items() if c >= min_count}
+        data = []
+        for title, score in examples:
+            grams = [g for g in features(title) if g in vocabulary]
+            data.append((grams, 1.0 / math.sqrt(len(grams)) if grams else 0.0,
+                         min(max(score, 0), 100) / 100))
+
+        # 偏置从平均总分起步，n-gram 权重只学习相对平均值的偏移
+        mean = min(max(sum(y for _, _, y in data) / len(data), 0.01), 0.99)
+        model = cls(dict.fromkeys(vocabulary, 0.0), math.log(mean / (1 - mean)))
+        rng = random.Random(0)
+        order = list(range(len(data)))
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for i in order:
+                grams, scale, y = data[i]
+                z = model.bias + scale * sum(model.weights[g] for g in grams)
+                gradient = _sigmoid(z) - y
+                model.bias -= rate * gradient
+                for g in grams:
+                    model.weights[g] -= rate * (gradient * scale + l2 * model.weights[g])
+
+        model.weights = {g: round(w, 6) for g, w in model.weights.items() if abs(w) > 1e-6}
+        model.meta = {
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+            'examples': len(examples),
+            'features': len(model.weights),
+            'mean_score': round(mean * 100, 1)
+        }
+        return model
+
+    def save(self, path=MODEL_PATH):
+        write_json_atomic(path, {'version': 1, 'bias': self.bias, 'weights': self.weights, 'meta': self.meta})
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        """读取模型文件，不存在或损坏时返回 None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(data['weights'], data['bias'], data.get('meta'))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def _scored(entries):
+    """从结果列表中取出 (标题, 总分)，跳过预筛产生的结果"""
+    for entry in entries:
+        if isinstance(entry, dict) and entry.get('title') and not entry.get('prefiltered') \
+                and isinstance(entry.get('total_score'), (int, float)):
+            yield entry['title'], entry['total_score']
+
+
+def _load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def collect_examples(root='.'):
+    """收集历史分析结果作为训练数据，返回 [(标题, 总分)]（同一标题取最新的一条）"""
+    sources = []
+    # 仓库根目录的旧版产物：单话题结果按排名对应话题列表里的标题
+    queries = _load_json(os.path.join(root, QUERIES_FILE)) or []
+    titles = {q.get('rank'): q.get('title') for q in queries if isinstance(q, dict)}
+    for path in sorted(glob.glob(os.path.join(root, 'analysis_results', 'result_*.json'))):
+        data = _load_json(path)
+        if not isinstance(data, dict):
+            continue
+        title = titles.get(data.get('rank', _rank_from_name(path)))
+        if title:
+            sources.append((os.path.getmtime(path), [dict(data, title=title)]))
+    for name in ('enhanced_analysis_results.json', RESULTS_FILE):
+        path = os.path.join(root, name)
+        if os.path.exists(path):
+            sources.append((os.path.getmtime(path), _load_json(path) or []))
+    # 各次运行合并后的结果（runs/latest 指向其中一次运行，去重时自然合并）
+    for path in glob.glob(os.path.join(root, RUNS_DIR, '*', RESULTS_FILE)):
+        sources.append((os.path.getmtime(path), _load_json(path) or []))
+
+    examples = {}
+    for _, entries in sorted(sources, key=lambda s: s[0]):
+        for title, score in _scored(entries):
+            examples[title] = score
+    return list(examples.items())
+
+
+def _rank_from_name(path):
+    match = re.search(r'result_(\d+)\.json$', path)
+    return int(match.group(1)) if match else None
+
+
+def cross_validate(examples, folds=5):
+    """k 折交叉验证，返回 [(预测总分, 实际总分)]"""
+    rng = random.Random(0)
+    shuffled = examples[:]
+    rng.shuffle(shuffled)
+    pairs = []  # (预测总分, 实际总分)
+    for k in range(folds):
+        held_out = shuffled[k::folds]
+        training = [e for i, e in enumerate(shuffled) if i % folds != k]
+        if not held_out or not training:
+            continue
+        model = PrefilterModel.train(training)
+        pairs.extend((model.predict(title), score) for title, score in held_out)
+    return pairs
+
+
+def choose_threshold(pairs):
+    """不跳过任何有创意话题的最高整数阈值；交叉验证里没有创意话题时退回默认阈值"""
+    ideas = [p for p, a in pairs if a >= IDEA_SCORE]
+    if not ideas:
+        return DEFAULT_THRESHOLD
+    return max(0, min(100, math.floor(min(ideas))))
+
+
+def evaluate(examples, threshold=None, folds=5):
+    """k 折交叉验证；不指定阈值时用交叉验证结果选出阈值，返回该阈值下的跳过统计"""
+    pairs = cross_validate(examples, folds)
+    return skip_quality(pairs, choose_threshold(pairs) if threshold is None else threshold)
+
+
+def skip_quality(pairs, threshold):
+    """
+    pairs: [(预测总分, 模型给出的总分)]
+    只评估"预测总分低于阈值而跳过 ⇒ 模型给分 < 60（没有创意）"这一个判断：
+    skip_precision: 跳过的话题里确实没有创意的比例；skip_recall: 没有创意的话题里被跳过的比例；
+    漏掉的创意：预筛会跳过、模型却给出 ≥ 60 分
+    """
+    n = len(pairs)
+    if not n:
+        return {'topics': 0}
+    skipped = [(p, a) for p, a in pairs if p < threshold]
+    correct = sum(1 for _, a in skipped if a < IDEA_SCORE)
+    negatives = sum(1 for _, a in pairs if a < IDEA_SCORE)
+    return {
+        'topics': n,
+        'threshold': threshold,
+        'mae': round(sum(abs(p - a) for p, a in pairs) / n, 1),
+        'would_skip': len(skipped),
+        'skip_rate': round(len(skipped) / n, 3),
+        'skip_precision': round(correct / len(skipped), 3) if skipped else None,
+        'skip_recall': round(correct / negatives, 3) if negatives else None,
+        'missed_ideas': len(skipped) - correct,
+        'ideas': n - negatives
+    }
+
+
+def prefiltered_result(query, predicted):
+    """跳过模型分析的话题的占位结果（分项按满分 80 / 20 的比例拆分预测总分）"""
+    total_score = int(round(predicted))
+    fun_score = int(round(total_score * 0.8))
+    return {
+        'fun_score': fun_score,
+        'fun_reason': '本地预筛模型预测，未调用模型分析',
+        'useful_score': total_score - fun_score,
+        'useful_reason': '本地预筛模型预测，未调用模型分析',
+        'total_score': total_score,
+        'has_idea': False,
+        'product': None,
+        'summary': query.get('title', ''),
+        'analysis_notes': f"预筛模型预测总分 {predicted}，低于阈值，跳过模型分析",
+        'prefiltered': True,
+        'predicted_score': predicted
+    }
+
+
+class PrefilterAnalyzer:
+    """
+    给分析器加一层预筛：analyze_group() 先用本地模型预测总分，
+    on 模式下只把不低于阈值的话题交给原分析器，shadow 模式下全部交给原分析器并记录判断；
+    其余属性（name / model / batch / usage ...）转发给原分析器
+    """
+
+    def __init__(self, analyzer, scorer, mode=PREFILTER_MODE, threshold=PREFILTER_THRESHOLD):
+        self.analyzer = analyzer
+        self.scorer = scorer
+        self.mode = mode
+        self.threshold = threshold
+        self.decisions = {}     # {排名: {'title', 'predicted', 'routed', 'actual'}}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.analyzer, name)
+
+    def analyze_group(self, items):
+        routed, results = [], {}
+        for item in items:
+            query = item[0]
+            predicted = self.scorer.predict(query.get('title', ''))
+            with self._lock:
+                self.decisions[query['rank']] = {'title': query.get('title', ''), 'predicted': predicted,
+                                                 'routed': predicted >= self.threshold, 'actual': None}
+            if self.mode == 'on' and predicted < self.threshold:
+                results[query['rank']] = prefiltered_result(query, predicted)
+            else:
+                routed.append(item)
+        if not routed:
+            return results, {}
+
+        analyzed, errors = self.analyzer.analyze_group(routed)
+        with self._lock:
+            for rank, result in analyzed.items():
+                self.decisions[rank]['actual'] = result.get('total_score')
+        results.update(analyzed)
+        return results, errors
+
+    def summary(self):
+        """本次运行的预筛统计；shadow 模式下附带跳过判断的精确率/召回率"""
+        decisions = list(self.decisions.values())
+        stats = {'mode': self.mode, 'threshold': self.threshold, 'topics': len(decisions),
+                 'below_threshold': sum(1 for d in decisions if not d['routed'])}
+        if self.mode == 'shadow':
+            stats['shadow'] = skip_quality([(d['predicted'], d['actual']) for d in decisions
+                                            if d['actual'] is not None], self.threshold)
+        return stats
+
+    def print_usage(self):
+        if hasattr(self.analyzer, 'print_usage'):
+            self.analyzer.print_usage()
+        s = self.summary()
+        if not s['topics']:
+            return
+        if self.mode == 'on':
+            print(f"🔍 预筛: {s['topics']} 个话题中 {s['below_threshold']} 个预测总分低于 {self.threshold:g}，跳过模型分析")
+        elif s['shadow']['topics']:
+            shadow = s['shadow']
+            print(f"🔍 预筛（shadow，阈值 {self.threshold:g}）: {shadow['topics']} 个话题，"
+                  f"可省下 {shadow['would_skip']} 次调用（跳过精确率 {_percent(shadow['skip_precision'])}，"
+                  f"召回率 {_percent(shadow['skip_recall'])}），漏掉创意 {shadow['missed_ideas']} 个，"
+                  f"平均误差 {shadow['mae']} 分")
+
+
+def _percent(value):
+    return '-' if value is None else f"{value:.0%}"
+
+
+def with_prefilter(analyzer, mode=PREFILTER_MODE, threshold=PREFILTER_THRESHOLD, path=MODEL_PATH):
+    """按配置给分析器套上预筛（不指定阈值时用模型保存的阈值）；没有训练好的模型时提示并不预筛"""
+    if analyzer is None or mode == 'off':
+        return analyzer
+    if mode not in MODES:
+        raise ValueError(f"未知的预筛模式: {mode}（可选: {', '.join(MODES)}）")
+    scorer = PrefilterModel.load(path)
+    if scorer is None:
+        print(f"⚠️  没有预筛模型 {path}，本次不预筛（先运行: python3 prefilter_model.py train）")
+        return analyzer
+    return PrefilterAnalyzer(analyzer, scorer, mode, scorer.threshold if threshold is None else threshold)
+
+
+def record_prefilter(manifest, analyzer):
+    """把本次预筛的判断和统计写入运行目录的 prefilter.json"""
+    decisions = getattr(analyzer, 'decisions', None)
+    if not decisions:
+        return None
+    report = dict(analyzer.summary(), model=analyzer.scorer.meta,
+                  decisions={str(rank): d for rank, d in sorted(decisions.items())})
+    manifest.write_json('prefilter', 'prefilter.json', report)
+    manifest.save()
+    return report
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('train', 'evaluate', 'predict'):
+        print(__doc__)
+        return 1
+
+    if args[0] == 'predict':
+        model = PrefilterModel.load()
+        if model is None:
+            print(f"❌ 没有预筛模型 {MODEL_PATH}，先运行: python3 prefilter_model.py train")
+            return 1
+        threshold = model.threshold if PREFILTER_THRESHOLD is None else PREFILTER_THRESHOLD
+        print(f"阈值: {threshold:g}")
+        for title in args[1:]:
+            predicted = model.predict(title)
+            verdict = '交给模型' if predicted >= threshold else '跳过'
+            print(f"  {predicted:5.1f}  {verdict}  {title}")
+        return 0
+
+    examples = collect_examples()
+    if len(examples) < MIN_EXAMPLES:
+        print(f"❌ 历史分析结果只有 {len(examples)} 条，至少需要 {MIN_EXAMPLES} 条才能训练")
+        return 1
+    print(f"📚 训练数据: {len(examples)} 个话题，其中有创意 {sum(1 for _, s in examples if s >= IDEA_SCORE)} 个")
+
+    s = evaluate(examples, PREFILTER_THRESHOLD)
+    source = '环境变量指定' if PREFILTER_THRESHOLD is not None else '交叉验证选出'
+    print(f"📊 5 折交叉验证（阈值 {s['threshold']:g}，{source}）: 平均误差 {s['mae']} 分，"
+          f"可省下 {s['skip_rate']:.0%} 的调用，跳过精确率 {_percent(s['skip_precision'])}，"
+          f"召回率 {_percent(s['skip_recall'])}，漏掉创意 {s['missed_ideas']}/{s['ideas']} 个")
+    if args[0] == 'evaluate':
+        return 0
+
+    model = PrefilterModel.train(examples)
+    model.meta['threshold'] = s['threshold']
+    model.meta['cv'] = s
+    model.save()
+    print(f"✅ 模型已保存: {MODEL_PATH}（{model.meta['features']} 个特征，平均总分 {model.meta['mean_score']}，"
+          f"阈值 {model.threshold:g}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨进程共享的令牌桶限流器
+所有对外接口调用（天行数据、Anthropic 代理、搜索接口）先在这里取令牌：
+桶状态保存在一个小的 JSON 状态文件里，读写时加文件锁，
+定时任务、手动运行和并行运行的多个进程共用同一份额度。
+每个接口有独立的速率、突发容量和每日配额；收到 429 时清空令牌桶，让所有进程一起退避。
+
+用法:
+    python3 rate_limiter.py status      # 查看各接口剩余令牌和今日剩余配额
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，退化为仅进程内有效
+    fcntl = None
+
+STATE_PATH = os.environ.get('WEIBO_RATE_STATE', os.path.join('data', 'rate_limits.json'))
+
+# 各接口预算：rate 每秒补充令牌数，burst 桶容量，daily 每日配额（None 表示不限）
+DEFAULT_BUDGETS = {
+    'tianxing': {
+        'rate': 1.0,
+        'burst': 3,
+        'daily': int(os.environ.get('TIANXING_DAILY_QUOTA', '100')),
+        'hosts': ['apis.tianapi.com', 'api.tianapi.com'],
+    },
+    'anthropic': {
+        'rate': 1.0,
+        'burst': 5,
+        'daily': None,
+        'hosts': ['api.pipellm.com', 'api.anthropic.com'],
+    },
+    'search': {
+        'rate': 2.0,
+        'burst': 5,
+        'daily': None,
+        'hosts': ['api.tavily.com'],
+    },
+}
+
+# 等待令牌的最长时间（秒），超过则放弃本次调用
+MAX_WAIT = float(os.environ.get('WEIBO_RATE_MAX_WAIT', '120'))
+
+
+class QuotaExceededError(RuntimeError):
+    """今日配额已用完，或等待令牌超时"""
+
+
+def _load_budgets():
+    """读取预算配置：WEIBO_RATE_BUDGETS 可用 JSON 覆盖单个接口的字段"""
+    budgets = {name: dict(budget) for name, budget in DEFAULT_BUDGETS.items()}
+    override = os.environ.get('WEIBO_RATE_BUDGETS')
+    if override:
+        try:
+            for name, fields in json.loads(override).items():
+                budgets.setdefault(name, {'rate': 1.0, 'burst': 1, 'daily': None, 'hosts': []})
+                budgets[name].update(fields)
+        except (ValueError, AttributeError) as e:
+            print(f"⚠️  WEIBO_RATE_BUDGETS 格式错误，使用默认预算: {e}")
+    base_url = os.environ.get('ANTHROPIC_BASE_URL')
+    if base_url and 'anthropic' in budgets:
+        budgets['anthropic']['hosts'] = budgets['anthropic']['hosts'] + [urlsplit(base_url).netloc]
+    return budgets
+
+
+class RateLimiter:
+    """基于状态文件 + 文件锁的令牌桶"""
+
+    def __init__(self, path=STATE_PATH, budgets=None):
+        self.path = path
+        self.budgets = budgets or _load_budgets()
+        self.waited = {}    # 本进程在各接口上累计等待的秒数
+
+    def endpoint_for(self, url_or_host):
+        """按主机名找到对应的接口预算名，未登记的主机（如本地替身服务）返回 None"""
+        host = urlsplit(url_or_host).netloc if '://' in url_or_host else url_or_host
+        for name, budget in self.budgets.items():
+            if host in budget.get('hosts', ()):
+                return name
+        return None
+
+    @contextmanager
+    def _locked_state(self):
+        """加排他锁读取状态，退出时原子写回"""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = {}
+                yield state
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refill(self, state, endpoint, now):
+        """按经过的时间补充令牌，跨天重置每日用量"""
+        budget = self.budgets[endpoint]
+        bucket = state.setdefault(endpoint, {
+            'tokens': float(budget['burst']), 'updated': now,
+            'day': date.today().isoformat(), 'used_today': 0, 'throttled': 0
+        })
+        elapsed = max(0.0, now - bucket['updated'])
+        bucket['tokens'] = min(float(budget['burst']), bucket['tokens'] + elapsed * budget['rate'])
+        bucket['updated'] = now
+        today = date.today().isoformat()
+        if bucket['day'] != today:
+            bucket['day'] = today
+            bucket['used_today'] = 0
+            bucket['throttled'] = 0
+        return bucket
+
+    def acquire(self, endpoint, tokens=1, max_wait=MAX_WAIT):
+        """
+        取令牌，令牌不足时等待；返回等待的秒数
+        endpoint 为 None 或未登记时直接放行
+        今日配额用完或等待超过 max_wait 时抛出 QuotaExceededError
+        """
+        if endpoint not in self.budgets:
+            return 0.0
+        budget = self.budgets[endpoint]
+        start = time.monotonic()
+
+        while True:
+            with self._locked_state() as state:
+                bucket = self._refill(state, endpoint, time.time())
+                daily = budget.get('daily')
+                if daily is not None and bucket['used_today'] + tokens > daily:
+                    raise QuotaExceededError(f"{endpoint} 今日配额已用完（{bucket['used_today']}/{daily}）")
+                if bucket['tokens'] >= tokens:
+                    bucket['tokens'] -= tokens
+                    bucket['used_today'] += tokens
+                    waited = time.monotonic() - start
+                    self.waited[endpoint] = self.waited.get(endpoint, 0.0) + waited
+                    return waited
+                delay = (tokens - bucket['tokens']) / budget['rate']
+
+            if time.monotonic() - start + delay > max_wait:
+                raise QuotaExceededError(f"{endpoint} 限流等待超过 {max_wait:.0f} 秒")
+            time.sleep(delay)
+
+    def record_throttled(self, endpoint, retry_after=None):
+        """接口返回 429：清空令牌桶（所有进程一起退避），返回建议等待秒数"""
+        if endpoint not in self.budgets:
+            return 0.0
+        budget = self.budgets[endpoint]
+        with self._locked_state() as state:
+            now = time.time()
+            bucket = self._refill(state, endpoint, now)
+            bucket['throttled'] += 1
+            # 令牌记为负数，等于让桶在 pause 秒后才恢复出一个令牌
+            pause = retry_after if retry_after is not None else 1.0 / budget['rate']
+            bucket['tokens'] = min(bucket['tokens'], 1.0 - pause * budget['rate'])
+        return pause
+
+    def quota_status(self):
+        """各接口的剩余令牌、今日用量和剩余配额"""
+        with self._locked_state() as state:
+            now = time.time()
+            status = {}
+            for endpoint, budget in self.budgets.items():
+                bucket = self._refill(state, endpoint, now)
+                daily = budget.get('daily')
+                status[endpoint] = {
+                    'tokens': round(bucket['tokens'], 2),
+                    'burst': budget['burst'],
+                    'rate': budget['rate'],
+                    'used_today': bucket['used_today'],
+                    'daily_quota': daily,
+                    'remaining_today': None if daily is None else max(0, daily - bucket['used_today']),
+                    'throttled_today': bucket['throttled'],
+                    'waited_seconds': round(self.waited.get(endpoint, 0.0), 2)
+                }
+        return status
+
+    def print_status(self):
+        """打印额度概况"""
+        for endpoint, s in self.quota_status().items():
+            remaining = '不限' if s['remaining_today'] is None else f"{s['remaining_today']}/{s['daily_quota']}"
+            print(f"   {endpoint}: 令牌 {s['tokens']}/{s['burst']}，今日已用 {s['used_today']}，"
+                  f"剩余配额 {remaining}，429 次数 {s['throttled_today']}")
+
+
+_default_limiter = None
+
+
+def get_limiter():
+    """获取进程内共享的限流器"""
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = RateLimiter()
+    return _default_limiter
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] != 'status':
+        print(__doc__)
+        return 1
+    print(f"🚦 限流状态: {STATE_PATH}")
+    get_limiter().print_status()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
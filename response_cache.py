@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口响应磁盘缓存
+按接口（endpoint）缓存，支持 TTL 和 stale-while-revalidate：
+- 缓存未过期：直接返回
+- 已过期但在 SWR 窗口内：先返回旧快照，后台线程刷新
+- 超出 SWR 窗口：同步重新获取
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# 缓存目录与时长（秒），可通过环境变量覆盖
+CACHE_DIR = os.environ.get('WEIBO_CACHE_DIR', os.path.join('.cache', 'responses'))
+DEFAULT_TTL = int(os.environ.get('WEIBO_CACHE_TTL', '600'))
+DEFAULT_SWR = int(os.environ.get('WEIBO_CACHE_SWR', '1800'))
+
+
+class ResponseCache:
+    """按 endpoint 缓存接口响应"""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, swr=DEFAULT_SWR):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.swr = swr
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{digest}.json')
+
+    def load(self, key):
+        """读取缓存条目，不存在或损坏时返回 None"""
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        return entry
+
+    def store(self, key, payload, fetched_at=None):
+        """原子写入缓存条目（先写临时文件再 rename）"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {'key': key, 'fetched_at': fetched_at or time.time(), 'payload': payload}
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return entry
+
+    def _refresh(self, key, fetch_fn, validate):
+        try:
+            payload = fetch_fn()
+            if validate is None or validate(payload):
+                self.store(key, payload)
+        except Exception as e:
+            print(f"⚠️  后台刷新缓存失败 ({key}): {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def refresh_in_background(self, key, fetch_fn, validate=None):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        # 非守护线程：脚本退出前会等待刷新写盘完成
+        threading.Thread(target=self._refresh, args=(key, fetch_fn, validate)).start()
+
+    def lookup(self, key):
+        """
+        查询缓存状态，返回 (entry, state)
+        state: fresh（未过期）/ stale（SWR 窗口内）/ expired（需要同步获取）
+        """
+        entry = self.load(key) if self.ttl > 0 else None
+        if entry is None:
+            return None, 'expired'
+        age = time.time() - entry['fetched_at']
+        if age < self.ttl:
+            return entry, 'fresh'
+        if age < self.ttl + self.swr:
+            return entry, 'stale'
+        return entry, 'expired'
+
+    def get_or_fetch(self, key, fetch_fn, validate=None):
+        """
+        获取缓存数据，必要时调用 fetch_fn 重新获取
+        validate(payload) 返回 False 的响应不会写入缓存
+        返回 (payload, fetched_at)，fetched_at 为该快照的获取时间戳
+        """
+        entry, state = self.lookup(key)
+        if state == 'stale':
+            self.refresh_in_background(key, fetch_fn, validate)
+        if state in ('fresh', 'stale'):
+            return entry['payload'], entry['fetched_at']
+
+        payload = fetch_fn()
+        if validate is None or validate(payload):
+            return payload, self.store(key, payload)['fetched_at']
+        return payload, time.time()
+
+
+_default_cache = None
+
+
+def get_cache():
+    """获取进程内共享的响应缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
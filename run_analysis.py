@@ -2,13 +2,23 @@
 # -*- coding: utf-8 -*-
 """
 微博热搜产品创意分析 - 完整自动化脚本
+所有阶段在同一进程内执行（pipeline.py），搜索后端和分析器分别由 WEIBO_SEARCH_BACKEND / WEIBO_ANALYZER 选择；
+未配置搜索后端时只获取热搜并在运行目录生成搜索计划，搜索结果保存后用 --resume 继续
+
+用法:
+    python3 run_analysis.py [--top-n 15] [--resume RUN_ID]
 """
 
 import sys
-import subprocess
-import time
 from datetime import datetime
 
+from pipeline import print_timings, run_pipeline
+from pipeline_config import get_top_n
+from pipeline_executor import get_analyzer
+from run_manifest import run_id_from_args
+from search_executor import get_backend
+from search_hotspot_details import create_manual_search_instructions, generate_search_commands, save_search_plan
+
 
 def print_banner():
     """打印程序横幅"""
@@ -20,99 +30,75 @@ def print_banner():
     print("-" * 70)
 
 
-def print_step(step_num, total, title):
-    """打印步骤信息"""
-    print(f"\n【步骤 {step_num}/{total}】{title}")
-    print("-" * 70)
-
-
-def run_script(script_name, description):
-    """运行Python脚本"""
-    print(f"\n📦 正在运行: {description}")
-    print(f"   脚本: {script_name}\n")
-
-    try:
-        result = subprocess.run(
-            [sys.executable, script_name],
-            capture_output=True,
-            text=True,
-            encoding='utf-8'
-        )
-
-        # 打印输出
-        if result.stdout:
-            print(result.stdout)
-
-        # 如果有错误
-        if result.stderr:
-            print(f"⚠️  警告/错误信息:")
-            print(result.stderr)
-
-        # 检查返回码
-        if result.returncode == 0:
-            print(f"✅ {description} - 成功")
-            return True
-        else:
-            print(f"❌ {description} - 失败 (返回码: {result.returncode})")
-            return False
-
-    except Exception as e:
-        print(f"❌ 执行失败: {e}")
-        return False
-
-
 def main():
-    """主函数 - 执行完整分析流程"""
+    """主函数 - 在当前进程内执行完整分析流程（pipeline.py），各阶段直接传递内存中的数据"""
     print_banner()
 
-    total_steps = 4
+    args = sys.argv[1:]
+    # 未配置搜索后端时只获取热搜，并生成搜索计划交给 agent 搜索
+    try:
+        backend = get_backend()
+    except RuntimeError as e:
+        print(f"⚠️  {e}")
+        backend = None
 
-    # 步骤1: 获取微博热搜
-    print_step(1, total_steps, "获取微博热搜数据")
-    success = run_script('fetch_weibo_hotspot.py', '获取微博热搜')
-    if not success:
-        print("\n❌ 第一步失败，请检查网络连接或API可用性")
+    try:
+        analyzer = get_analyzer()
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
         return 1
 
-    # 暂停一下，让用户查看结果
-    time.sleep(2)
-
-    # 步骤2: 生成搜索计划
-    print_step(2, total_steps, "生成搜索计划")
-    success = run_script('search_hotspot_details.py', '生成搜索计划')
-    if not success:
-        print("\n❌ 第二步失败")
+    run = run_pipeline(top_n=get_top_n(args), backend=backend, analyzer=analyzer,
+                       run_id=run_id_from_args(args) if '--resume' in args else None,
+                       stop_after='fetch' if backend is None else None)
+    manifest = run.manifest
+    run_dir = manifest.run_dir
+    print()
+    print_timings(run)
+    print(f"🗂️  运行ID: {manifest.run_id}")
+
+    if not run.queries:
+        print("\n❌ 获取热搜失败，请检查网络连接或API可用性")
         return 1
 
-    # 步骤3: AI分析
-    print_step(3, total_steps, "AI分析准备")
-    success = run_script('analyze_hotspot_with_ai.py', '生成AI分析提示')
-    if not success:
-        print("\n❌ 第三步失败")
+    if backend is None:
+        pending = [q for q in run.pending() if q['rank'] not in run.search]
+        commands = generate_search_commands(pending)
+        save_search_plan(commands, manifest.path('search_plan.md'))
+        create_manual_search_instructions(commands, manifest, manifest.path('MANUAL_SEARCH.md'))
+        print("\n📁 已生成的文件:")
+        print(f"   ✓ {run_dir}/weibo_search_queries.json (热搜数据)")
+        print(f"   ✓ {run_dir}/search_plan.md (搜索计划，{len(commands)} 个话题待搜索)")
+        print(f"   ✓ {run_dir}/MANUAL_SEARCH.md (手动搜索说明)")
+        print("\n💡 下一步操作:")
+        print(f"   1. 按搜索计划搜索，结果保存为 {run_dir}/search_results_XX.json")
+        print(f"   2. 运行: python3 run_analysis.py --resume {manifest.run_id}")
+        return 0
+
+    if not run.report:
+        # 分析交给 agent（WEIBO_ANALYZER=external）或有话题失败：提示已写入运行目录
+        print("\n📁 已生成的文件:")
+        print(f"   ✓ {run_dir}/weibo_search_queries.json (热搜数据)")
+        print(f"   ✓ {run_dir}/search_results_XX.json (搜索结果)")
+        print(f"   ✓ {run_dir}/analysis_prompts/ (AI提示文件目录)")
+        print("\n💡 下一步操作:")
+        print(f"   1. 分析提示文件，结果保存为 {run_dir}/analysis_results/result_XX.json")
+        print(f"   2. 运行: python3 run_analysis.py --resume {run.manifest.run_id}")
         return 1
 
-    # 步骤4: 生成报告
-    print_step(4, total_steps, "生成HTML报告")
-    success = run_script('generate_html_report.py', '生成HTML报告')
-    if not success:
-        print("\n❌ 第四步失败")
-        return 1
+    archive_file, latest_file = run.report
 
     # 完成
     print("\n" + "=" * 70)
     print(" 🎉 全部步骤执行完成！")
     print("=" * 70)
     print("\n📄 输出文件:")
-    print("   ✓ weibo_hotspot_analysis.html (主报告)")
-    print("   ✓ weibo_hotspot_analysis.json (数据文件)")
-    print("   ✓ weibo_search_queries.json (热搜数据)")
-    print("\n📁 辅助文件:")
-    print("   ✓ search_plan.md (搜索计划)")
-    print("   ✓ MANUAL_SEARCH.md (手动搜索说明)")
-    print("   ✓ AI_ANALYSIS_INSTRUCTIONS.md (AI分析说明)")
-    print("   ✓ analysis_prompts/ (AI提示文件目录)")
+    print(f"   ✓ {latest_file} (主报告)")
+    print(f"   ✓ {archive_file} (归档报告)")
+    print(f"   ✓ {run_dir}/hotspot_analysis_results.json (数据文件)")
+    print(f"   ✓ {run_dir}/weibo_search_queries.json (热搜数据)")
     print("\n💡 下一步操作:")
-    print("   1. 在浏览器中打开 weibo_hotspot_analysis.html")
+    print(f"   1. 在浏览器中打开 {latest_file}")
     print("   2. 查看分析结果和产品创意")
     print("   3. 分数≥80的建议重点关注")
     print("\n" + "=" * 70 + "\n")
@@ -7,20 +7,13 @@
 
 import os
 import sys
-import json
-import subprocess
 from datetime import datetime
 
-def run_command(command, description):
-    """运行命令并显示进度"""
-    print(f"\n{'=' * 60}")
-    print(f"🔄 {description}")
-    print('=' * 60)
-    result = subprocess.run(command, shell=True)
-    if result.returncode != 0:
-        print(f"❌ 执行失败: {description}")
-        return False
-    return True
+from pipeline import print_timings, run_pipeline
+from pipeline_config import get_top_n
+from pipeline_executor import get_analyzer
+from run_manifest import new_run_id
+from search_executor import get_backend
 
 def main():
     print("=" * 60)
@@ -34,22 +27,41 @@ def main():
     os.chdir(script_dir)
     print(f"📂 工作目录: {script_dir}")
 
-    # 步骤1: 获取微博热搜数据
-    if not run_command("python3 fetch_weibo_hotspot.py", "步骤1: 获取微博热搜数据"):
+    # 固定本次运行ID，与同时进行的其他运行互不干扰
+    os.environ.setdefault('WEIBO_RUN_ID', new_run_id())
+    print(f"🗂️  运行ID: {os.environ['WEIBO_RUN_ID']}")
+
+    # 未配置搜索后端时只获取热搜，搜索和分析交给 agent
+    try:
+        backend = get_backend()
+    except RuntimeError as e:
+        print(f"⚠️  {e}")
+        backend = None
+
+    try:
+        analyzer = get_analyzer()
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
         return 1
 
-    # 检查是否成功获取数据
-    if not os.path.exists('weibo_search_queries.json'):
+    # 各阶段在当前进程内执行，直接传递内存中的数据
+    run = run_pipeline(top_n=get_top_n(sys.argv[1:]), backend=backend, analyzer=analyzer,
+                       stop_after='fetch' if backend is None else None)
+    print_timings(run)
+    if not run.queries:
         print("❌ 未找到热搜数据文件，分析终止")
         return 1
 
     print("\n✅ 步骤1完成：热搜数据获取成功")
+    if run.report:
+        print(f"\n✅ 报告已生成: {run.report[1]}")
+        return 0
 
     # 步骤2: 使用AI分析热搜话题
     print("\n" + "=" * 60)
     print("🔄 步骤2: AI分析热搜话题并生成产品创意")
     print("=" * 60)
-    print("\n正在使用AI分析15个热搜话题...")
+    print(f"\n正在使用AI分析{len(run.pending())}个热搜话题...")
 
     # 这里将通过Task工具进行分析
     print("\n⚠️  请使用 Claude Code 的 Task 工具执行热搜分析")
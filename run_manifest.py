@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行清单（manifest）
+每次运行的产物放在独立目录 runs/<run_id>/ 下，manifest.json 记录：
+运行ID、每个排名的话题信息，以及每个排名各阶段产物（搜索结果 / 分析提示 / 分析结果）的路径、哈希和大小。
+各阶段通过清单按排名直接定位文件，不再扫描项目根目录、从文件名里解析排名；
+并发的多次运行各自写自己的目录，互不覆盖。运行目录内的文件一律先写临时文件再改名，读者不会读到写了一半的 JSON。
+合并结果完成后 runs/latest 原子地指向该运行，报告脚本默认读取它。
+
+清单里登记的产物同时就是该排名该阶段的完成标记：文件存在、哈希一致且内容通过校验才算完成。
+中断的运行可以用 --resume RUN_ID 继续，各阶段只重做缺失或无效的产物。
+
+当前运行的确定顺序：--run 参数 → 环境变量 WEIBO_RUN_ID → 最近创建的运行
+已完成运行（报告）的确定顺序：--run 参数 → 环境变量 WEIBO_RUN_ID → runs/latest
+
+用法:
+    python3 run_manifest.py show [RUN_ID]
+    python3 run_manifest.py list
+    python3 run_manifest.py latest
+    python3 run_manifest.py pending RUN_ID search|prompt|analysis   # 输出该阶段尚未完成的排名
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+RUNS_DIR = os.environ.get('WEIBO_RUNS_DIR', 'runs')
+MANIFEST_NAME = 'manifest.json'
+LATEST_LINK = 'latest'
+
+# 各阶段每个排名的标准文件位置（相对运行目录）
+STAGE_FILES = {
+    'search': 'search_results_{rank:02d}.json',
+    'prompt': os.path.join('analysis_prompts', 'prompt_{rank:02d}.txt'),
+    'analysis': os.path.join('analysis_results', 'result_{rank:02d}.json'),
+}
+
+STAGES = tuple(STAGE_FILES)
+
+QUERIES_FILE = 'weibo_search_queries.json'
+RESULTS_FILE = 'hotspot_analysis_results.json'
+
+
+def _valid_search(path):
+    """搜索结果：有正文或逐条结果"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return bool(data)
+    return isinstance(data, dict) and bool(data.get('content') or data.get('results'))
+
+
+def _valid_prompt(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return bool(f.read().strip())
+
+
+def _valid_analysis(path):
+    """分析结果：带评分的 JSON 对象"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return isinstance(data, dict) and isinstance(data.get('total_score', data.get('score')), (int, float))
+
+
+# 各阶段产物的内容校验（写了一半、格式不对的文件不算完成）
+VALIDATORS = {
+    'search': _valid_search,
+    'prompt': _valid_prompt,
+    'analysis': _valid_analysis,
+}
+
+
+def is_valid_artifact(stage, path):
+    try:
+        return VALIDATORS[stage](path)
+    except (OSError, ValueError):
+        return False
+
+
+def new_run_id():
+    """运行ID：时间戳 + 随机后缀（按名称排序即按时间排序）"""
+    return datetime.now().strftime('%Y%m%d_%H%M%S') + '_' + secrets.token_hex(2)
+
+
+def _replace_from_temp(path, write):
+    """在目标目录写临时文件，成功后 os.replace 到目标位置；失败时清理临时文件"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        write(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data):
+    """先写临时文件再替换，读者不会看到写了一半的文件"""
+    def write(fd):
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    _replace_from_temp(path, write)
+
+
+def write_text_atomic(path, text):
+    """文本文件的原子写入"""
+    def write(fd):
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+    _replace_from_temp(path, write)
+
+
+def copy_atomic(src, dst):
+    """原子复制文件"""
+    def write(fd):
+        with os.fdopen(fd, 'wb') as f, open(src, 'rb') as source:
+            shutil.copyfileobj(source, f)
+    _replace_from_temp(dst, write)
+
+
+def file_digest(path):
+    """文件的 sha256 和大小"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest(), os.path.getsize(path)
+
+
+def list_runs(runs_dir=RUNS_DIR):
+    """所有运行ID（旧→新）"""
+    if not os.path.isdir(runs_dir):
+        return []
+    return sorted(name for name in os.listdir(runs_dir)
+                  if name != LATEST_LINK and os.path.exists(os.path.join(runs_dir, name, MANIFEST_NAME)))
+
+
+def latest_run_id(runs_dir=RUNS_DIR):
+    """runs/latest 指向的已完成运行，没有时返回 None"""
+    link = os.path.join(runs_dir, LATEST_LINK)
+    return os.path.basename(os.readlink(link)) if os.path.islink(link) else None
+
+
+def resolve_run_id(run_id=None, runs_dir=RUNS_DIR, completed=False):
+    """
+    确定运行：显式指定 → WEIBO_RUN_ID → 最近创建的运行（completed=True 时为 runs/latest）
+    都没有时返回 None
+    """
+    run_id = run_id or os.environ.get('WEIBO_RUN_ID')
+    if run_id:
+        return run_id
+    if completed:
+        return latest_run_id(runs_dir)
+    runs = list_runs(runs_dir)
+    return runs[-1] if runs else None
+
+
+def run_id_from_args(args):
+    """从命令行参数里取 --run RUN_ID 或 --resume RUN_ID"""
+    for flag in ('--resume', '--run'):
+        if flag in args:
+            return args[args.index(flag) + 1]
+    return None
+
+
+class RunManifest:
+    """一次运行的产物清单"""
+
+    def __init__(self, run_dir, data):
+        self.run_dir = run_dir
+        self.data = data
+
+    @classmethod
+    def create(cls, run_id=None, runs_dir=RUNS_DIR):
+        """新建运行（run_id 未指定时读取 WEIBO_RUN_ID，再不行就生成新的）；同名运行已存在时直接打开"""
+        run_id = run_id or os.environ.get('WEIBO_RUN_ID') or new_run_id()
+        run_dir = os.path.join(runs_dir, run_id)
+        if os.path.exists(os.path.join(run_dir, MANIFEST_NAME)):
+            return cls.load(run_id, runs_dir)
+        os.makedirs(run_dir, exist_ok=True)
+        manifest = cls(run_dir, {
+            'run_id': run_id,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'files': {},
+            'topics': {}
+        })
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, run_id=None, runs_dir=RUNS_DIR, completed=False):
+        """打开已有运行（completed=True 时默认打开 runs/latest），找不到时抛出 FileNotFoundError"""
+        run_id = resolve_run_id(run_id, runs_dir, completed)
+        if not run_id:
+            if completed:
+                raise FileNotFoundError(f"{runs_dir}/{LATEST_LINK} 不存在，请先运行 combine_results.py")
+            raise FileNotFoundError(f"{runs_dir}/ 下没有任何运行，请先运行 fetch_weibo_hotspot.py")
+        run_dir = os.path.join(runs_dir, run_id)
+        with open(os.path.join(run_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return cls(run_dir, json.load(f))
+
+    @property
+    def run_id(self):
+        return self.data['run_id']
+
+    def path(self, relative):
+        """运行目录内的路径"""
+        return os.path.join(self.run_dir, relative)
+
+    def stage_path(self, rank, stage):
+        """某个排名某个阶段的标准文件位置"""
+        return self.path(STAGE_FILES[stage].format(rank=rank))
+
+    def set_topics(self, queries):
+        """登记本次运行的话题（按排名）"""
+        self.data['topics'] = {
+            str(q['rank']): {
+                'rank': q['rank'],
+                'title': q['title'],
+                'topic_id': q.get('topic_id', ''),
+                'heat': q.get('heat', 0),
+                'reprocess': q.get('reprocess', True),
+                'artifacts': self.data['topics'].get(str(q['rank']), {}).get('artifacts', {})
+            }
+            for q in queries
+        }
+
+    def ranks(self):
+        return sorted(int(rank) for rank in self.data['topics'])
+
+    def topic(self, rank):
+        return self.data['topics'].get(str(rank))
+
+    def _entry(self, path):
+        sha256, size = file_digest(path)
+        return {'path': os.path.relpath(path, self.run_dir), 'sha256': sha256, 'size': size}
+
+    def record(self, rank, stage, path=None):
+        """登记某个排名某个阶段的产物（默认为标准位置），记录哈希和大小"""
+        path = path or self.stage_path(rank, stage)
+        topic = self.data['topics'].setdefault(str(rank), {'rank': rank, 'artifacts': {}})
+        topic.setdefault('artifacts', {})[stage] = self._entry(path)
+
+    def record_file(self, name, path):
+        """登记运行级文件（话题列表、合并结果等）"""
+        self.data['files'][name] = self._entry(path)
+
+    def file(self, name):
+        """运行级文件的路径，未登记时返回 None"""
+        entry = self.data['files'].get(name)
+        return self.path(entry['path']) if entry else None
+
+    def _matches(self, entry):
+        """登记的文件仍然存在，且大小和哈希与登记时一致"""
+        path = self.path(entry['path'])
+        if not os.path.exists(path) or os.path.getsize(path) != entry['size']:
+            return False
+        return file_digest(path)[0] == entry['sha256']
+
+    def file_complete(self, name):
+        """运行级文件已登记且未被改动"""
+        entry = self.data['files'].get(name)
+        return bool(entry) and self._matches(entry)
+
+    def load_json(self, name):
+        """读取运行级 JSON 文件（queries / results），未登记时抛出 FileNotFoundError"""
+        path = self.file(name)
+        if not path:
+            raise FileNotFoundError(f"运行 {self.run_id} 没有 {name} 文件")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_json(self, name, relative, data):
+        """原子写入运行级 JSON 文件并登记"""
+        path = self.path(relative)
+        write_json_atomic(path, data)
+        self.record_file(name, path)
+        return path
+
+    def is_complete(self, rank, stage):
+        """
+        某个排名某个阶段是否已完成
+        已登记的产物：文件存在、哈希一致、内容有效才算完成；哈希不一致时撤销登记，需要重做
+        未登记但标准位置有有效文件（agent 手动写入）时补登记
+        """
+        artifacts = (self.topic(rank) or {}).get('artifacts', {})
+        entry = artifacts.get(stage)
+        if entry:
+            if self._matches(entry) and is_valid_artifact(stage, self.path(entry['path'])):
+                return True
+            del artifacts[stage]
+            return False
+        path = self.stage_path(rank, stage)
+        if os.path.exists(path) and is_valid_artifact(stage, path):
+            self.record(rank, stage, path)
+            return True
+        return False
+
+    def artifact(self, rank, stage):
+        """某个排名某个阶段的已完成产物路径，缺失或无效时返回 None"""
+        if not self.is_complete(rank, stage):
+            return None
+        return self.path(self.topic(rank)['artifacts'][stage]['path'])
+
+    def load_artifact(self, rank, stage):
+        """读取某个排名某个阶段的已完成 JSON 产物，缺失或无效时返回 None"""
+        path = self.artifact(rank, stage)
+        if not path:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def pending(self, stage, ranks=None):
+        """该阶段尚未完成的排名"""
+        return [rank for rank in (self.ranks() if ranks is None else ranks) if not self.is_complete(rank, stage)]
+
+    def progress(self):
+        """各阶段完成情况 {阶段: (已完成, 总数)}"""
+        ranks = self.ranks()
+        return {stage: (len(ranks) - len(self.pending(stage, ranks)), len(ranks)) for stage in STAGES}
+
+    def save(self):
+        """原子写回 manifest.json"""
+        write_json_atomic(self.path(MANIFEST_NAME), self.data)
+
+    def publish(self):
+        """标记运行完成，并把 runs/latest 原子地指向本运行（先建临时链接再改名）"""
+        self.data['completed_at'] = datetime.now().isoformat(timespec='seconds')
+        self.save()
+        runs_dir = os.path.dirname(os.path.abspath(self.run_dir))
+        tmp_link = os.path.join(runs_dir, f'.{LATEST_LINK}.{os.getpid()}.tmp')
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(self.run_id, tmp_link)
+        os.replace(tmp_link, os.path.join(runs_dir, LATEST_LINK))
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('show', 'list', 'latest', 'pending'):
+        print(__doc__)
+        return 1
+
+    if args[0] == 'list':
+        latest = latest_run_id()
+        for run_id in list_runs():
+            print(f"{run_id}{'  ← latest' if run_id == latest else ''}")
+        return 0
+
+    if args[0] == 'latest':
+        latest = latest_run_id()
+        if not latest:
+            print("❌ 还没有已完成的运行")
+            return 1
+        print(latest)
+        return 0
+
+    try:
+        manifest = RunManifest.load(args[1] if len(args) > 1 else None)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return 1
+
+    if args[0] == 'pending':
+        if len(args) < 3 or args[2] not in STAGES:
+            print(__doc__)
+            return 1
+        print(' '.join(str(rank) for rank in manifest.pending(args[2])))
+        return 0
+
+    status = f"完成于 {manifest.data['completed_at']}" if manifest.data.get('completed_at') else '进行中'
+    print(f"🗂️  运行 {manifest.run_id}（{manifest.data['created_at']}，{status}）: {manifest.run_dir}")
+    for rank in manifest.ranks():
+        marks = ' '.join(f"{stage}{'✓' if manifest.is_complete(rank, stage) else '✗'}" for stage in STAGES)
+        print(f"   #{rank:2d} {manifest.topic(rank).get('title', '')}  [{marks}]")
+    progress = manifest.progress()
+    print('   完成情况: ' + '，'.join(f"{stage} {done}/{total}" for stage, (done, total) in progress.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,27 +3,43 @@
 """
 微博热搜产品创意分析 - 自动化流水线版本
 实现流水线并行：搜索+分析重叠执行
+
+用法:
+    python3 run_pipeline_automation.py                 # 为当前运行生成执行计划和操作指南
+    python3 run_pipeline_automation.py --execute [--top-n 15] [--backend stub|local|tavily]
+                                       [--analyzer external|anthropic|stub] [--concurrency 5]
+                                       [--analyze-concurrency 3] [--no-cache] [--no-cluster]
+                                       [--staged] [--no-prefetch] [--no-render]
+                                       [--resume RUN_ID]
+                                                       # 在进程内按依赖图执行 fetch → search → prompt →
+                                                       # analyze → combine → render（pipeline_executor.py）
+                                                       # --staged: 对照模式，全部搜索结束后才开始分析
+                                                       # --no-prefetch: 热搜列表解析完、快照对比完成后才开始搜索
 """
 
-import json
+import asyncio
 import sys
 import os
 from pathlib import Path
 from datetime import datetime
 
+from fetch_weibo_hotspot import prepare_run
+from pipeline_config import get_source_names, get_top_n
+from pipeline_executor import ANALYZE_CONCURRENCY, execute_plan, fetch_stage, get_analyzer
+from run_manifest import RunManifest, run_id_from_args, write_text_atomic
+from search_executor import SEARCH_CONCURRENCY, SearchPrefetch, get_backend
 
-def load_search_queries():
-    """加载搜索查询"""
+
+def load_search_queries(manifest):
+    """加载本次运行的搜索查询"""
     try:
-        with open('weibo_search_queries.json', 'r', encoding='utf-8') as f:
-            queries = json.load(f)
-        return queries
+        return manifest.load_json('queries')
     except Exception as e:
         print(f"❌ 加载热搜查询失败: {e}")
         return []
 
 
-def generate_orchestration_plan(queries):
+def generate_orchestration_plan(queries, manifest):
     """生成自动化执行计划"""
     print("=" * 70)
     print("正在生成自动化执行计划...")
@@ -49,8 +65,8 @@ def generate_orchestration_plan(queries):
             "title": title,
             "search_query": search_query,
             "search_command": f"/WebSearch {search_query}",
-            "result_file": f"search_results_{rank:02d}.json",
-            "analysis_file": f"analysis_results_{rank:02d}.json",
+            "result_file": manifest.stage_path(rank, 'search'),
+            "analysis_file": manifest.stage_path(rank, 'analysis'),
             "status": "pending"
         }
 
@@ -67,14 +83,14 @@ def generate_orchestration_plan(queries):
 # 然后保存结果到: {task['result_file']}
 
 # 步骤 2: AI分析产品创意
-# 使用 Task 工具分析，提示文件: analysis_prompts/prompt_{rank:02d}.txt
+# 使用 Task 工具分析，提示文件: {manifest.stage_path(rank, 'prompt')}
 # 保存结果到: {task['analysis_file']}
 """
         orchestration_commands.append(cmd)
 
-    # 保存计划
-    with open('orchestration_plan.json', 'w', encoding='utf-8') as f:
-        json.dump(plan, f, ensure_ascii=False, indent=2)
+    # 保存计划到运行目录
+    manifest.write_json('plan', 'orchestration_plan.json', plan)
+    manifest.save()
 
     print(f"✅ 已生成 {len(queries)} 个任务的执行计划")
     print(f"⏱️  预计总耗时: {plan['estimated_time']}")
@@ -83,8 +99,9 @@ def generate_orchestration_plan(queries):
     return plan, orchestration_commands
 
 
-def create_claude_code_script(queries):
-    """创建供Claude Code执行的自动化脚本"""
+def create_claude_code_script(queries, manifest):
+    """创建供Claude Code执行的自动化脚本（写入运行目录，脚本里固定读取本次运行的计划）"""
+    plan_file = manifest.file('plan')
 
     script = f"""#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
@@ -104,7 +121,7 @@ print(f"Start Time: {{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}}")
 print()
 
 # Load task list
-with open('orchestration_plan.json', 'r', encoding='utf-8') as f:
+with open({plan_file!r}, 'r', encoding='utf-8') as f:
     plan = json.load(f)
 
 total = len(plan['workflow'])
@@ -151,14 +168,16 @@ print("=" * 70)
 """
 
     # 保存脚本
-    with open('run_for_claude_code.py', 'w', encoding='utf-8') as f:
-        f.write(script)
+    script_file = manifest.path('run_for_claude_code.py')
+    write_text_atomic(script_file, script)
 
-    print(f"✅ 已生成 Claude Code 执行脚本: run_for_claude_code.py")
+    print(f"✅ 已生成 Claude Code 执行脚本: {script_file}")
+    return script_file
 
 
-def create_pipeline_execution_guide():
-    """Create pipeline execution guide"""
+def create_pipeline_execution_guide(manifest):
+    """Create pipeline execution guide (written into the run directory)"""
+    script_file = manifest.path('run_for_claude_code.py')
 
     guide = f"""# Weibo Hotspot Automation - Pipeline Execution Guide
 
@@ -193,7 +212,7 @@ Use two parallel Claude Code sessions: **Search Session** and **Analysis Session
 
 Run in Claude Code:
 ```
-python run_for_claude_code.py
+python {script_file}
 ```
 
 This will sequentially start all WebSearch tasks. When the first search completes:
@@ -365,20 +384,67 @@ If execution fails:
 
 Check these files if problems occur:
 - orchestration_plan.json - execution plan
-- run_for_claude_code.py - automation script
+- {script_file} - automation script
 - AI_ANALYSIS_INSTRUCTIONS.md - detailed instructions
 
 """
 
-    with open('PIPELINE_EXECUTION_GUIDE.md', 'w', encoding='utf-8') as f:
-        f.write(guide)
+    guide_file = manifest.path('PIPELINE_EXECUTION_GUIDE.md')
+    write_text_atomic(guide_file, guide)
+
+    print(f"✅ Pipeline execution guide generated: {guide_file}")
+    return guide_file
 
-    print(f"✅ Pipeline execution guide generated: PIPELINE_EXECUTION_GUIDE.md")
 
 
+async def execute_pipeline(args):
+    """--execute：fetch 节点 → 生成计划 → 各排名节点（流水线）→ combine → render"""
+    try:
+        backend = get_backend(args[args.index('--backend') + 1] if '--backend' in args else None)
+        analyzer = get_analyzer(args[args.index('--analyzer') + 1] if '--analyzer' in args else None)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    concurrency = int(args[args.index('--concurrency') + 1]) if '--concurrency' in args else SEARCH_CONCURRENCY
+    analyze_concurrency = int(args[args.index('--analyze-concurrency') + 1]) \
+        if '--analyze-concurrency' in args else ANALYZE_CONCURRENCY
+    use_cache = '--no-cache' not in args
+
+    # fetch 节点：继续中断的运行时沿用已有话题，否则为本次运行获取热搜（在本进程内执行）；
+    # 热搜列表流式解析，需要处理的话题一解析出来就开始预取搜索
+    manifest = RunManifest.create(run_id_from_args(args) if '--resume' in args else None)
+    prefetch = None
+    if manifest.file_complete('queries'):
+        print(f"♻️  继续运行 {manifest.run_id}，沿用已获取的 {len(manifest.ranks())} 个话题")
+    else:
+        if '--no-prefetch' not in args:
+            prefetch = SearchPrefetch(backend, concurrency, use_cache)
+        queries, fetched_at, diff_source = await fetch_stage(get_top_n(args), get_source_names(args), prefetch)
+        if not queries or not await asyncio.to_thread(prepare_run, queries, fetched_at, diff_source, manifest):
+            print("❌ 获取热搜失败")
+            if prefetch is not None:
+                prefetch.cancel()
+            return 1
+
+    queries = load_search_queries(manifest)
+    if not queries:
+        return 1
+    plan, _ = generate_orchestration_plan(queries, manifest)
+    print()
+
+    return await execute_plan(manifest, plan, queries, render='--no-render' not in args,
+                              backend=backend, analyzer=analyzer, search_concurrency=concurrency,
+                              analyze_concurrency=analyze_concurrency, use_cache=use_cache,
+                              cluster='--no-cluster' not in args, pipelined='--staged' not in args,
+                              prefetch=prefetch)
+
 
 def main():
     """Main function"""
+    if '--execute' in sys.argv[1:]:
+        return asyncio.run(execute_pipeline(sys.argv[1:]))
+
     print("=" * 70)
     print("Weibo Hotspot Automation Pipeline - Master Program")
     print("Generated:", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
@@ -387,7 +453,12 @@ def main():
 
     # Step 1: Load hot topic data
     print("[Step 1/3] Loading hot topic data...")
-    queries = load_search_queries()
+    try:
+        manifest = RunManifest.load(run_id_from_args(sys.argv[1:]))
+    except FileNotFoundError as e:
+        print(f"\n❌ {e}")
+        return 1
+    queries = load_search_queries(manifest)
     if not queries:
         print("\n❌ Hot topic data not found, please run first:")
         print("   python fetch_weibo_hotspot.py")
@@ -398,13 +469,13 @@ def main():
 
     # Step 2: Generate automation plan
     print("[Step 2/3] Generating automation execution plan...")
-    plan, commands = generate_orchestration_plan(queries)
+    plan, commands = generate_orchestration_plan(queries, manifest)
     print()
 
     # Step 3: Create execution scripts and guides
     print("[Step 3/3] Creating automation scripts...")
-    create_claude_code_script(queries)
-    create_pipeline_execution_guide()
+    script_file = create_claude_code_script(queries, manifest)
+    guide_file = create_pipeline_execution_guide(manifest)
     print()
 
     # Complete
@@ -413,18 +484,19 @@ def main():
     print("=" * 70)
     print()
     print("📁 Generated files:")
-    print("   ✓ orchestration_plan.json - execution plan")
-    print("   ✓ run_for_claude_code.py - execution script")
-    print("   ✓ PIPELINE_EXECUTION_GUIDE.md - complete guide")
+    print(f"   ✓ {manifest.file('plan')} - execution plan")
+    print(f"   ✓ {script_file} - execution script")
+    print(f"   ✓ {guide_file} - complete guide")
     print()
     print("🚀 Quick start:")
     print("   1. In Claude Code:")
-    print("      python run_for_claude_code.py")
+    print(f"      python {script_file}")
     print()
     print("   2. View detailed guide:")
-    print("      cat PIPELINE_EXECUTION_GUIDE.md")
+    print(f"      cat {guide_file}")
     print()
-    print("💡 Tip: Use two terminal sessions for true pipeline parallelism!")
+    print("💡 Tip: python3 run_pipeline_automation.py --execute runs the whole pipeline in-process,")
+    print("   starting each topic's analysis as soon as its search finishes")
     print()
 
     return 0
@@ -2,6 +2,10 @@
 """
 微博热搜分析 - 自动化 Agent 脚本
 使用 Claude Agent SDK 自动执行完整的分析流程
+
+用法:
+    python3 run_weibo_agent.py [--top-n 15]
+    python3 run_weibo_agent.py --resume RUN_ID    # 继续中断的运行，只重做缺失或无效的搜索和分析
 """
 
 import asyncio
@@ -10,6 +14,10 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+from pipeline_config import get_top_n
+from rate_limiter import QuotaExceededError, get_limiter
+from run_manifest import RUNS_DIR, RunManifest, new_run_id, run_id_from_args
+
 try:
     from claude_agent_sdk import query, ClaudeAgentOptions
 except ImportError:
@@ -35,36 +43,67 @@ async def run_weibo_analysis():
     print("=" * 60)
     print()
 
+    # 分析条数（--top-n 或环境变量 WEIBO_TOP_N）
+    top_n = get_top_n(sys.argv[1:])
+    print(f"分析条数: 前 {top_n} 条")
+
+    # 预先分配运行ID：agent 调用的每个脚本都通过 WEIBO_RUN_ID 读写同一个运行目录
+    # --resume RUN_ID 时沿用中断的运行，清单里已完成的话题/阶段不再重做
+    resume = '--resume' in sys.argv[1:]
+    if resume:
+        run_id = run_id_from_args(sys.argv[1:])
+        try:
+            manifest = RunManifest.load(run_id)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ 无法继续运行 {run_id}: {e}")
+            return False
+        print(f"继续运行: {run_id}")
+        for stage, (done, total) in manifest.progress().items():
+            print(f"   {stage}: 已完成 {done}/{total}")
+        manifest.save()
+    else:
+        run_id = os.environ.get('WEIBO_RUN_ID') or new_run_id()
+        print(f"运行ID: {run_id}")
+    run_dir = f"{RUNS_DIR}/{run_id}"
+    os.environ['WEIBO_RUN_ID'] = run_id
+    print()
+    fetch_command = f"python3 fetch_weibo_hotspot.py --resume {run_id}" if resume \
+        else f"python3 fetch_weibo_hotspot.py --top-n {top_n}"
+
     # 定义完整的 workflow 步骤
-    workflow_prompt = """
+    workflow_prompt = f"""
 请按照以下步骤完成微博热搜分析：
+（本次运行ID为 {run_id}，环境变量 WEIBO_RUN_ID 已设置；所有产物都在 {run_dir}/ 下，不要写到项目根目录）
 
 1. **安装依赖**
    - 运行: pip install requests
 
 2. **获取微博热点数据**
-   - 运行: python3 fetch_weibo_hotspot.py
-   - 这会生成 weibo_search_queries.json 文件
+   - 运行: {fetch_command}
+   - 这会创建运行目录 {run_dir}/，生成 {run_dir}/weibo_search_queries.json 和清单 manifest.json
+     （继续中断的运行时沿用已获取的话题，不会重新获取）
 
 3. **搜索热点详情**
-   - 读取 weibo_search_queries.json 文件
-   - 对前 15 个条目（rank 1-15）进行网络搜索
-   - 对每个条目：
+   - 运行: python3 search_hotspot_details.py --execute
+   - 这会并发搜索所有需要处理的条目并直接生成 {run_dir}/search_results_{{rank}}.json
+     （已有有效搜索结果的条目——从历史结果复用的或中断前已完成的——会自动跳过）
+   - 只有当命令报告某些排名搜索失败（或未配置搜索后端）时，才对这些条目手动搜索：
      * 使用 WebSearch 工具搜索 search_query 或 title
-     * 创建文件 search_results_{rank}.json（两位数字格式，如 01, 02）
-     * JSON 格式: {"title": "标题", "content": "搜索结果摘要"}
+     * 创建文件 {run_dir}/search_results_{{rank}}.json（两位数字格式，如 01, 02）
+     * JSON 格式: {{"title": "标题", "content": "搜索结果摘要"}}
 
 4. **生成 AI 分析提示**
    - 运行: python3 analyze_hotspot_with_ai.py
-   - 这会在 analysis_prompts/ 目录生成提示文件
+   - 这会在 {run_dir}/analysis_prompts/ 目录为还没有有效分析结果的话题生成提示文件
 
 5. **执行 AI 分析**
-   - 创建 analysis_results 目录（如果不存在）
-   - 列出 analysis_prompts/ 中的所有提示文件
-   - 对每个 prompt_XX.txt 文件：
-     * 读取提示内容
+   - 运行: python3 llm_analysis.py
+   - 这会把仍需分析的提示直接并发发送给模型 API，校验后写入 {run_dir}/analysis_results/result_{{rank}}.json
+     （已复用或已完成的话题会自动跳过）；不要自己逐个读取提示文件
+   - 只有当命令报告某些排名仍缺少分析结果时，才对这些排名手动分析：
+     * 读取 {run_dir}/analysis_prompts/prompt_XX.txt
      * 你自己处理这个提示（生成分析结果）
-     * 保存 JSON 响应到 analysis_results/result_{rank}.json
+     * 保存 JSON 响应到 {run_dir}/analysis_results/result_{{rank}}.json
 
 6. **合并结果**
    - 运行: python3 combine_results.py
@@ -90,7 +129,8 @@ async def run_weibo_analysis():
         # 使用 PipeLLM 代理配置
         env={
             'ANTHROPIC_BASE_URL': os.environ.get('ANTHROPIC_BASE_URL', 'https://api.pipellm.com'),
-            'ANTHROPIC_AUTH_TOKEN': anthropic_token
+            'ANTHROPIC_AUTH_TOKEN': anthropic_token,
+            'WEIBO_RUN_ID': run_id
         },
         # 允许的工具
         allowed_tools=[
@@ -117,6 +157,16 @@ async def run_weibo_analysis():
     message_count = 0
     error_occurred = False
 
+    # Agent 会话也计入 Anthropic 代理的共享限流额度，避免和其他运行同时撞上 429
+    limiter = get_limiter()
+    try:
+        waited = await asyncio.to_thread(limiter.acquire, 'anthropic')
+    except QuotaExceededError as e:
+        print(f"❌ 限流: {e}")
+        return False
+    if waited > 0:
+        print(f"⏳ 等待限流令牌 {waited:.1f} 秒")
+
     try:
         print("正在执行 workflow...")
         print("-" * 60)
@@ -183,6 +233,8 @@ async def run_weibo_analysis():
     print()
     print(f"处理消息数: {message_count}")
     print(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("🚦 接口额度:")
+    limiter.print_status()
 
     return not error_occurred
 
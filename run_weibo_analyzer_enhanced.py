@@ -10,12 +10,14 @@ import warnings
 # 禁用urllib3的SSL警告（必须在导入requests之前）
 warnings.filterwarnings('ignore', message='urllib3 v2 only supports OpenSSL 1.1.1+')
 
-import json
 import os
 import sys
-import re
 from datetime import datetime
 
+from hot_topic import parse_heat
+from pipeline_config import get_top_n
+from run_manifest import QUERIES_FILE, RunManifest
+
 
 def step1_fetch_hotspots():
     """步骤1：获取微博热搜数据"""
@@ -23,12 +25,13 @@ def step1_fetch_hotspots():
     print("【步骤1/4】获取微博热搜数据")
     print("=" * 60)
 
-    import requests
+    from fetch_client import get_client
 
-    WEIBO_HOT_URL = "https://apis.tianapi.com/weibohot/index?key=c96a7333c975965e491ff49466a1844b"
+    base_url = os.environ.get('TIANXING_BASE_URL', 'https://apis.tianapi.com').rstrip('/')
+    WEIBO_HOT_URL = f"{base_url}/weibohot/index?key=c96a7333c975965e491ff49466a1844b"
 
     try:
-        response = requests.get(WEIBO_HOT_URL, timeout=10)
+        response = get_client().get(WEIBO_HOT_URL)
         if response.status_code == 200:
             data = response.json()
             if data.get('code') == 200 and 'result' in data:
@@ -36,13 +39,11 @@ def step1_fetch_hotspots():
 
                 # 生成搜索查询
                 queries = []
-                for i, item in enumerate(hotspots[:15]):
+                for i, item in enumerate(hotspots[:get_top_n()]):
                     title = item.get('hotword', '')
                     if title:
-                        # 获取热度（提取数字部分）
-                        heat_str = item.get('hotwordnum', '').strip()
-                        numbers = re.findall(r'\d+', heat_str)
-                        heat = int(numbers[0]) if numbers else 0
+                        # 获取热度（支持千分位、万/亿单位和"演出 492525"这类前缀）
+                        heat = parse_heat(item.get('hotwordnum', ''))
 
                         queries.append({
                             'rank': i + 1,
@@ -51,9 +52,11 @@ def step1_fetch_hotspots():
                             'search_query': f"{title} 微博热搜 {datetime.now().strftime('%Y年%m月')}"
                         })
 
-                # 保存查询数据
-                with open('weibo_search_queries.json', 'w', encoding='utf-8') as f:
-                    json.dump(queries, f, ensure_ascii=False, indent=2)
+                # 保存查询数据到新的运行目录
+                manifest = RunManifest.create()
+                manifest.write_json('queries', QUERIES_FILE, queries)
+                manifest.set_topics(queries)
+                manifest.save()
 
                 print(f"✅ 成功获取 {len(queries)} 条热搜")
                 for q in queries[:5]:
@@ -73,7 +76,7 @@ def step2_note():
     print("【步骤2/4】搜索热点详细信息")
     print("=" * 60)
     print("ℹ️  此步骤需要Claude Code自动执行WebSearch工具")
-    print("ℹ️  Slash command会自动触发15次WebSearch")
+    print(f"ℹ️  Slash command会自动触发{get_top_n()}次WebSearch")
     print()
 
 
@@ -86,11 +89,13 @@ def step3_analyze_and_deep_dive():
     print("ℹ️  包括基础分析和深度分析（≥80分话题）")
     print()
 
-    # 检查是否已有分析结果
-    if os.path.exists('hotspot_analysis_results.json'):
-        with open('hotspot_analysis_results.json', 'r', encoding='utf-8') as f:
-            results = json.load(f)
+    # 检查最近完成的运行是否已有分析结果
+    try:
+        results = RunManifest.load(completed=True).load_json('results')
+    except (FileNotFoundError, ValueError):
+        results = None
 
+    if results is not None:
         high_score_count = sum(1 for r in results if r['total_score'] >= 80)
         print(f"✅ 已完成 {len(results)} 个话题的分析")
         print(f"✅ 发现 {high_score_count} 个高分话题需要深度分析")
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索结果缓存（按内容寻址）
+键 = sha1(后端 + topic_id + 归一化查询)，条目以 gzip 压缩的 JSON 存在磁盘上，
+搜索执行器在调用任何搜索后端之前先查缓存：
+- 同一查询在 TTL 内直接命中
+- 查询写法变了（标题微调、跨月）但 topic_id 相同，复用该话题最近一次的结果
+索引文件记录每个条目的大小和最近访问时间，超出容量时按 LRU 淘汰；
+多个进程共用一个缓存目录时，保存索引前在文件锁内重新读取磁盘上的索引并合并本进程的改动，
+不会互相覆盖条目；索引里没有记录、已超过 TTL 的孤立文件在保存时一并清理
+
+用法:
+    python3 search_cache.py stats
+    python3 search_cache.py clear
+
+环境变量:
+    WEIBO_SEARCH_CACHE_DIR     缓存目录（默认 .cache/search）
+    WEIBO_SEARCH_CACHE_TTL     有效期秒数（默认 21600，即 6 小时）
+    WEIBO_SEARCH_CACHE_MAX_MB  磁盘容量上限（默认 50MB）
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，退化为仅进程内有效
+    fcntl = None
+
+CACHE_DIR = os.environ.get('WEIBO_SEARCH_CACHE_DIR', os.path.join('.cache', 'search'))
+DEFAULT_TTL = int(os.environ.get('WEIBO_SEARCH_CACHE_TTL', '21600'))
+DEFAULT_MAX_BYTES = int(float(os.environ.get('WEIBO_SEARCH_CACHE_MAX_MB', '50')) * 1024 * 1024)
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """归一化查询：全角转半角、小写、合并空白"""
+    return _SPACES.sub(' ', unicodedata.normalize('NFKC', query or '').lower()).strip()
+
+
+@contextmanager
+def file_lock(path):
+    """跨进程互斥锁（锁文件 path + '.lock'）"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def cache_key(query, topic_id='', backend=''):
+    """内容寻址的缓存键"""
+    raw = f"{backend}\n{topic_id}\n{normalize_query(query)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class SearchCache:
+    """gzip 磁盘缓存 + TTL + LRU 容量淘汰"""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.entries = {}   # key -> {'topic_id', 'backend', 'query', 'stored_at', 'accessed_at', 'size'}
+        self.topics = {}    # "backend/topic_id" -> 最近一次写入的 key
+        self.stats = {'hits': 0, 'topic_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self.dirty = False
+        self.touched = set()    # 本进程写入或访问过、保存时要合并进索引的 key
+        self.removed = set()    # 本进程删除的 key，保存时从磁盘索引中同样删除
+        self._lock = threading.Lock()
+        self.entries, self.topics = self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}, {}
+        return data.get('entries', {}), data.get('topics', {})
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json.gz')
+
+    def _read(self, key):
+        try:
+            with gzip.open(self._path(key), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def _drop(self, key):
+        """删除条目（调用方持有锁）"""
+        meta = self.entries.pop(key, None)
+        if meta and meta.get('topic_id'):
+            topic_key = f"{meta['backend']}/{meta['topic_id']}"
+            if self.topics.get(topic_key) == key:
+                del self.topics[topic_key]
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        self.touched.discard(key)
+        self.removed.add(key)
+        self.dirty = True
+
+    def get(self, query, topic_id='', backend=''):
+        """
+        查找缓存，返回 (results, 命中方式) —— 命中方式为 'query' / 'topic'；未命中返回 (None, None)
+        """
+        now = time.time()
+        key = cache_key(query, topic_id, backend)
+        with self._lock:
+            candidates = [(key, 'query')]
+            topic_key = self.topics.get(f"{backend}/{topic_id}") if topic_id else None
+            if topic_key and topic_key != key:
+                candidates.append((topic_key, 'topic'))
+
+            for candidate, kind in candidates:
+                meta = self.entries.get(candidate)
+                if meta is None:
+                    continue
+                if now - meta['stored_at'] > self.ttl:
+                    self.stats['expired'] += 1
+                    self._drop(candidate)
+                    continue
+                entry = self._read(candidate)
+                if entry is None:
+                    self._drop(candidate)
+                    continue
+                meta['accessed_at'] = now
+                self.touched.add(candidate)
+                self.dirty = True
+                self.stats['hits' if kind == 'query' else 'topic_hits'] += 1
+                return entry['results'], kind
+
+            self.stats['misses'] += 1
+            return None, None
+
+    def put(self, query, results, topic_id='', backend=''):
+        """压缩写入一条结果，并按容量淘汰最久未访问的条目"""
+        now = time.time()
+        key = cache_key(query, topic_id, backend)
+        entry = {'query': query, 'topic_id': topic_id, 'backend': backend, 'stored_at': now, 'results': results}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            f.write(json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self.entries[key] = {'topic_id': topic_id, 'backend': backend, 'query': query,
+                                 'stored_at': now, 'accessed_at': now, 'size': size}
+            if topic_id:
+                self.topics[f"{backend}/{topic_id}"] = key
+            self.touched.add(key)
+            self.removed.discard(key)
+            self.dirty = True
+            self._evict()
+        return key
+
+    def _evict(self):
+        """超出容量时按最近访问时间淘汰（调用方持有锁）"""
+        total = sum(m['size'] for m in self.entries.values())
+        if total <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k]['accessed_at']):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries[key]['size']
+            self._drop(key)
+            self.stats['evictions'] += 1
+
+    def _merge(self, entries, topics):
+        """把本进程的改动合并到磁盘上的索引（调用方持有锁）"""
+        for key in self.removed:
+            entries.pop(key, None)
+        for key in self.touched:
+            meta = self.entries.get(key)
+            if meta is None:
+                continue
+            disk = entries.get(key)
+            if disk is not None and disk['stored_at'] > meta['stored_at']:
+                meta = dict(disk)
+            if disk is not None:
+                meta['accessed_at'] = max(meta['accessed_at'], disk['accessed_at'])
+            entries[key] = meta
+            if meta.get('topic_id'):
+                topic_key = f"{meta['backend']}/{meta['topic_id']}"
+                current = entries.get(topics.get(topic_key))
+                if current is None or current['stored_at'] <= meta['stored_at']:
+                    topics[topic_key] = key
+        self.entries = entries
+        self.topics = {t: k for t, k in topics.items() if k in entries}
+
+    def _sweep_orphans(self):
+        """删除索引里没有记录、已超过 TTL 的缓存文件（调用方持有锁）"""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json.gz') or name[:-len('.json.gz')] in self.entries:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def save(self):
+        """在文件锁内重新读取索引、合并本进程的改动并按容量淘汰，再原子写回"""
+        with self._lock:
+            if not self.dirty:
+                return
+            with file_lock(self.index_path):
+                self._merge(*self._read_index())
+                self._evict()
+                self._sweep_orphans()
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'entries': self.entries, 'topics': self.topics}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.index_path)
+            self.touched.clear()
+            self.removed.clear()
+            self.dirty = False
+
+    def summary(self):
+        """本次运行的命中统计和缓存占用"""
+        lookups = self.stats['hits'] + self.stats['topic_hits'] + self.stats['misses']
+        hits = self.stats['hits'] + self.stats['topic_hits']
+        return dict(self.stats,
+                    lookups=lookups,
+                    hit_rate=round(hits / lookups, 3) if lookups else 0.0,
+                    entries=len(self.entries),
+                    bytes=sum(m['size'] for m in self.entries.values()))
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self.entries, self.topics = {}, {}
+            self.touched.clear()
+            self.removed.clear()
+            self.dirty = False
+
+
+_default_cache = None
+
+
+def get_search_cache():
+    """获取进程内共享的搜索缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SearchCache()
+    return _default_cache
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('stats', 'clear'):
+        print(__doc__)
+        return 1
+
+    cache = get_search_cache()
+    if args[0] == 'clear':
+        cache.clear()
+        print(f"🗑️  已清空搜索缓存: {cache.cache_dir}")
+        return 0
+
+    summary = cache.summary()
+    print(f"📦 搜索缓存: {cache.cache_dir}")
+    print(f"   条目数量: {summary['entries']}")
+    print(f"   磁盘占用: {summary['bytes'] / 1024:.1f}KB / {cache.max_bytes / 1024 / 1024:.0f}MB")
+    print(f"   有效期: {cache.ttl}秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
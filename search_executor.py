@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索执行器
+对 weibo_search_queries.json 中需要处理的话题并发执行搜索，直接写出 search_results_XX.json，
+不再需要 agent 逐条调用 WebSearch（每个话题省一轮 LLM 调用）。
+调用后端之前先查搜索结果缓存（search_cache.py），命中的话题不再发起搜索；
+新搜到的结果文档增量写入本地 BM25 索引（bm25_index.py）。
+流水线执行器可以在热搜列表还在流式解析时就用 SearchPrefetch 开始搜索已解析出的话题，搜索阶段直接使用预取结果。
+搜索后端可插拔：
+- tavily: Tavily Search API（需要 TAVILY_API_KEY）
+- local:  只查本地 BM25 索引（历史搜索结果语料），不发网络请求
+- stub:   本地替身后端，按查询生成确定的结果，用于离线运行和测试
+
+环境变量:
+    WEIBO_SEARCH_BACKEND       后端名称（默认有 TAVILY_API_KEY 时用 tavily）
+    WEIBO_SEARCH_CONCURRENCY   并发搜索数（默认 5）
+    WEIBO_SEARCH_MAX_RESULTS   每个查询保留的结果条数（默认 5）
+    WEIBO_LOCAL_MAX_AGE_DAYS   local-first 模式下本地语料的最长使用天数（默认 7）
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from bm25_index import BM25Index, documents_from_result
+from fetch_client import get_client
+from run_manifest import write_json_atomic
+from search_cache import get_search_cache
+from search_planner import CLUSTER_ENABLED, plan_search_groups
+
+SEARCH_CONCURRENCY = int(os.environ.get('WEIBO_SEARCH_CONCURRENCY', '5'))
+SEARCH_MAX_RESULTS = int(os.environ.get('WEIBO_SEARCH_MAX_RESULTS', '5'))
+LOCAL_MAX_AGE_DAYS = float(os.environ.get('WEIBO_LOCAL_MAX_AGE_DAYS', '7'))
+LOCAL_MIN_RESULTS = 3   # local-first：同一话题至少有这么多篇本地文档才跳过网络搜索
+
+
+class SearchBackend:
+    """搜索后端接口：search() 返回 [{'title', 'url', 'snippet'}, ...]"""
+
+    name = ''
+
+    def search(self, query, max_results=SEARCH_MAX_RESULTS):
+        raise NotImplementedError
+
+
+class TavilySearchBackend(SearchBackend):
+    """Tavily Search API（经共享抓取客户端：连接池、重试、限流）"""
+
+    name = 'tavily'
+    url = 'https://api.tavily.com/search'
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.environ.get('TAVILY_API_KEY')
+        if not self.api_key:
+            raise RuntimeError("未找到环境变量 TAVILY_API_KEY")
+
+    def search(self, query, max_results=SEARCH_MAX_RESULTS):
+        data = get_client().post_json(self.url, {
+            'api_key': self.api_key,
+            'query': query,
+            'max_results': max_results,
+            'search_depth': 'basic'
+        })
+        return [
+            {'title': r.get('title', ''), 'url': r.get('url', ''), 'snippet': r.get('content', '')}
+            for r in data.get('results', [])[:max_results]
+        ]
+
+
+class StubSearchBackend(SearchBackend):
+    """本地替身后端：按查询内容生成确定的结果，可配置延迟"""
+
+    name = 'stub'
+
+    def __init__(self, latency_ms=None):
+        if latency_ms is None:
+            latency_ms = float(os.environ.get('WEIBO_SEARCH_STUB_LATENCY_MS', '0'))
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def search(self, query, max_results=SEARCH_MAX_RESULTS):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:10]
+        return [
+            {
+                'title': f"{query}（报道 {i + 1}）",
+                'url': f"https://search.stub.invalid/{digest}/{i + 1}",
+                'snippet': f"关于「{query}」的第 {i + 1} 条离线搜索摘要。"
+            }
+            for i in range(max_results)
+        ]
+
+
+def _hits_to_results(hits):
+    return [{'title': h['title'], 'url': h['url'], 'snippet': h['text']} for h in hits]
+
+
+class LocalSearchBackend(SearchBackend):
+    """本地 BM25 索引（每次调用单独打开连接，可在线程池中使用）"""
+
+    name = 'local'
+
+    def search(self, query, max_results=SEARCH_MAX_RESULTS):
+        index = BM25Index()
+        try:
+            return _hits_to_results(index.search(query, k=max_results))
+        finally:
+            index.close()
+
+
+BACKENDS = {
+    'tavily': TavilySearchBackend,
+    'local': LocalSearchBackend,
+    'stub': StubSearchBackend,
+}
+
+
+def get_backend(name=None):
+    """按名称创建搜索后端；未指定时读取 WEIBO_SEARCH_BACKEND，再按是否配置了 TAVILY_API_KEY 选择"""
+    name = name or os.environ.get('WEIBO_SEARCH_BACKEND')
+    if not name:
+        if not os.environ.get('TAVILY_API_KEY'):
+            raise RuntimeError("未配置搜索后端：请设置 TAVILY_API_KEY，或用 WEIBO_SEARCH_BACKEND=stub 离线运行")
+        name = 'tavily'
+    if name not in BACKENDS:
+        raise ValueError(f"未知的搜索后端: {name}（可选: {', '.join(BACKENDS)}）")
+    return BACKENDS[name]()
+
+
+def result_filename(rank, output_dir='.'):
+    return os.path.join(output_dir, f'search_results_{rank:02d}.json')
+
+
+def build_result(query, results, backend_name, cached=None):
+    """搜索结果文件内容：保留 title / content 两个旧字段，另附逐条结果"""
+    content = '\n'.join(f"{r['title']}：{r['snippet']}" for r in results if r.get('snippet'))
+    return {
+        'title': query['title'],
+        'rank': query['rank'],
+        'topic_id': query.get('topic_id', ''),
+        'search_query': query['search_query'],
+        'content': content,
+        'results': results,
+        'backend': backend_name,
+        'cached': cached,
+        'searched_at': datetime.now().isoformat(timespec='seconds')
+    }
+
+
+def local_topic_results(index, query, max_results=SEARCH_MAX_RESULTS, max_age_days=LOCAL_MAX_AGE_DAYS):
+    """本地语料里同一话题的近期文档；数量不足 LOCAL_MIN_RESULTS 时返回 None"""
+    topic_id = query.get('topic_id')
+    if not topic_id:
+        return None
+    since = time.time() - max_age_days * 86400
+    hits = [h for h in index.search(query['search_query'], k=max_results, topic_id=topic_id)
+            if h['added_ts'] >= since]
+    return _hits_to_results(hits) if len(hits) >= LOCAL_MIN_RESULTS else None
+
+
+def _lookup_cached(query, backend, cache, local_index):
+    """先查搜索缓存，再查本地语料（local-first），返回 (results, 命中方式)"""
+    topic_id = query.get('topic_id', '')
+    results, cached = cache.get(query['search_query'], topic_id, backend.name) if cache else (None, None)
+    if results is None and local_index is not None:
+        results = local_topic_results(local_index, query)
+        cached = 'local' if results is not None else None
+    return results, cached
+
+
+async def _search_group(group, backend, semaphore, cache, executor=None):
+    """一组话题只发一次查询，结果写入每个成员各自的缓存键；executor 为 None 时用事件循环的默认线程池"""
+    start = time.perf_counter()
+    async with semaphore:
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(executor, backend.search,
+                                                                       group['search_query'])
+        except Exception as e:
+            return group, None, time.perf_counter() - start, e
+    if cache:
+        for member in group['members']:
+            cache.put(member['search_query'], results, member.get('topic_id', ''), backend.name)
+    return group, results, time.perf_counter() - start, None
+
+
+class SearchPrefetch:
+    """
+    搜索预取：热搜列表还在流式解析、快照对比还没做完时，就开始搜索已经解析出的话题
+    start() 在事件循环线程里调用；搜索阶段按排名顺序 take() 等待对应的预取并直接使用结果，
+    预取失败或没有预取的话题在搜索阶段照常查缓存、分组搜索。预取的话题各自单独搜索，不参与相关话题合并
+    """
+
+    def __init__(self, backend=None, concurrency=SEARCH_CONCURRENCY, use_cache=True):
+        self.backend = backend or get_backend()
+        self.cache = get_search_cache() if use_cache else None
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tasks = {}     # (topic_id, search_query) -> Task
+        self.calls = 0
+
+    @staticmethod
+    def _key(query):
+        return query.get('topic_id', ''), query['search_query']
+
+    def start(self, query):
+        """开始预取一个话题（同一查询只预取一次）"""
+        key = self._key(query)
+        if key not in self.tasks:
+            self.tasks[key] = asyncio.ensure_future(self._prefetch(query))
+
+    async def _prefetch(self, query):
+        start = time.perf_counter()
+        results, cached = _lookup_cached(query, self.backend, self.cache, None)
+        if results is not None:
+            return results, cached, time.perf_counter() - start
+        self.calls += 1
+        group = {'search_query': query['search_query'], 'members': [query]}
+        _, results, duration, error = await _search_group(group, self.backend, self.semaphore, self.cache)
+        return None if error is not None else (results, 'prefetch', duration)
+
+    async def take(self, query):
+        """等待该话题的预取完成，返回 (results, 命中方式, 耗时)；没有预取或预取失败时返回 None"""
+        task = self.tasks.pop(self._key(query), None)
+        return await task if task is not None else None
+
+    def cancel(self):
+        """取消没有被搜索阶段取走的预取"""
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+
+async def run_searches(queries, backend, concurrency=SEARCH_CONCURRENCY, output_dir='.', cache=None,
+                       local_index=None, cluster=CLUSTER_ENABLED, on_outcome=None, prefetch=None, executor=None):
+    """
+    并发执行搜索（最多 concurrency 个同时进行），单个失败不影响其他话题
+    缓存未命中的话题先按相关性分组，每组只搜索一次，结果分发给组内每个话题
+    on_outcome: 每个话题一有结果就调用的协程函数 on_outcome(outcome)，下游阶段可以不等全部搜索结束就开始
+    prefetch: SearchPrefetch，已预取的话题按排名顺序等待预取结果，不再查缓存或重新搜索
+    output_dir 为 None 时不写文件，结果只通过 outcome 里的 data 传给调用方（path 为 None）
+    executor: 执行阻塞搜索调用的线程池，None 时用事件循环的默认线程池
+    返回 ([(query, path, 耗时, 错误, 命中方式, data), ...], 后端调用次数)
+    命中方式为 query / topic / local / cluster（合并搜索）/ prefetch（预取）/ None（单独搜索）
+    """
+    outcomes = []
+
+    async def emit(outcome):
+        outcomes.append(outcome)
+        if on_outcome:
+            await on_outcome(outcome)
+
+    def write(query, data):
+        if output_dir is None:
+            return None
+        path = result_filename(query['rank'], output_dir)
+        write_json_atomic(path, data)
+        return path
+
+    pending = []
+    for query in queries:
+        start = time.perf_counter()
+        prefetched = await prefetch.take(query) if prefetch is not None else None
+        if prefetched is not None:
+            results, cached, duration = prefetched
+        else:
+            results, cached = _lookup_cached(query, backend, cache, local_index)
+            duration = time.perf_counter() - start
+        if results is None:
+            pending.append(query)
+            continue
+        data = build_result(query, results, backend.name, cached)
+        await emit((query, write(query, data), duration, None, cached, data))
+
+    async def search_and_write(group, semaphore):
+        group, results, duration, error = await _search_group(group, backend, semaphore, cache, executor)
+        members = group['members']
+        shared = len(members) > 1
+        for member in members:
+            if error is not None:
+                await emit((member, None, duration, error, None, None))
+                continue
+            data = build_result(member, results, backend.name, 'cluster' if shared else None)
+            if shared:
+                # 记录实际发出的合并查询和同组话题，便于排查
+                data['cluster'] = {'search_query': group['search_query'], 'ranks': [m['rank'] for m in members]}
+            await emit((member, write(member, data), duration, None, 'cluster' if shared else None, data))
+
+    groups = plan_search_groups(pending, enabled=cluster)
+    semaphore = asyncio.Semaphore(concurrency)
+    await asyncio.gather(*(search_and_write(g, semaphore) for g in groups))
+
+    outcomes.sort(key=lambda outcome: outcome[0]['rank'])
+    return outcomes, len(groups)
+
+
+async def search_stage(queries, backend=None, concurrency=SEARCH_CONCURRENCY, output_dir='.', use_cache=True,
+                       local_first=False, cluster=CLUSTER_ENABLED, on_outcome=None, prefetch=None, executor=None):
+    """execute_searches 的协程版本，供流水线执行器在同一事件循环里调用（on_outcome / prefetch / executor 见 run_searches）"""
+    backend = backend or get_backend()
+    cache = get_search_cache() if use_cache else None
+    index = BM25Index()
+    print(f"🔍 开始搜索: {len(queries)} 个话题（后端: {backend.name}，并发: {concurrency}）")
+
+    start = time.perf_counter()
+    outcomes, backend_calls = await run_searches(queries, backend, concurrency, output_dir, cache,
+                                                 index if local_first else None, cluster, on_outcome, prefetch,
+                                                 executor)
+    elapsed = time.perf_counter() - start
+    if prefetch is not None:
+        backend_calls += prefetch.calls
+
+    written, results, failed, fresh = {}, {}, [], []
+    for query, path, duration, error, cached, data in outcomes:
+        if error is not None:
+            print(f"  ❌ #{query['rank']:2d} {query['title']}: {error}")
+            failed.append((query['rank'], str(error)))
+        else:
+            source = {'query': '（缓存）', 'topic': '（同话题缓存）', 'local': '（本地语料）',
+                      'cluster': '（合并搜索）', 'prefetch': '（预取）'}.get(cached, '')
+            print(f"  ✅ #{query['rank']:2d} {query['title']} → {path or '内存'}{source}（{duration:.2f}秒）")
+            if path:
+                written[query['rank']] = path
+            results[query['rank']] = data
+            if cached in (None, 'cluster', 'prefetch'):
+                fresh.append(data)
+
+    print(f"✅ 搜索完成: 成功 {len(results)}，失败 {len(failed)}，搜索后端调用 {backend_calls} 次，"
+          f"总耗时 {elapsed:.2f}秒")
+
+    # 新搜到的结果写入本地索引（本地后端的结果本来就来自索引，不重复写入）
+    if fresh and backend.name != 'local':
+        indexed = index.add_documents([doc for data in fresh for doc in documents_from_result(data)])
+    else:
+        indexed = 0
+    index.close()
+    if indexed:
+        print(f"📚 已写入本地索引: {indexed} 个新文档")
+
+    summary = {'written': written, 'results': results, 'failed': failed, 'elapsed': elapsed, 'backend_calls': backend_calls,
+               'cache': None, 'indexed': indexed}
+    if cache:
+        cache.save()
+        stats = cache.summary()
+        print(f"📦 搜索缓存: 命中 {stats['hits']}，同话题复用 {stats['topic_hits']}，未命中 {stats['misses']}，"
+              f"过期 {stats['expired']}，淘汰 {stats['evictions']}（命中率 {stats['hit_rate']:.0%}）")
+        summary['cache'] = stats
+    return summary
+
+
+def execute_searches(queries, backend=None, concurrency=SEARCH_CONCURRENCY, output_dir='.', use_cache=True,
+                     local_first=False, cluster=CLUSTER_ENABLED):
+    """
+    执行搜索并写出 search_results_XX.json
+    local_first: 本地索引里同一话题已有足够的近期文档时直接使用，不发网络搜索
+    cluster: 相关话题合并成一次搜索（search_planner.py）
+    output_dir 为 None 时只在内存里返回结果，不写文件
+    返回 {'written': {排名: 文件}, 'results': {排名: 结果字典}, 'failed': [(rank, 错误)], 'elapsed': 秒, 'backend_calls': 后端调用次数,
+          'cache': 缓存统计, 'indexed': 新增文档数}
+    """
+    return asyncio.run(search_stage(queries, backend, concurrency, output_dir, use_cache, local_first, cluster))
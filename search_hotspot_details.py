@@ -2,19 +2,31 @@
 # -*- coding: utf-8 -*-
 """
 搜索微博热点详细信息
+
+用法:
+    python3 search_hotspot_details.py                        # 在运行目录生成搜索计划（search_plan.md / MANUAL_SEARCH.md）
+    python3 search_hotspot_details.py --execute [--backend stub|local|tavily] [--concurrency 5]
+                                      [--no-cache] [--local-first] [--no-cluster]
+                                                             # 直接并发搜索（先查搜索缓存），写出 runs/<run_id>/search_results_XX.json
+                                                             # --local-first: 本地语料已有同话题近期文档时不再联网搜索
+                                                             # 相关话题默认合并为一次搜索，--no-cluster 关闭
+    --run RUN_ID / --resume RUN_ID
+                   指定运行（默认 WEIBO_RUN_ID 或最近一次运行），搜索结果写入该运行目录并登记到清单；
+                   已有有效搜索结果的话题自动跳过，中断后重新执行只补搜缺失或无效的部分
 """
 
-import json
 import sys
 from datetime import datetime
 import subprocess
 
-def load_queries(filename='weibo_search_queries.json'):
-    """加载搜索查询"""
+from run_manifest import RunManifest, run_id_from_args, write_text_atomic
+from search_executor import SEARCH_CONCURRENCY, execute_searches, get_backend
+
+def load_queries(manifest):
+    """加载本次运行的搜索查询"""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            queries = json.load(f)
-        print(f"✅ 成功加载 {len(queries)} 条搜索查询")
+        queries = manifest.load_json('queries')
+        print(f"✅ 成功加载 {len(queries)} 条搜索查询（运行 {manifest.run_id}）")
         return queries
     except Exception as e:
         print(f"❌ 加载失败: {e}")
@@ -43,7 +55,7 @@ def generate_search_commands(queries):
 
     return commands
 
-def save_search_plan(commands, filename='search_plan.md'):
+def save_search_plan(commands, filename):
     """保存搜索计划"""
     content = f"""# 微博热点搜索计划
 
@@ -73,8 +85,7 @@ def save_search_plan(commands, filename='search_plan.md'):
 """
 
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_text_atomic(filename, content)
         print(f"✅ 搜索计划已保存到: {filename}")
         return True
     except Exception as e:
@@ -98,7 +109,7 @@ def display_plan_summary(commands):
     print(f"总计: {len(commands)} 个搜索任务")
     print(f"{'='*60}\n")
 
-def create_manual_search_instructions(commands, filename='MANUAL_SEARCH.md'):
+def create_manual_search_instructions(commands, manifest, filename):
     """创建手动搜索说明"""
     content = f"""# 手动搜索说明
 
@@ -112,7 +123,7 @@ def create_manual_search_instructions(commands, filename='MANUAL_SEARCH.md'):
 
 1. 打开 Claude Code
 2. 对于每个热搜话题，执行 WebSearch
-3. 将搜索结果保存到文件 `search_results_{{rank}}.json`
+3. 将搜索结果保存到文件 `{manifest.run_dir}/search_results_{{rank}}.json`
 4. 所有搜索完成后，运行 AI 分析脚本
 
 ## 热搜列表
@@ -124,7 +135,7 @@ def create_manual_search_instructions(commands, filename='MANUAL_SEARCH.md'):
 ### #{cmd['rank']} - {cmd['title']}
 
 - **搜索关键词**: {cmd['search_query']}
-- **输出文件**: `search_results_{cmd['rank']:02d}.json`
+- **输出文件**: `{manifest.stage_path(cmd['rank'], 'search')}`
 - **执行命令**:
   ```
   /WebSearch {cmd['search_query']}
@@ -145,8 +156,7 @@ python generate_html_report.py
 """
 
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_text_atomic(filename, content)
         print(f"✅ 手动搜索说明已保存到: {filename}")
         return True
     except Exception as e:
@@ -161,13 +171,53 @@ def main():
     print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print()
 
+    args = sys.argv[1:]
+
     # 加载查询
-    queries = load_queries()
+    try:
+        manifest = RunManifest.load(run_id_from_args(args))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ 无法打开运行清单: {e}")
+        manifest = None
+    queries = load_queries(manifest) if manifest else []
     if not queries:
         print("\n❌ 未能加载搜索查询")
         print("请先运行: python fetch_weibo_hotspot.py")
         return 1
 
+    # 已有有效搜索结果的话题（快照对比后复用的历史结果，或中断前已完成的搜索）无需再搜索
+    pending = set(manifest.pending('search', [q['rank'] for q in queries]))
+    skipped = len(queries) - len(pending)
+    if skipped:
+        queries = [q for q in queries if q['rank'] in pending]
+        print(f"♻️  {skipped} 个话题已有有效搜索结果（复用或已完成），跳过搜索")
+    manifest.save()
+    if not queries and '--execute' in args:
+        print("\n✅ 所有话题的搜索均已完成")
+        print("\n💡 下一步: python3 analyze_hotspot_with_ai.py")
+        return 0
+
+    if '--execute' in args:
+        # 直接执行搜索，不再生成需要逐条手动执行的搜索计划
+        try:
+            backend = get_backend(args[args.index('--backend') + 1] if '--backend' in args else None)
+        except (RuntimeError, ValueError) as e:
+            print(f"❌ {e}")
+            return 1
+        concurrency = int(args[args.index('--concurrency') + 1]) if '--concurrency' in args else SEARCH_CONCURRENCY
+        summary = execute_searches(queries, backend, concurrency, output_dir=manifest.run_dir,
+                                   use_cache='--no-cache' not in args, local_first='--local-first' in args,
+                                   cluster='--no-cluster' not in args)
+        for rank, path in summary['written'].items():
+            manifest.record(rank, 'search', path)
+        manifest.save()
+        if summary['failed']:
+            ranks = ', '.join(f"#{rank}" for rank, _ in summary['failed'])
+            print(f"\n⚠️  以下话题搜索失败，可重新运行或手动搜索: {ranks}")
+            return 1
+        print("\n💡 下一步: python3 analyze_hotspot_with_ai.py")
+        return 0
+
     # 生成搜索命令
     commands = generate_search_commands(queries)
 
@@ -175,15 +225,15 @@ def main():
     display_plan_summary(commands)
 
     # 保存搜索计划
-    save_search_plan(commands)
+    save_search_plan(commands, manifest.path('search_plan.md'))
 
     # 创建手动搜索说明
-    create_manual_search_instructions(commands)
+    create_manual_search_instructions(commands, manifest, manifest.path('MANUAL_SEARCH.md'))
 
     print("\n✅ 搜索计划生成完成！")
     print("📑 请查看以下文件:")
-    print("   - search_plan.md (搜索计划)")
-    print("   - MANUAL_SEARCH.md (手动操作说明)")
+    print(f"   - {manifest.path('search_plan.md')} (搜索计划)")
+    print(f"   - {manifest.path('MANUAL_SEARCH.md')} (手动操作说明)")
     print("\n💡 下一步:")
     print("   方法1: 使用 Claude Code 依次执行 /WebSearch 命令")
     print("   方法2: 手动搜索并保存结果，然后运行分析脚本")
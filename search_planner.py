@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索计划：相关话题合并搜索
+同一事件常常同时有几条热搜（如"蔡依林演唱会被举报"和"蔡依林回应"），分别搜索会拿到几乎相同的结果。
+这里按字符二元组相似度把相关标题聚成一组，每组只发一次更宽的查询，
+结果再分发给组内每个话题各自的 search_results_XX.json。
+
+环境变量:
+    WEIBO_SEARCH_CLUSTER          设为 0 关闭合并搜索
+    WEIBO_SEARCH_CLUSTER_OVERLAP  组内标题的二元组重合度阈值（默认 0.4）
+"""
+
+import os
+
+from topic_identity import normalize_title, shingles
+
+CLUSTER_ENABLED = os.environ.get('WEIBO_SEARCH_CLUSTER', '1') != '0'
+CLUSTER_OVERLAP = float(os.environ.get('WEIBO_SEARCH_CLUSTER_OVERLAP', '0.4'))
+MIN_SHARED_CHARS = 3     # 至少共享一个 3 字以上的片段（人名、机构名），避免只因"热搜""回应"这类词相连
+MAX_CLUSTER_SIZE = 4     # 一组太大时查询会过宽，结果稀释
+
+
+def _longest_common_substring(a, b):
+    """最长公共子串（标题很短，直接动态规划）"""
+    best, best_end = 0, 0
+    previous = [0] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        current = [0] * (len(b) + 1)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] == b[j - 1]:
+                current[j] = previous[j - 1] + 1
+                if current[j] > best:
+                    best, best_end = current[j], i
+        previous = current
+    return a[best_end - best:best_end]
+
+
+def is_related(title_a, title_b, overlap=CLUSTER_OVERLAP):
+    """两个标题是否属于同一事件：共享足够长的片段，且二元组重合度（相对较短标题）达到阈值"""
+    a, b = normalize_title(title_a), normalize_title(title_b)
+    if len(_longest_common_substring(a, b)) < MIN_SHARED_CHARS:
+        return False
+    grams_a, grams_b = shingles(a), shingles(b)
+    return len(grams_a & grams_b) / min(len(grams_a), len(grams_b)) >= overlap
+
+
+def cluster_query(members):
+    """组查询：组内标题依次拼接（去掉重复片段后的更宽查询），沿用第一个话题的查询后缀（如"微博热搜 2026年01月"）"""
+    first = members[0]
+    suffix = first['search_query'][len(first['title']):].strip() \
+        if first['search_query'].startswith(first['title']) else ''
+    first_normalized = normalize_title(first['title'])
+    parts = [first['title']]
+    for member in members[1:]:
+        # 第二个及之后的标题去掉与第一个标题的共享片段，只补充新的关键词；
+        # 共享片段在归一化标题上求出（大小写、全半角、标点不同也能对上），也就从归一化标题上去掉
+        normalized = normalize_title(member['title'])
+        core = _longest_common_substring(first_normalized, normalized)
+        extra = normalized.replace(core, ' ').strip() if core else member['title']
+        parts.append(' '.join(extra.split()) or member['title'])
+    return ' '.join(parts + ([suffix] if suffix else []))
+
+
+def plan_search_groups(queries, enabled=CLUSTER_ENABLED):
+    """
+    把查询分组：[{'search_query': 实际发出的查询, 'members': [query, ...]}, ...]
+    不相关的话题各自一组；相关话题按排名先后贪心合并（最多 MAX_CLUSTER_SIZE 个）
+    """
+    groups = []
+    for query in sorted(queries, key=lambda q: q['rank']):
+        target = None
+        if enabled:
+            for group in groups:
+                if len(group) < MAX_CLUSTER_SIZE and any(is_related(query['title'], m['title']) for m in group):
+                    target = group
+                    break
+        if target is None:
+            groups.append([query])
+        else:
+            target.append(query)
+
+    return [
+        {'search_query': members[0]['search_query'] if len(members) == 1 else cluster_query(members),
+         'members': members}
+        for members in groups
+    ]
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热搜快照对比
+与上一次存档的快照比较，把每个话题标记为 new / rising / stable / falling，
+只有配置的类别会重新搜索和分析，其余话题复用历史的搜索结果和分析结果
+"""
+
+import hashlib
+import json
+import os
+
+from run_manifest import copy_atomic, write_json_atomic
+from snapshot_store import load_snapshot, snapshot_times
+
+# 需要重新处理的类别（逗号分隔），其余类别复用历史产物
+REPROCESS_CLASSES = set(
+    c.strip() for c in os.environ.get('WEIBO_REPROCESS_CLASSES', 'new,rising').split(',') if c.strip()
+)
+# 排名上升/下降多少位算变化
+RANK_DELTA = int(os.environ.get('WEIBO_DIFF_RANK_DELTA', '3'))
+# 热度变化比例超过多少算变化（0.3 = 30%）
+HEAT_RATIO = float(os.environ.get('WEIBO_DIFF_HEAT_RATIO', '0.3'))
+
+ARTIFACT_DIR = os.environ.get('WEIBO_ARTIFACT_DIR', os.path.join('data', 'topic_artifacts'))
+
+
+def classify_topic(current, previous, rank_delta=RANK_DELTA, heat_ratio=HEAT_RATIO):
+    """判断单个话题相对上次快照的变化类别"""
+    if previous is None:
+        return 'new'
+
+    rank_change = previous['rank'] - current['rank']  # 正数表示排名上升
+    prev_heat = previous.get('heat') or 0
+    heat_change = (current.get('heat', 0) - prev_heat) / prev_heat if prev_heat else 0
+
+    if rank_change >= rank_delta or heat_change >= heat_ratio:
+        return 'rising'
+    if rank_change <= -rank_delta or heat_change <= -heat_ratio:
+        return 'falling'
+    return 'stable'
+
+
+def previous_topics(snapshot_ts, source='weibo'):
+    """
+    同一来源在 snapshot_ts 之前的最近一次快照，按 topic_id 和标题索引
+    优先按 topic_id 匹配（标题轻微变化也算同一话题），旧数据没有 topic_id 时按标题
+    """
+    previous_ts = snapshot_times(limit=1, before_ts=snapshot_ts, source=source) if snapshot_ts else []
+    previous_rows = load_snapshot(previous_ts[0], source=source) if previous_ts else []
+    previous_by_key = {}
+    for row in previous_rows:
+        previous_by_key[row['title']] = row
+        if row.get('topic_id'):
+            previous_by_key[row['topic_id']] = row
+    return previous_by_key
+
+
+def diff_topic(q, previous_by_key, reprocess_classes=REPROCESS_CLASSES):
+    """为单条查询写入 diff_status / prev_rank / reprocess 字段（话题列表还没解析完时也可以逐条判断）"""
+    previous = previous_by_key.get(q.get('topic_id')) or previous_by_key.get(q['title'])
+    q['diff_status'] = classify_topic(q, previous)
+    q['prev_rank'] = previous['rank'] if previous else None
+    q['reprocess'] = q['diff_status'] in reprocess_classes
+    return q
+
+
+def diff_against_previous(queries, snapshot_ts, reprocess_classes=REPROCESS_CLASSES, source='weibo'):
+    """
+    与同一来源在 snapshot_ts 之前的最近一次快照对比
+    为每条查询写入 diff_status / prev_rank / reprocess 字段
+    """
+    previous_by_key = previous_topics(snapshot_ts, source)
+    for q in queries:
+        diff_topic(q, previous_by_key, reprocess_classes)
+    return queries
+
+
+def _artifact_dir(query):
+    """按 topic_id 存档，没有 topic_id 时退回标题哈希"""
+    key = query.get('topic_id') or hashlib.sha1(query['title'].encode('utf-8')).hexdigest()[:16]
+    return os.path.join(ARTIFACT_DIR, key)
+
+
+def _is_prefiltered(analysis):
+    """预筛选模型给出的占位结果（模型没有真正评分），和分析缓存一样不存档、不复用"""
+    return isinstance(analysis, dict) and bool(analysis.get('prefiltered'))
+
+
+def archive_topic_artifacts(queries, manifest):
+    """把本次运行的搜索和分析结果按话题存档，供后续运行复用；预筛选的占位结果不存档"""
+    archived = 0
+    for q in queries:
+        search_file = manifest.artifact(q['rank'], 'search')
+        analysis_file = manifest.artifact(q['rank'], 'analysis')
+        if not (search_file and analysis_file):
+            continue
+        if _is_prefiltered(manifest.load_artifact(q['rank'], 'analysis')):
+            continue
+        # 存档目录由多个运行共享，同样原子替换
+        target = _artifact_dir(q)
+        copy_atomic(search_file, os.path.join(target, 'search.json'))
+        copy_atomic(analysis_file, os.path.join(target, 'analysis.json'))
+        archived += 1
+    return archived
+
+
+def has_topic_artifacts(query):
+    """话题存档里是否同时有可复用的搜索结果和分析结果"""
+    return load_topic_artifacts(query) is not None
+
+
+def load_topic_artifacts(query):
+    """
+    读取话题存档的 (搜索结果, 分析结果)，分析结果的排名改写为当前排名
+    缺少任一产物，或分析结果是预筛选的占位结果（旧版本存档的）时返回 None，话题重新处理
+    """
+    source = _artifact_dir(query)
+    try:
+        with open(os.path.join(source, 'search.json'), 'r', encoding='utf-8') as f:
+            search = json.load(f)
+        with open(os.path.join(source, 'analysis.json'), 'r', encoding='utf-8') as f:
+            analysis = json.load(f)
+    except FileNotFoundError:
+        return None
+    if _is_prefiltered(analysis):
+        return None
+
+    # 历史分析结果里的排名是旧的，改写为当前排名
+    if isinstance(analysis, dict):
+        analysis['rank'] = query['rank']
+    return search, analysis
+
+
+def restore_topic_artifacts(query, manifest):
+    """把历史产物写入本次运行目录中当前排名的位置并登记，缺少任一产物时返回 False"""
+    artifacts = load_topic_artifacts(query)
+    if artifacts is None:
+        return False
+
+    rank = query['rank']
+    search_file = manifest.stage_path(rank, 'search')
+    analysis_file = manifest.stage_path(rank, 'analysis')
+    write_json_atomic(search_file, artifacts[0])
+    write_json_atomic(analysis_file, artifacts[1])
+
+    manifest.record(rank, 'search', search_file)
+    manifest.record(rank, 'analysis', analysis_file)
+    return True
+
+
+def apply_reuse(queries, manifest):
+    """
+    对不需要重新处理的话题复用历史产物
+    没有可复用产物的话题仍然标记为需要处理
+    """
+    reused = 0
+    for q in queries:
+        if q.get('reprocess', True):
+            continue
+        if restore_topic_artifacts(q, manifest):
+            reused += 1
+        else:
+            q['reprocess'] = True
+    return reused
+
+
+def print_diff_summary(queries):
+    """打印对比摘要"""
+    counts = {}
+    for q in queries:
+        counts[q['diff_status']] = counts.get(q['diff_status'], 0) + 1
+    labels = {'new': '🆕 新上榜', 'rising': '📈 上升', 'stable': '➖ 持平', 'falling': '📉 下降'}
+    summary = ' | '.join(f"{labels[k]} {counts[k]}" for k in labels if k in counts)
+    todo = sum(1 for q in queries if q.get('reprocess', True))
+    print(f"\n🔍 快照对比: {summary}")
+    print(f"   需要处理 {todo} 个，复用历史结果 {len(queries) - todo} 个")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热搜历史快照库（SQLite，只追加）
+每次获取的完整热搜榜写入一行一条：(source, snapshot_ts, rank, title, heat, tag, topic_id)
+按标题、话题ID和时间建索引，可毫秒级查询话题的排名/热度走势
+
+用法:
+    python3 snapshot_store.py stats
+    python3 snapshot_store.py trajectory "话题标题" [--days 90] [--source weibo]
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from topic_identity import get_index
+
+DB_PATH = os.environ.get('WEIBO_HISTORY_DB', os.path.join('data', 'hotspot_history.db'))
+
+TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS hot_items (
+    source      TEXT    NOT NULL DEFAULT 'weibo',
+    snapshot_ts INTEGER NOT NULL,
+    rank        INTEGER NOT NULL,
+    title       TEXT    NOT NULL,
+    heat        INTEGER NOT NULL DEFAULT 0,
+    tag         TEXT    NOT NULL DEFAULT '',
+    topic_id    TEXT    NOT NULL DEFAULT '',
+    PRIMARY KEY (source, snapshot_ts, rank)
+) WITHOUT ROWID;
+"""
+
+INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_hot_items_title_ts ON hot_items (title, snapshot_ts);
+CREATE INDEX IF NOT EXISTS idx_hot_items_ts ON hot_items (snapshot_ts);
+CREATE INDEX IF NOT EXISTS idx_hot_items_topic_ts ON hot_items (topic_id, snapshot_ts);
+"""
+
+
+def _migrate(conn):
+    """
+    旧库升级：补 topic_id 列；主键加入 source（需要重建表）
+    executescript 会自行提交，这里逐条 execute 并放在同一个显式事务里，中途失败时整体回滚；
+    BEGIN IMMEDIATE 先拿写锁，事务内重新检查列，多个进程同时打开旧库时只有一个执行升级
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(hot_items)")}
+    if {'topic_id', 'source'} <= columns:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(hot_items)")}
+        if 'topic_id' not in columns:
+            conn.execute("ALTER TABLE hot_items ADD COLUMN topic_id TEXT NOT NULL DEFAULT ''")
+        if 'source' not in columns:
+            conn.execute("ALTER TABLE hot_items RENAME TO hot_items_old")
+            for index in ('idx_hot_items_title_ts', 'idx_hot_items_ts', 'idx_hot_items_topic_ts'):
+                conn.execute(f"DROP INDEX IF EXISTS {index}")
+            conn.execute(TABLE_SQL)
+            conn.execute(
+                "INSERT INTO hot_items (source, snapshot_ts, rank, title, heat, tag, topic_id) "
+                "SELECT 'weibo', snapshot_ts, rank, title, heat, tag, topic_id FROM hot_items_old")
+            conn.execute("DROP TABLE hot_items_old")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def connect(db_path=DB_PATH):
+    """打开快照库（不存在时自动建表）"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.executescript(TABLE_SQL)
+    _migrate(conn)
+    conn.executescript(INDEX_SQL)
+    return conn
+
+
+def append_snapshot(rows, snapshot_ts=None, source='weibo', db_path=DB_PATH):
+    """
+    追加一次热搜快照
+    rows: [{'rank', 'title', 'heat', 'tag', 'topic_id'}, ...]
+    source: 榜单来源（weibo / douyin / baidu，多源合并后的榜单为 merged）
+    同一 snapshot_ts 重复写入时忽略（缓存复用的快照不会重复存档）
+    """
+    snapshot_ts = int(snapshot_ts or time.time())
+    try:
+        conn = connect(db_path)
+        with conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO hot_items (source, snapshot_ts, rank, title, heat, tag, topic_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(source, snapshot_ts, r['rank'], r['title'], r.get('heat', 0), r.get('tag', ''),
+                  r.get('topic_id', ''))
+                 for r in rows]
+            )
+        conn.close()
+        if cursor.rowcount > 0:
+            print(f"✅ 已存档热搜快照 [{source}]: {cursor.rowcount} 条 → {db_path}")
+        return True
+    except sqlite3.Error as e:
+        print(f"⚠️  存档热搜快照失败: {e}")
+        return False
+
+
+def snapshot_times(limit=10, before_ts=None, source='weibo', db_path=DB_PATH):
+    """某个来源最近的快照时间戳（新→旧）"""
+    conn = connect(db_path)
+    if before_ts is None:
+        cur = conn.execute(
+            "SELECT DISTINCT snapshot_ts FROM hot_items WHERE source = ? "
+            "ORDER BY snapshot_ts DESC LIMIT ?", (source, limit))
+    else:
+        cur = conn.execute(
+            "SELECT DISTINCT snapshot_ts FROM hot_items WHERE source = ? AND snapshot_ts < ? "
+            "ORDER BY snapshot_ts DESC LIMIT ?", (source, int(before_ts), limit))
+    result = [row[0] for row in cur]
+    conn.close()
+    return result
+
+
+def load_snapshot(snapshot_ts, source='weibo', db_path=DB_PATH):
+    """读取某次快照的完整榜单"""
+    conn = connect(db_path)
+    cur = conn.execute(
+        "SELECT rank, title, heat, tag, topic_id FROM hot_items WHERE source = ? AND snapshot_ts = ? "
+        "ORDER BY rank",
+        (source, int(snapshot_ts)))
+    rows = [{'rank': r[0], 'title': r[1], 'heat': r[2], 'tag': r[3], 'topic_id': r[4]} for r in cur]
+    conn.close()
+    return rows
+
+
+def topic_trajectory(title, since_ts=None, topic_id=None, source='weibo', db_path=DB_PATH):
+    """
+    查询话题在某个来源上的排名/热度走势 [(snapshot_ts, rank, heat), ...]
+    指定 topic_id 时同时包含标题写法略有变化的记录
+    """
+    conn = connect(db_path)
+    if topic_id:
+        cur = conn.execute(
+            "SELECT snapshot_ts, rank, heat FROM hot_items "
+            "WHERE (topic_id = ? OR title = ?) AND source = ? AND snapshot_ts >= ? ORDER BY snapshot_ts",
+            (topic_id, title, source, int(since_ts or 0)))
+    else:
+        cur = conn.execute(
+            "SELECT snapshot_ts, rank, heat FROM hot_items WHERE title = ? AND source = ? AND snapshot_ts >= ? "
+            "ORDER BY snapshot_ts",
+            (title, source, int(since_ts or 0)))
+    result = cur.fetchall()
+    conn.close()
+    return result
+
+
+def store_stats(db_path=DB_PATH):
+    """快照库统计信息"""
+    conn = connect(db_path)
+    count, snapshots, first_ts, last_ts = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT snapshot_ts), MIN(snapshot_ts), MAX(snapshot_ts) FROM hot_items"
+    ).fetchone()
+    titles = conn.execute("SELECT COUNT(DISTINCT title) FROM hot_items").fetchone()[0]
+    conn.close()
+    return {
+        'rows': count,
+        'snapshots': snapshots,
+        'titles': titles,
+        'first_ts': first_ts,
+        'last_ts': last_ts
+    }
+
+
+def _fmt_ts(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M') if ts else 'N/A'
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('stats', 'trajectory'):
+        print(__doc__)
+        return 1
+
+    if args[0] == 'stats':
+        stats = store_stats()
+        print(f"📦 快照库: {DB_PATH}")
+        print(f"   快照次数: {stats['snapshots']}")
+        print(f"   记录条数: {stats['rows']}")
+        print(f"   话题数量: {stats['titles']}")
+        print(f"   时间范围: {_fmt_ts(stats['first_ts'])} ~ {_fmt_ts(stats['last_ts'])}")
+        return 0
+
+    if len(args) < 2:
+        print("❌ 请指定话题标题")
+        return 1
+
+    since_ts = None
+    if '--days' in args:
+        days = float(args[args.index('--days') + 1])
+        since_ts = time.time() - days * 86400
+    source = args[args.index('--source') + 1] if '--source' in args else 'weibo'
+
+    start = time.perf_counter()
+    points = topic_trajectory(args[1], since_ts, topic_id=get_index().lookup(args[1]), source=source)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"📈 {args[1]} —— 共 {len(points)} 个数据点（查询耗时 {elapsed_ms:.1f}ms）")
+    for ts, rank, heat in points:
+        print(f"   {_fmt_ts(ts)}  #{rank:<3d} 🔥 {heat:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
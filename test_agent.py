@@ -6,6 +6,8 @@
 import asyncio
 from claude_agent_sdk import query, ClaudeAgentOptions
 
+from rate_limiter import QuotaExceededError, get_limiter
+
 async def test_agent():
     print("开始测试 Claude Agent SDK...")
     print("-" * 50)
@@ -30,6 +32,13 @@ async def test_agent():
         model="sonnet"
     )
 
+    # 手动测试也走共享限流额度，避免和定时任务同时调用触发 429
+    try:
+        await asyncio.to_thread(get_limiter().acquire, 'anthropic')
+    except QuotaExceededError as e:
+        print(f"❌ 限流: {e}")
+        return False
+
     try:
         async for message in query(prompt=test_prompt, options=options):
             if hasattr(message, '__class__'):
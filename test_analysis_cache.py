@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""analysis_cache 测试：缓存键、加锁合并保存，以及 CachedAnalyzer 不缓存预筛占位结果"""
+
+import multiprocessing
+
+from analysis_cache import AnalysisCache, CachedAnalyzer
+from pipeline_executor import StubAnalyzer
+
+QUERY = {'rank': 1, 'title': '北京今日发布暴雨橙色预警', 'topic_id': 't1'}
+SUMMARY = '北京 气象台 发布 暴雨 橙色 预警 多区 停课'
+RESULT = {'rank': 1, 'fun_score': 30, 'useful_score': 15, 'total_score': 45, 'has_idea': False}
+
+
+def test_exact_hit_is_marked_reused(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.json'))
+    assert cache.get(QUERY, SUMMARY, 'm1') is None
+    cache.put(QUERY, SUMMARY, 'm1', RESULT)
+    hit = cache.get(dict(QUERY, rank=5), '  北京 气象台 发布 暴雨 橙色 预警 多区 停课 ', 'm1')
+    assert hit['total_score'] == 45 and hit['reused'] is True
+    assert 'rank' not in hit
+    assert hit['reused_from']['kind'] == 'exact'
+
+
+def test_key_includes_model_template_and_context(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.json'))
+    cache.put(QUERY, SUMMARY, 'm1', RESULT, template_version='v1')
+    assert cache.get(QUERY, SUMMARY, 'm2', template_version='v1') is None
+    assert cache.get(QUERY, SUMMARY, 'm1', template_version='v2') is None
+    assert cache.get(QUERY, SUMMARY + ' 新进展', 'm1', template_version='v1') is None
+
+
+def test_similar_hit_above_threshold(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.json'), threshold=0.7)
+    cache.put(QUERY, SUMMARY, 'm1', RESULT)
+    hit = cache.get(QUERY, SUMMARY + ' 地铁', 'm1')
+    assert hit is not None and hit['reused_from']['kind'] == 'similar'
+    assert cache.get(QUERY, '完全 不同 的 内容', 'm1') is None
+
+
+def test_saves_merge_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    first, second = AnalysisCache(path), AnalysisCache(path)
+    first.put(QUERY, SUMMARY, 'm1', RESULT)
+    second.put(dict(QUERY, topic_id='t2'), SUMMARY, 'm1', RESULT)
+    first.save()
+    second.save()
+    assert len(AnalysisCache(path).entries) == 2
+
+
+def _put_and_save(path, worker, count):
+    cache = AnalysisCache(path)
+    for i in range(count):
+        cache.put(dict(QUERY, topic_id=f't{worker}_{i}'), SUMMARY, 'm1', RESULT)
+        cache.save()
+
+
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    workers, count = 4, 10
+    processes = [multiprocessing.Process(target=_put_and_save, args=(path, w, count)) for w in range(workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    assert all(p.exitcode == 0 for p in processes)
+    assert len(AnalysisCache(path).entries) == workers * count
+
+
+class _PrefilteringAnalyzer(StubAnalyzer):
+    def analyze(self, prompt, query):
+        return dict(super().analyze(prompt, query), prefiltered=True)
+
+
+def test_cached_analyzer_reuses_results(tmp_path):
+    analyzer = StubAnalyzer(latency_ms=0)
+    cached = CachedAnalyzer(analyzer, AnalysisCache(str(tmp_path / 'cache.json')))
+    items = [(QUERY, SUMMARY, 'prompt')]
+    first, _ = cached.analyze_group(items)
+    second, _ = cached.analyze_group(items)
+    assert analyzer.calls == 1
+    assert first[1]['reused'] is False and second[1]['reused'] is True
+
+
+def test_cached_analyzer_skips_prefiltered_results(tmp_path):
+    analyzer = _PrefilteringAnalyzer(latency_ms=0)
+    cached = CachedAnalyzer(analyzer, AnalysisCache(str(tmp_path / 'cache.json')))
+    items = [(QUERY, SUMMARY, 'prompt')]
+    cached.analyze_group(items)
+    cached.analyze_group(items)
+    assert analyzer.calls == 2
+    assert not cached.cache.entries
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""bm25_index 本地检索测试"""
+
+import pytest
+
+from bm25_index import BM25Index, documents_from_result, tokenize
+
+DOCS = [
+    {'title': '北京暴雨', 'text': '北京气象台发布暴雨橙色预警，多区中小学停课', 'url': 'https://a.example/1', 'topic_id': 't1'},
+    {'title': '暴雨出行', 'text': '暴雨天气地铁部分线路限流，市民注意出行安全', 'url': 'https://a.example/2', 'topic_id': 't1'},
+    {'title': '国足名单', 'text': '国足公布世预赛二十六人大名单，多名归化球员入选', 'url': 'https://a.example/3', 'topic_id': 't2'},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / 'index.db'))
+    index.add_documents(DOCS)
+    yield index
+    index.close()
+
+
+def test_tokenize_mixes_bigrams_and_words():
+    assert tokenize('小米SU7 发布') == ['小米', 'su7', '发布']
+    assert tokenize('Ｗｅｉｂｏ 热') == ['weibo', '热']
+
+
+def test_search_ranks_relevant_documents_first(index):
+    hits = index.search('北京 暴雨 预警', k=2)
+    assert [h['url'] for h in hits] == ['https://a.example/1', 'https://a.example/2']
+    assert hits[0]['score'] > hits[1]['score'] > 0
+
+
+def test_search_filters_by_topic(index):
+    assert {h['topic_id'] for h in index.search('暴雨 名单', topic_id='t2')} == {'t2'}
+    assert index.search('暴雨', topic_id='t3') == []
+
+
+def test_add_documents_is_incremental(index):
+    assert index.add_documents(DOCS) == 0
+    assert index.add_documents([{'title': '', 'text': '   ', 'url': 'https://a.example/4'}]) == 0
+    assert index.stats()['docs'] == 3
+
+
+def test_documents_from_result():
+    data = {'topic_id': 't1', 'results': [{'title': '标题', 'url': 'u', 'snippet': '摘要'}]}
+    assert documents_from_result(data) == [{'text': '摘要', 'title': '标题', 'url': 'u', 'topic_id': 't1'}]
+    legacy = {'title': '旧格式', 'content': '整段内容'}
+    assert documents_from_result(legacy)[0]['text'] == '整段内容'
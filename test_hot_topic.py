@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""hot_topic 热度解析测试"""
+
+import pytest
+
+from hot_topic import HotTopic, parse_heat, split_heat
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1.15亿', 115_000_000),     # float 乘法会得到 114999999
+    ('0.57亿', 57_000_000),
+    ('2.3万', 23_000),
+    ('1.1w', 11_000),
+    ('1,234,567', 1_234_567),
+    (' 1018477', 1_018_477),
+    (492525, 492525),
+    (12.9, 12),
+])
+def test_parse_heat_exact(value, expected):
+    assert parse_heat(value) == expected
+
+
+def test_split_heat_keeps_label():
+    assert split_heat('演出 492525') == (492525, '演出')
+    assert split_heat('剧集 1.2万') == (12_000, '剧集')
+
+
+@pytest.mark.parametrize('value', ['', '暂无', None, [], '  '])
+def test_parse_heat_unparsable_is_zero(value):
+    assert parse_heat(value) == 0
+
+
+def test_hot_topic_from_item_parses_heat():
+    topic = HotTopic.from_item(3, {'hotword': '测试话题', 'hotwordnum': '演出 0.57亿', 'hottag': '热'})
+    assert (topic.rank, topic.title, topic.heat, topic.label) == (3, '测试话题', 57_000_000, '演出')
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""json_stream 流式数组解析测试"""
+
+import json
+
+import pytest
+
+from json_stream import JsonArrayStream
+
+BODY = json.dumps({'code': 200, 'msg': 'success', 'result': {'list': [
+    {'hotword': '北京暴雨', 'hotwordnum': ' 1018477'},
+    {'hotword': '国足名单', 'hotwordnum': '演出 492525'},
+    {'hotword': '雷军回应', 'hotwordnum': '1.15亿'},
+]}}, ensure_ascii=False)
+
+
+def _chunks(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, 4096])
+def test_parses_elements_across_chunk_boundaries(size):
+    # 小块会把多字节 UTF-8 字符和 JSON 元素从中间切开
+    stream = JsonArrayStream(_chunks(BODY, size))
+    assert [item['hotword'] for item in stream] == ['北京暴雨', '国足名单', '雷军回应']
+    assert stream.found and '"code": 200' in stream.head
+
+
+def test_yields_before_reading_the_rest():
+    read = []
+
+    def chunks():
+        for chunk in _chunks(BODY, 16):
+            read.append(chunk)
+            yield chunk
+        raise AssertionError('不应读到响应末尾')
+
+    first = next(iter(JsonArrayStream(chunks())))
+    assert first['hotword'] == '北京暴雨'
+    assert sum(map(len, read)) < len(BODY.encode('utf-8'))
+
+
+def test_missing_key_keeps_head():
+    stream = JsonArrayStream(['{"code": 250, "msg": "数据返回为空"}'])
+    assert list(stream) == []
+    assert not stream.found and '250' in stream.head
+
+
+def test_truncated_element_raises():
+    with pytest.raises(json.JSONDecodeError):
+        list(JsonArrayStream(['{"list": [{"a": 1}, {"a": ']))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""llm_analysis 批量分析测试：排名规整、对不上的排名报告、截断输出和拆分重试"""
+
+import json
+
+import pytest
+
+from llm_analysis import AnalysisError, AnthropicAnalyzer, _entry_rank, extract_json_array
+
+
+def _entry(rank, fun_score=50, useful_score=10):
+    return {'rank': rank, 'fun_score': fun_score, 'useful_score': useful_score, 'summary': f'话题 {rank}'}
+
+
+def _items(*ranks):
+    return [({'rank': rank, 'title': f'话题{rank}', 'heat': 100}, f'摘要 {rank}', f'提示 {rank}') for rank in ranks]
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    """不发网络请求的分析器：complete() 依次返回预设的 (文本, stop_reason)"""
+    analyzer = AnthropicAnalyzer(api_key='test', max_attempts=1, batch=True, client=object())
+    analyzer.responses = []
+
+    def complete(prompt, max_tokens=None):
+        analyzer.usage['requests'] += 1
+        return analyzer.responses.pop(0)
+
+    monkeypatch.setattr(analyzer, 'complete', complete)
+    return analyzer
+
+
+@pytest.mark.parametrize('entry, expected', [
+    ({'rank': 3}, 3),
+    ({'rank': '3'}, 3),
+    ({'rank': ' #3 '}, 3),
+    ({'rank': 'third'}, None),
+    ({}, None),
+    ('3', None),
+])
+def test_entry_rank_coercion(entry, expected):
+    assert _entry_rank(entry) == expected
+
+
+def test_extract_json_array_keeps_complete_entries():
+    text = '结果如下：\n```json\n[{"rank": 1}, // 第一个\n {"rank": 2}, {"rank": 3, "fun_sc'
+    assert extract_json_array(text) == [{'rank': 1}, {'rank': 2}]
+    with pytest.raises(AnalysisError):
+        extract_json_array('没有数组')
+
+
+def test_batch_accepts_string_ranks(analyzer):
+    analyzer.responses = [(json.dumps([_entry('2'), _entry('#1', 70, 15)]), 'end_turn')]
+    results, failed = analyzer.analyze_batch(_items(1, 2))
+    assert failed == {}
+    assert results[1]['total_score'] == 85 and results[2]['total_score'] == 60
+
+
+def test_batch_reports_unmatched_ranks(analyzer):
+    analyzer.responses = [(json.dumps([_entry(1), _entry('话题二')]), 'end_turn')]
+    results, failed = analyzer.analyze_batch(_items(1, 2))
+    assert set(results) == {1}
+    assert '无法对应' in str(failed[2]) and '话题二' in str(failed[2])
+
+
+def test_batch_reports_truncation(analyzer):
+    analyzer.responses = [('[' + json.dumps(_entry(1)) + ', {"rank": 2, "fun', 'max_tokens')]
+    results, failed = analyzer.analyze_batch(_items(1, 2))
+    assert set(results) == {1}
+    assert '截断' in str(failed[2])
+
+
+def test_batch_validates_each_entry(analyzer):
+    analyzer.responses = [(json.dumps([_entry(1), _entry(2, fun_score=120)]), 'end_turn')]
+    results, failed = analyzer.analyze_batch(_items(1, 2))
+    assert set(results) == {1}
+    assert 'fun_score' in str(failed[2])
+
+
+def test_group_retries_only_failed_topics(analyzer):
+    analyzer.responses = [
+        (json.dumps([_entry(1), _entry(3)]), 'end_turn'),   # 批量结果缺少 #2
+        (json.dumps(_entry(2)), 'end_turn'),               # #2 单独重试
+    ]
+    results, errors = analyzer.analyze_group(_items(1, 2, 3))
+    assert errors == {}
+    assert set(results) == {1, 2, 3}
+    assert analyzer.usage['requests'] == 2
+    assert analyzer.usage['splits'] == 1
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""prefilter_model 测试：交叉验证阈值选择、跳过统计、路由，以及占位结果不进入话题存档"""
+
+import pytest
+
+import snapshot_diff
+from pipeline_executor import StubAnalyzer
+from prefilter_model import (DEFAULT_THRESHOLD, PrefilterAnalyzer, PrefilterModel, choose_threshold,
+                             skip_quality)
+from run_manifest import RunManifest, write_json_atomic
+
+
+def test_choose_threshold_keeps_every_idea():
+    # 有创意（实际 ≥ 60）话题里最低的预测是 41.7 → 阈值取 41，不会跳过任何一个
+    pairs = [(20.0, 10), (35.5, 30), (41.7, 65), (55.0, 72), (48.0, 40)]
+    threshold = choose_threshold(pairs)
+    assert threshold == 41
+    assert skip_quality(pairs, threshold)['missed_ideas'] == 0
+
+
+def test_choose_threshold_without_ideas_uses_default():
+    assert choose_threshold([(20.0, 10), (35.0, 30)]) == DEFAULT_THRESHOLD
+    assert choose_threshold([]) == DEFAULT_THRESHOLD
+
+
+def test_choose_threshold_is_clamped():
+    assert choose_threshold([(-3.0, 70)]) == 0
+    assert choose_threshold([(140.0, 70)]) == 100
+
+
+def test_skip_quality():
+    pairs = [(20.0, 10), (30.0, 65), (50.0, 40), (70.0, 80)]
+    stats = skip_quality(pairs, 40)
+    assert stats['would_skip'] == 2
+    assert stats['skip_precision'] == 0.5       # 跳过的 2 个里 1 个确实没有创意
+    assert stats['skip_recall'] == 0.5          # 没有创意的 2 个里跳过了 1 个
+    assert stats['missed_ideas'] == 1
+    assert stats['ideas'] == 2
+    assert skip_quality([], 40) == {'topics': 0}
+
+
+class _FixedScorer(PrefilterModel):
+    def __init__(self, scores):
+        super().__init__()
+        self.scores = scores
+
+    def predict(self, title):
+        return self.scores[title]
+
+
+def _items():
+    return [({'rank': 1, 'title': '低分话题'}, '摘要', '提示'), ({'rank': 2, 'title': '高分话题'}, '摘要', '提示')]
+
+
+@pytest.mark.parametrize('mode, calls, prefiltered', [('on', 1, {1}), ('shadow', 2, set())])
+def test_prefilter_routing(mode, calls, prefiltered):
+    analyzer = StubAnalyzer(latency_ms=0)
+    prefilter = PrefilterAnalyzer(analyzer, _FixedScorer({'低分话题': 20.0, '高分话题': 70.0}), mode, 40)
+    results, errors = prefilter.analyze_group(_items())
+    assert errors == {}
+    assert analyzer.calls == calls
+    assert {rank for rank, r in results.items() if r.get('prefiltered')} == prefiltered
+    assert prefilter.summary()['below_threshold'] == 1
+
+
+def test_prefiltered_results_are_not_archived_or_reused(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(snapshot_diff, 'ARTIFACT_DIR', str(tmp_path / 'artifacts'))
+    manifest = RunManifest.create('run1', runs_dir=str(tmp_path / 'runs'))
+    queries = [{'rank': 1, 'title': '低分话题', 'topic_id': 't1'}, {'rank': 2, 'title': '高分话题', 'topic_id': 't2'}]
+    manifest.set_topics(queries)
+
+    prefilter = PrefilterAnalyzer(StubAnalyzer(latency_ms=0),
+                                  _FixedScorer({'低分话题': 20.0, '高分话题': 70.0}), 'on', 40)
+    results, _ = prefilter.analyze_group([(q, '摘要', '提示') for q in queries])
+    for q in queries:
+        for stage, data in (('search', {'results': [{'title': '新闻'}]}), ('analysis', results[q['rank']])):
+            path = manifest.stage_path(q['rank'], stage)
+            write_json_atomic(path, data)
+            manifest.record(q['rank'], stage, path)
+
+    assert snapshot_diff.archive_topic_artifacts(queries, manifest) == 1
+    assert snapshot_diff.load_topic_artifacts(queries[0]) is None
+    assert snapshot_diff.load_topic_artifacts(queries[1]) is not None
+
+    # 旧版本已经存档的占位结果也不复用，话题重新处理
+    write_json_atomic(str(tmp_path / 'artifacts' / 't1' / 'search.json'), {'results': [{'title': '新闻'}]})
+    write_json_atomic(str(tmp_path / 'artifacts' / 't1' / 'analysis.json'), results[1])
+    stable = [dict(q, reprocess=False) for q in queries]
+    assert not snapshot_diff.has_topic_artifacts(stable[0])
+    assert snapshot_diff.apply_reuse(stable, manifest) == 1
+    assert stable[0]['reprocess'] is True and stable[1]['reprocess'] is False
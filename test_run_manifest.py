@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""run_manifest 测试：产物哈希校验和 --resume 只重做缺失的排名"""
+
+import asyncio
+import json
+
+import pytest
+
+from pipeline_executor import PipelineExecutor, StubAnalyzer
+from run_manifest import RunManifest, write_json_atomic
+
+QUERIES = [
+    {'rank': 1, 'title': '北京今日发布暴雨橙色预警', 'topic_id': 't1', 'heat': 100, 'search_query': '北京 暴雨 预警'},
+    {'rank': 2, 'title': '国足世预赛名单公布', 'topic_id': 't2', 'heat': 90, 'search_query': '国足 世预赛 名单'},
+]
+SEARCH = {'results': [{'title': '新闻', 'url': 'https://example.com', 'content': '详细报道'}]}
+ANALYSIS = {'fun_score': 10, 'useful_score': 5, 'total_score': 15, 'has_idea': False}
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = RunManifest.create('run1', runs_dir=str(tmp_path / 'runs'))
+    manifest.set_topics(QUERIES)
+    manifest.save()
+    return manifest
+
+
+def _write(manifest, rank, stage, data):
+    path = manifest.stage_path(rank, stage)
+    write_json_atomic(path, data)
+    manifest.record(rank, stage, path)
+    return path
+
+
+def test_recorded_artifact_is_complete(manifest):
+    _write(manifest, 1, 'analysis', ANALYSIS)
+    assert manifest.is_complete(1, 'analysis')
+    assert manifest.pending('analysis') == [2]
+
+
+def test_changed_artifact_revokes_completion(manifest):
+    path = _write(manifest, 1, 'analysis', ANALYSIS)
+    # 大小不变、内容变化：只有 sha256 能发现
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text.replace('"total_score": 15', '"total_score": 16'))
+    assert not manifest.is_complete(1, 'analysis')
+    assert 'analysis' not in manifest.topic(1)['artifacts']
+
+
+def test_invalid_artifact_is_not_complete(manifest):
+    _write(manifest, 1, 'analysis', {'summary': '没有评分'})
+    _write(manifest, 2, 'search', {'results': []})
+    assert manifest.pending('analysis') == [1, 2]
+    assert manifest.pending('search') == [1, 2]
+
+
+def test_unrecorded_valid_file_is_registered(manifest):
+    # agent 直接把分析结果写到标准位置
+    write_json_atomic(manifest.stage_path(2, 'analysis'), ANALYSIS)
+    assert manifest.is_complete(2, 'analysis')
+    assert manifest.topic(2)['artifacts']['analysis']['sha256']
+
+
+def test_create_with_existing_run_id_resumes(manifest, tmp_path):
+    _write(manifest, 1, 'analysis', ANALYSIS)
+    manifest.save()
+    resumed = RunManifest.create('run1', runs_dir=str(tmp_path / 'runs'))
+    assert resumed.ranks() == [1, 2]
+    assert resumed.pending('analysis') == [2]
+
+
+def test_resume_only_analyzes_pending_ranks(manifest):
+    _write(manifest, 1, 'search', SEARCH)
+    _write(manifest, 1, 'analysis', ANALYSIS)
+    _write(manifest, 2, 'search', SEARCH)
+    manifest.save()
+
+    analyzer = StubAnalyzer(latency_ms=0)
+    plan = {'workflow': [{'rank': 1}, {'rank': 2}]}
+    executor = PipelineExecutor(manifest, plan, QUERIES, analyzer=analyzer, use_cache=False)
+    result = asyncio.run(executor.run())
+
+    assert analyzer.calls == 1
+    assert result['failed'] == {}
+    assert manifest.pending('analysis') == []
+    with open(manifest.artifact(1, 'analysis'), 'r', encoding='utf-8') as f:
+        assert json.load(f) == ANALYSIS   # 已完成的排名没有被重新分析
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""search_cache 测试：命中方式、TTL 和多个进程加锁合并保存"""
+
+import multiprocessing
+
+from search_cache import SearchCache
+
+RESULTS = [{'title': '新闻', 'url': 'https://example.com', 'content': '详细报道'}]
+
+
+def test_query_and_topic_hits(tmp_path):
+    cache = SearchCache(str(tmp_path))
+    assert cache.get('北京 暴雨', 't1', 'stub') == (None, None)
+    cache.put('北京 暴雨', RESULTS, 't1', 'stub')
+    assert cache.get('  北京   暴雨 ', 't1', 'stub') == (RESULTS, 'query')    # 查询归一化
+    assert cache.get('北京 暴雨 预警', 't1', 'stub') == (RESULTS, 'topic')    # 同话题换了查询
+    assert cache.get('北京 暴雨', 't1', 'tavily') == (None, None)             # 不同后端不共用
+
+
+def test_expired_entry_is_dropped(tmp_path):
+    cache = SearchCache(str(tmp_path), ttl=-1)
+    cache.put('北京 暴雨', RESULTS, 't1', 'stub')
+    assert cache.get('北京 暴雨', 't1', 'stub') == (None, None)
+    assert cache.stats['expired'] == 1
+    assert not cache.entries
+
+
+def test_saves_merge_instead_of_overwriting(tmp_path):
+    first, second = SearchCache(str(tmp_path)), SearchCache(str(tmp_path))
+    first.put('北京 暴雨', RESULTS, 't1', 'stub')
+    second.put('国足 名单', RESULTS, 't2', 'stub')
+    first.save()
+    second.save()
+
+    merged = SearchCache(str(tmp_path))
+    assert merged.get('北京 暴雨', 't1', 'stub')[1] == 'query'
+    assert merged.get('国足 名单', 't2', 'stub')[1] == 'query'
+
+
+def test_removed_entry_stays_removed_after_merge(tmp_path):
+    seed = SearchCache(str(tmp_path))
+    seed.put('北京 暴雨', RESULTS, 't1', 'stub')
+    seed.save()
+
+    expiring, other = SearchCache(str(tmp_path), ttl=-1), SearchCache(str(tmp_path))
+    assert expiring.get('北京 暴雨', 't1', 'stub') == (None, None)    # 过期删除
+    other.put('国足 名单', RESULTS, 't2', 'stub')
+    other.save()
+    expiring.save()
+
+    merged = SearchCache(str(tmp_path))
+    assert merged.get('北京 暴雨', 't1', 'stub') == (None, None)
+    assert merged.get('国足 名单', 't2', 'stub')[1] == 'query'
+
+
+def _put_and_save(cache_dir, worker, count):
+    cache = SearchCache(cache_dir)
+    for i in range(count):
+        cache.put(f'查询 {worker} {i}', RESULTS, f't{worker}_{i}', 'stub')
+        cache.save()
+
+
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    workers, count = 4, 10
+    processes = [multiprocessing.Process(target=_put_and_save, args=(str(tmp_path), w, count))
+                 for w in range(workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    assert all(p.exitcode == 0 for p in processes)
+    cache = SearchCache(str(tmp_path))
+    assert len(cache.entries) == workers * count
+    assert len(cache.topics) == workers * count
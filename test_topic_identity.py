@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""topic_identity 话题身份测试：MinHash/LSH 匹配和加锁合并保存"""
+
+from topic_identity import TopicIndex, normalize_title
+
+
+def test_normalize_title_ignores_width_case_and_punctuation():
+    assert normalize_title('＃雷军回应 小米SU7！＃') == normalize_title('雷军回应小米su7')
+
+
+def test_variant_titles_share_topic_id():
+    index = TopicIndex(path=None)
+    topic_id = index.resolve('雷军回应小米汽车事故')
+    assert index.resolve('雷军回应小米汽车事故最新进展') == topic_id   # 追加后缀（包含关系）
+    assert index.resolve('雷军回应小米汽车的事故') == topic_id         # 轻微改写（Jaccard）
+    assert index.resolve('#雷军回应小米汽车事故#') == topic_id          # 只差标点
+    assert '雷军回应小米汽车事故最新进展' in index.topics[topic_id]['aliases']
+
+
+def test_distinct_titles_get_distinct_ids():
+    index = TopicIndex(path=None)
+    ids = {index.resolve(title) for title in ('雷军回应小米汽车事故', '北京今日发布暴雨橙色预警', '国足世预赛名单公布')}
+    assert len(ids) == 3
+
+
+def test_short_title_is_not_swallowed_by_containment():
+    index = TopicIndex(path=None)
+    long_id = index.resolve('雷军回应小米汽车事故')
+    assert index.lookup('雷军') is None
+    assert index.resolve('雷军') != long_id
+
+
+def test_resolve_is_stable_across_reload(tmp_path):
+    path = str(tmp_path / 'topic_index.json')
+    index = TopicIndex(path)
+    topic_id = index.resolve('北京今日发布暴雨橙色预警')
+    index.save()
+    assert TopicIndex(path).lookup('北京今日发布暴雨橙色预警（更新）') == topic_id
+
+
+def test_concurrent_saves_merge_topics_and_aliases(tmp_path):
+    path = str(tmp_path / 'topic_index.json')
+    seed = TopicIndex(path)
+    shared = seed.resolve('国足世预赛名单公布')
+    seed.save()
+
+    # 两个运行在对方保存之前各自读入索引
+    first, second = TopicIndex(path), TopicIndex(path)
+    a = first.resolve('北京今日发布暴雨橙色预警')
+    first.resolve('国足世预赛名单正式公布')
+    b = second.resolve('雷军回应小米汽车事故')
+    second.resolve('国足世预赛大名单公布')
+    first.save()
+    second.save()
+
+    merged = TopicIndex(path)
+    assert {shared, a, b} <= set(merged.topics)
+    assert set(merged.topics[shared]['aliases']) == {'国足世预赛名单公布', '国足世预赛名单正式公布', '国足世预赛大名单公布'}
+    # 保存后本进程也能看到其他运行登记的话题
+    assert a in second.topics
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+天行数据接口的录制/回放工具和本地替身服务
+- 录制：设置 TIANXING_RECORD_DIR 后，fetch_weibo_hotspot 每次真实请求的响应都会保存为样本
+- 回放：本地 HTTP 服务按顺序循环返回样本，可配置延迟和错误注入
+- 压测：启动替身服务并用共享抓取客户端并发请求，输出成功率和耗时
+
+用法:
+    python3 tianxing_stub.py record                       # 真实请求一次并录制（需要 TIANXING_API_KEY）
+    python3 tianxing_stub.py serve [--port 8765] [--latency-ms 200] [--jitter-ms 50]
+                                   [--error-rate 0.1] [--timeout-rate 0.05]
+    python3 tianxing_stub.py bench [--requests 200] [--concurrency 8] [其余参数同 serve]
+
+离线运行整条流水线:
+    python3 tianxing_stub.py serve &
+    export TIANXING_BASE_URL=http://127.0.0.1:8765
+    python3 fetch_weibo_hotspot.py
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.environ.get('TIANXING_FIXTURES_DIR', 'fixtures')
+DEFAULT_PORT = 8765
+
+
+def record_fixture(endpoint, payload, record_dir=None):
+    """把接口响应保存为回放样本（未设置 TIANXING_RECORD_DIR 时不录制）"""
+    record_dir = record_dir or os.environ.get('TIANXING_RECORD_DIR')
+    if not record_dir:
+        return None
+    target_dir = os.path.join(record_dir, endpoint)
+    os.makedirs(target_dir, exist_ok=True)
+    path = os.path.join(target_dir, datetime.now().strftime('%Y%m%d_%H%M%S_%f') + '.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"📼 已录制接口样本: {path}")
+    return path
+
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    """读取样本目录 {endpoint: [响应体bytes, ...]}，按文件名排序"""
+    fixtures = {}
+    if not os.path.isdir(fixtures_dir):
+        return fixtures
+    for endpoint in sorted(os.listdir(fixtures_dir)):
+        endpoint_dir = os.path.join(fixtures_dir, endpoint)
+        if not os.path.isdir(endpoint_dir):
+            continue
+        bodies = []
+        for name in sorted(os.listdir(endpoint_dir)):
+            if name.endswith('.json'):
+                with open(os.path.join(endpoint_dir, name), 'rb') as f:
+                    bodies.append(f.read())
+        if bodies:
+            fixtures[endpoint] = bodies
+    return fixtures
+
+
+class StubConfig:
+    """替身服务的延迟和错误注入配置"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, timeout_rate=0.0,
+                 timeout_seconds=30, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.random = random.Random(seed)
+
+
+def make_handler(fixtures, config):
+    """生成请求处理类：/<endpoint>/index 依次循环返回该 endpoint 的样本"""
+    counters = {}
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            endpoint = urlsplit(self.path).path.strip('/').split('/')[0]
+            with lock:
+                roll = config.random.random()
+                delay = max(0.0, config.latency_ms + config.random.uniform(-1, 1) * config.jitter_ms) / 1000
+                index = counters.get(endpoint, 0)
+                counters[endpoint] = index + 1
+
+            if roll < config.timeout_rate:
+                time.sleep(config.timeout_seconds)
+                return
+            time.sleep(delay)
+
+            if roll < config.timeout_rate + config.error_rate:
+                self._send(config.random.choice([500, 502, 503]), b'{"code":500,"msg":"injected error"}')
+                return
+
+            bodies = fixtures.get(endpoint)
+            if not bodies:
+                self._send(404, b'{"code":404,"msg":"no fixture"}')
+                return
+            self._send(200, bodies[index % len(bodies)])
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_server(port=DEFAULT_PORT, config=None, fixtures_dir=FIXTURES_DIR):
+    """在后台线程启动替身服务，返回 server（port=0 时自动分配端口）"""
+    fixtures = load_fixtures(fixtures_dir)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(fixtures, config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_bench(total, concurrency, config, fixtures_dir=FIXTURES_DIR):
+    """压测：用共享抓取客户端并发请求替身服务"""
+    from fetch_client import FetchClient
+
+    server = start_server(0, config, fixtures_dir)
+    url = f"http://127.0.0.1:{server.server_address[1]}/weibohot/index?key=offline"
+    client = FetchClient(timeout=min(5, config.timeout_seconds - 1), pool_size=concurrency)
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            ok = client.get(url).status_code == 200
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latencies = sorted(r[1] * 1000 for r in results)
+    succeeded = sum(1 for r in results if r[0])
+    summary = client.latency_summary()
+    print(f"📊 压测完成: {total} 次调用，并发 {concurrency}，耗时 {elapsed:.2f}秒")
+    print(f"   调用成功率: {succeeded / total:.1%}（含重试）")
+    print(f"   单次尝试: {summary['attempts']} 次，失败 {summary.get('failures', 0)} 次")
+    print(f"   调用耗时 p50={latencies[len(latencies) // 2]:.0f}ms "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:.0f}ms max={latencies[-1]:.0f}ms")
+    return results
+
+
+def _option(args, name, default, cast):
+    if name in args:
+        return cast(args[args.index(name) + 1])
+    return default
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('record', 'serve', 'bench'):
+        print(__doc__)
+        return 1
+
+    if args[0] == 'record':
+        os.environ.setdefault('TIANXING_RECORD_DIR', FIXTURES_DIR)
+        os.environ['WEIBO_CACHE_TTL'] = '0'
+        from fetch_weibo_hotspot import fetch_weibo_hotspot
+        return 0 if fetch_weibo_hotspot() else 1
+
+    config = StubConfig(
+        latency_ms=_option(args, '--latency-ms', 0, float),
+        jitter_ms=_option(args, '--jitter-ms', 0, float),
+        error_rate=_option(args, '--error-rate', 0.0, float),
+        timeout_rate=_option(args, '--timeout-rate', 0.0, float),
+        seed=_option(args, '--seed', None, int)
+    )
+
+    if args[0] == 'bench':
+        run_bench(_option(args, '--requests', 200, int), _option(args, '--concurrency', 8, int), config)
+        return 0
+
+    port = _option(args, '--port', DEFAULT_PORT, int)
+    server = start_server(port, config)
+    endpoints = ', '.join(load_fixtures()) or '（无样本）'
+    print(f"🧪 天行数据替身服务已启动: http://127.0.0.1:{port}")
+    print(f"   样本接口: {endpoints}")
+    print(f"   export TIANXING_BASE_URL=http://127.0.0.1:{port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
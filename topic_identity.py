@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+话题身份索引
+热搜标题在不同快照之间会轻微变化（标点、表情、"新一代SU7价格" → "新一代SU7价格公布"），
+这里用归一化后的字符 n-gram 计算 MinHash 签名，通过 LSH 分桶快速找到已有话题，
+把每个标题映射到稳定的 topic_id，缓存和历史功能都以 topic_id 为键
+
+用法:
+    python3 topic_identity.py resolve "标题1" "标题2" ...
+    python3 topic_identity.py stats
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import unicodedata
+import zlib
+
+from search_cache import file_lock
+
+INDEX_PATH = os.environ.get('WEIBO_TOPIC_INDEX', os.path.join('data', 'topic_index.json'))
+
+NGRAM = 2
+NUM_PERM = 64
+BANDS = 16                  # 16 段 × 4 行，候选阈值约为 Jaccard 0.5
+ROWS = NUM_PERM // BANDS
+JACCARD_THRESHOLD = 0.5     # 候选确认：n-gram Jaccard 相似度
+CONTAINMENT_THRESHOLD = 0.8 # 或：短标题被长标题包含（如追加"公布"）
+MIN_CONTAINMENT_GRAMS = 4   # 太短的标题不按包含关系合并，避免"雷军"吞掉所有雷军话题
+
+_MERSENNE = (1 << 61) - 1
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def _make_permutations():
+    """固定种子生成哈希置换参数，保证签名跨进程稳定"""
+    params = []
+    for i in range(NUM_PERM):
+        digest = hashlib.sha1(f'minhash-{i}'.encode()).digest()
+        a = int.from_bytes(digest[:8], 'big') % _MERSENNE or 1
+        b = int.from_bytes(digest[8:16], 'big') % _MERSENNE
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _make_permutations()
+
+
+def normalize_title(title):
+    """归一化标题：全角转半角、小写、去掉标点/空白/表情"""
+    text = unicodedata.normalize('NFKC', title or '').lower()
+    return _NON_WORD.sub('', text)
+
+
+def shingles(normalized):
+    """字符 n-gram 集合"""
+    if len(normalized) <= NGRAM:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + NGRAM] for i in range(len(normalized) - NGRAM + 1)}
+
+
+def minhash(grams):
+    """计算 MinHash 签名"""
+    hashes = [zlib.crc32(g.encode('utf-8')) for g in grams]
+    if not hashes:
+        return [0] * NUM_PERM
+    return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _band_keys(signature):
+    return [(band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def is_same_topic(grams_a, grams_b):
+    """精确确认两个标题是否为同一话题"""
+    if not grams_a or not grams_b:
+        return False
+    inter = len(grams_a & grams_b)
+    if inter / len(grams_a | grams_b) >= JACCARD_THRESHOLD:
+        return True
+    smaller = min(len(grams_a), len(grams_b))
+    return smaller >= MIN_CONTAINMENT_GRAMS and inter / smaller >= CONTAINMENT_THRESHOLD
+
+
+class TopicIndex:
+    """标题 → topic_id 索引（MinHash + LSH）"""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.topics = {}     # topic_id -> {'title', 'aliases', 'signature'}
+        self.exact = {}      # 归一化标题 -> topic_id
+        self.buckets = {}    # (band, rows) -> [topic_id, ...]
+        self._grams = {}     # topic_id -> [n-gram 集合]（每个别名一份）
+        self.touched = set() # 本进程新登记或追加了别名、保存时要合并进索引文件的 topic_id
+        self.dirty = False
+        if path and os.path.exists(path):
+            self._load(self._read_topics())
+
+    def _read_topics(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('topics', {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️  话题索引读取失败，将重新建立: {e}")
+            return {}
+
+    def _load(self, topics):
+        self.topics, self.exact, self.buckets, self._grams = {}, {}, {}, {}
+        for topic_id, topic in topics.items():
+            self._add(topic_id, topic['title'], topic['aliases'], topic['signature'])
+
+    def _add(self, topic_id, title, aliases, signature):
+        self.topics[topic_id] = {'title': title, 'aliases': aliases, 'signature': signature}
+        self._grams[topic_id] = [shingles(normalize_title(a)) for a in aliases]
+        for alias in aliases:
+            self.exact[normalize_title(alias)] = topic_id
+        for key in _band_keys(signature):
+            self.buckets.setdefault(key, []).append(topic_id)
+
+    def lookup(self, title):
+        """查找已有话题，找不到返回 None"""
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        if normalized in self.exact:
+            return self.exact[normalized]
+
+        grams = shingles(normalized)
+        signature = minhash(grams)
+        seen = set()
+        for key in _band_keys(signature):
+            for topic_id in self.buckets.get(key, ()):
+                if topic_id in seen:
+                    continue
+                seen.add(topic_id)
+                if any(is_same_topic(grams, g) for g in self._grams[topic_id]):
+                    return topic_id
+        return None
+
+    def resolve(self, title):
+        """返回标题对应的 topic_id，新话题自动登记；匹配到的新写法记为别名"""
+        normalized = normalize_title(title)
+        if not normalized:
+            return ''
+        topic_id = self.lookup(title)
+        if topic_id is None:
+            topic_id = 't' + hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+            self._add(topic_id, title, [title], minhash(shingles(normalized)))
+            self.touched.add(topic_id)
+            self.dirty = True
+        elif normalized not in self.exact:
+            topic = self.topics[topic_id]
+            topic['aliases'].append(title)
+            self._grams[topic_id].append(shingles(normalized))
+            self.exact[normalized] = topic_id
+            self.touched.add(topic_id)
+            self.dirty = True
+        return topic_id
+
+    def _merge(self, topics):
+        """把本进程新登记的话题和别名合并到磁盘上的索引（磁盘上已有的话题保留其标题和签名，别名取并集）"""
+        for topic_id in self.touched:
+            mine = self.topics[topic_id]
+            disk = topics.get(topic_id)
+            if disk is None:
+                topics[topic_id] = mine
+                continue
+            disk['aliases'] = disk['aliases'] + [a for a in mine['aliases'] if a not in disk['aliases']]
+        return topics
+
+    def save(self):
+        """在文件锁内重新读取索引、合并本进程的改动，再原子写回（并发运行不会互相覆盖话题和别名）"""
+        if not self.path or not self.dirty:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        with file_lock(self.path):
+            topics = self._merge(self._read_topics())
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'topics': topics}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        # 同时读入其他运行登记的话题
+        self._load(topics)
+        self.touched.clear()
+        self.dirty = False
+
+
+_default_index = None
+
+
+def get_index():
+    """获取进程内共享的话题索引"""
+    global _default_index
+    if _default_index is None:
+        _default_index = TopicIndex()
+    return _default_index
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('resolve', 'stats'):
+        print(__doc__)
+        return 1
+
+    index = get_index()
+    if args[0] == 'stats':
+        aliases = sum(len(t['aliases']) for t in index.topics.values())
+        print(f"📇 话题索引: {index.path}")
+        print(f"   话题数量: {len(index.topics)}")
+        print(f"   标题写法: {aliases}")
+        return 0
+
+    for title in args[1:]:
+        topic_id = index.lookup(title)
+        canonical = index.topics[topic_id]['title'] if topic_id else '（新话题）'
+        print(f"{title}  →  {topic_id or '-'}  {canonical}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())